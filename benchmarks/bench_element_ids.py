@@ -0,0 +1,199 @@
+"""Benchmark: packed/interned element ids vs. plain `(lamport, replica_id)` tuples.
+
+Compares retained memory and integration time of the current `RGA` (packed int
+ids, per-document `ReplicaTable`) against a reference index that keeps the
+Phase 1 layout: tuple ids with a fresh replica string per decoded op.
+
+The reference only maintains the tree, while `RGA` also maintains its
+`SequenceIndex`. The `packed tree` row times `RGA` with a no-op index, which
+compares the id layouts on equal work; the `packed ids` row is the full `RGA`.
+
+Both sides decode the same JSON payloads through a pydantic model, so the
+comparison isolates id representation rather than decode cost.
+
+Shapes:
+
+- `typing`: each replica extends its own run, so parents rarely have siblings.
+- `burst`: every replica inserts after the same parent with the same lamport,
+  round after round, arriving in a rotating order. Sibling placement then has
+  to break lamport ties by replica name.
+
+Usage:
+    python benchmarks/bench_element_ids.py [--ops N] [--replicas K] [--shape typing|burst]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Literal, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from pydantic import BaseModel, Field  # noqa: E402
+
+from collab_engine.core.crdt.rga import RGA  # noqa: E402
+from collab_engine.core.crdt.sequence import SequenceIndex  # noqa: E402
+from collab_engine.core.protocol.messages import InsertOp  # noqa: E402
+
+
+class _TupleInsertOp(BaseModel):
+    """Phase 1 decode shape: plain tuples, no interning."""
+
+    type: Literal["ins"]
+    parent_id: tuple[int, str]
+    id: tuple[int, str]
+    value: str = Field(min_length=1, max_length=1)
+
+
+@dataclass(frozen=True)
+class _TupleNode:
+    id: tuple[int, str]
+    parent_id: tuple[int, str]
+    value: str
+    deleted: bool = False
+
+
+class _TupleIndex:
+    """Insert path of the Phase 1 `RGA`, keyed by tuples."""
+
+    def __init__(self) -> None:
+        root = (0, "root")
+        self._nodes: Dict[tuple[int, str], _TupleNode] = {root: _TupleNode(root, root, "", True)}
+        self._children: Dict[tuple[int, str], List[tuple[int, str]]] = {root: []}
+
+    def integrate(self, op: _TupleInsertOp) -> None:
+        if op.id in self._nodes:
+            return
+        self._nodes[op.id] = _TupleNode(op.id, op.parent_id, op.value)
+        self._children.setdefault(op.id, [])
+        siblings = self._children.setdefault(op.parent_id, [])
+        siblings.append(op.id)
+        siblings.sort()
+
+
+def _payload(parent: tuple[int, str], element_id: tuple[int, str]) -> str:
+    return f'{{"type":"ins","parent_id":[{parent[0]},"{parent[1]}"],"id":[{element_id[0]},"{element_id[1]}"],"value":"x"}}'
+
+
+def _replica(r: int) -> str:
+    return f"replica-{r:04d}-0123456789abcdef"
+
+
+class _TreeOnlyIndex(SequenceIndex):
+    """Skips document-order bookkeeping, leaving only the tree to time."""
+
+    def insert(self, node_id: int, parent_id: int, next_sibling: Optional[int]) -> None:
+        pass
+
+
+def make_payloads(n_ops: int, n_replicas: int, shape: str = "typing") -> List[str]:
+    """`n_ops` insert payloads from `n_replicas` replicas in the given shape."""
+    payloads: List[str] = []
+    if shape == "burst":
+        parent = (0, "root")
+        for round_no in range(n_ops // n_replicas + 1):
+            lamport = round_no + 1
+            for k in range(n_replicas):
+                r = (k + round_no) % n_replicas
+                payloads.append(_payload(parent, (lamport, _replica(r))))
+            parent = (lamport, _replica(round_no % n_replicas))
+        return payloads[:n_ops]
+
+    last: Dict[int, tuple[int, str]] = {}
+    for i in range(n_ops):
+        r = i % n_replicas
+        parent = last.get(r, (0, "root"))
+        element_id = (i + 1, _replica(r))
+        payloads.append(_payload(parent, element_id))
+        last[r] = element_id
+    return payloads
+
+
+def _measure(build: Callable[[List[str]], object], payloads: List[str]) -> tuple[float, int]:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    structure = build(payloads)
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return elapsed, retained
+
+
+def build_tuple_index(payloads: List[str]) -> _TupleIndex:
+    idx = _TupleIndex()
+    for raw in payloads:
+        idx.integrate(_TupleInsertOp.model_validate_json(raw))
+    return idx
+
+
+def build_packed_rga(payloads: List[str]) -> RGA:
+    rga = RGA(check_invariants=False)
+    for raw in payloads:
+        rga.integrate(InsertOp.model_validate_json(raw))
+    return rga
+
+
+def build_packed_tree(payloads: List[str]) -> RGA:
+    rga = RGA(check_invariants=False)
+    rga._index = _TreeOnlyIndex(rga._nodes, rga._root)
+    for raw in payloads:
+        rga.integrate(InsertOp.model_validate_json(raw))
+    return rga
+
+
+def _timed(build: Callable[[List[str]], object], payloads: List[str], repeat: int = 3) -> float:
+    """Best of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        build(payloads)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(n_ops: int, n_replicas: int, shape: str = "typing") -> dict:
+    payloads = make_payloads(n_ops, n_replicas, shape)
+    _t, tuple_mem = _measure(build_tuple_index, payloads)
+    _t, packed_mem = _measure(build_packed_rga, payloads)
+    # Time without tracemalloc, which distorts allocation-heavy code.
+    tuple_s = _timed(build_tuple_index, payloads)
+    packed_s = _timed(build_packed_rga, payloads)
+    tree_s = _timed(build_packed_tree, payloads)
+    return {
+        "ops": n_ops,
+        "replicas": n_replicas,
+        "shape": shape,
+        "tuple_bytes": tuple_mem,
+        "packed_bytes": packed_mem,
+        "tuple_seconds": tuple_s,
+        "packed_seconds": packed_s,
+        "packed_tree_seconds": tree_s,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=100_000)
+    parser.add_argument("--replicas", type=int, default=8)
+    parser.add_argument("--shape", choices=("typing", "burst"), default="typing")
+    args = parser.parse_args()
+
+    r = run(args.ops, args.replicas, args.shape)
+    print(f"ops={r['ops']} replicas={r['replicas']} shape={r['shape']}")
+    print(f"  tuple ids : {r['tuple_bytes'] / r['ops']:7.1f} B/op  {r['tuple_seconds'] * 1e6 / r['ops']:6.2f} us/op")
+    print(f"  packed tree:             {r['packed_tree_seconds'] * 1e6 / r['ops']:6.2f} us/op")
+    print(f"  packed ids: {r['packed_bytes'] / r['ops']:7.1f} B/op  {r['packed_seconds'] * 1e6 / r['ops']:6.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
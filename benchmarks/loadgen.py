@@ -0,0 +1,515 @@
+"""WebSocket load generator and soak-test harness.
+
+Simulates realistic collaborative traffic against the `/ws` endpoint: N
+documents with M clients each, typing at a configurable rate, optional
+slow-consumer clients, a reconnect storm in which a fraction of clients
+drop and reconnect with their `last_seen_server_seq`, and optional cursor
+traffic (`presence_update` messages anchored to CRDT elements).
+
+Every simulated client keeps its own `RGA` replica: it generates ops with
+`RGA.splice` (optimistic local apply), integrates every `op_echo`, and resends
+unacknowledged ops after a reconnect. At the end the harness waits for all
+clients to catch up and checks that every replica materializes the same text as
+the server's snapshot.
+
+Reported metrics: op->echo latency percentiles (slow consumers are reported
+separately, since their own backlog delays their echoes), sent/echoed
+throughput, process RSS growth, reconnects, replays vs. resyncs,
+slow-consumer disconnects, and presence update->broadcast latency.
+
+By default the FastAPI app is started in-process with uvicorn on an ephemeral
+localhost port, so RSS covers server and clients together. Pass `--url` to
+target an already running server instead.
+
+Usage:
+    python benchmarks/loadgen.py --docs 4 --clients 8 --duration 30 --rate 5 \\
+        --slow-clients 1 --storm-at 10 --output soak.json
+
+    # 500 cursors in one room
+    python benchmarks/loadgen.py --docs 1 --clients 500 --rate 0.2 --cursor-rate 2
+
+Requires the `websockets` package (installed with `uvicorn[standard]`).
+
+Protocol note: a `resync` only carries plain text, so a client that falls back
+to resync cannot rebuild CRDT ids. Such clients become read-only "text-only"
+replicas; they are counted but excluded from the replica convergence check.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from websockets.asyncio.client import ClientConnection, connect  # noqa: E402
+from websockets.exceptions import ConnectionClosed  # noqa: E402
+
+from collab_engine.core.crdt.pending import PendingLimits  # noqa: E402
+from collab_engine.core.crdt.rga import RGA  # noqa: E402
+from collab_engine.core.protocol.messages import (  # noqa: E402
+    ClientHello,
+    ClientOp,
+    ClientPresenceUpdate,
+    CursorAnchor,
+    Op,
+    ServerOpEcho,
+)
+
+
+@dataclass
+class LoadConfig:
+    url: Optional[str] = None
+    docs: int = 4
+    clients_per_doc: int = 8
+    duration: float = 10.0
+    typing_rate: float = 5.0
+    delete_ratio: float = 0.1
+    slow_clients: int = 0
+    slow_delay: float = 0.05
+    storm_at: Optional[float] = None
+    storm_fraction: float = 0.5
+    storm_downtime: float = 0.5
+    cursor_rate: float = 0.0
+    settle_timeout: float = 15.0
+    seed: int = 1
+
+
+@dataclass
+class LoadStats:
+    sent: int = 0
+    echoed: int = 0
+    resent: int = 0
+    latencies: List[float] = field(default_factory=list)
+    slow_latencies: List[float] = field(default_factory=list)
+    reconnects: int = 0
+    replays: int = 0
+    resyncs: int = 0
+    slow_disconnects: int = 0
+    presence_sent: int = 0
+    presence_messages: int = 0
+    presence_latencies: List[float] = field(default_factory=list)
+
+
+@dataclass
+class LoadReport:
+    config: dict
+    elapsed_seconds: float
+    ops_sent: int
+    ops_resent: int
+    echoes_received: int
+    sent_per_second: float
+    echoes_per_second: float
+    latency_ms: Dict[str, float]
+    slow_client_latency_ms: Dict[str, float]
+    rss_start_bytes: int
+    rss_end_bytes: int
+    rss_peak_bytes: int
+    reconnects: int
+    replays: int
+    resyncs: int
+    slow_disconnects: int
+    presence_sent: int
+    presence_messages_received: int
+    presence_latency_ms: Dict[str, float]
+    text_only_clients: int
+    converged: bool
+    divergent_docs: List[str]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50": pick(0.50), "p90": pick(0.90), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+
+class SimClient:
+    """One simulated editor with its own CRDT replica."""
+
+    def __init__(self, cfg: LoadConfig, url: str, doc_id: str, client_id: str, stats: LoadStats, slow: bool) -> None:
+        self.cfg = cfg
+        self.url = url
+        self.doc_id = doc_id
+        self.client_id = client_id
+        self.stats = stats
+        self.slow = slow
+        self.rnd = random.Random(f"{cfg.seed}:{client_id}")
+
+        self.rga = RGA(check_invariants=False, pending_limits=PendingLimits(max_ops=1 << 30, max_bytes=1 << 40))
+        self.last_seen = 0
+        self.cursor = 0
+        self.text_only = False
+        # client_msg_id -> (send time, op); a send time of None marks a resent op.
+        self.unacked: Dict[str, tuple[Optional[float], Op]] = {}
+        self._msg_counter = 0
+        self._expect_replay = False
+        # Send time of the oldest presence update not yet seen in a broadcast.
+        self._presence_sent_at: Optional[float] = None
+
+        self.ws: Optional[ClientConnection] = None
+        self.typing = False
+        self.stopping = False
+        self._planned_drop = False
+        self._reader: Optional[asyncio.Task[None]] = None
+
+    async def connect(self) -> None:
+        self.ws = await connect(self.url, max_size=None)
+        hello = ClientHello(type="hello", doc_id=self.doc_id, client_id=self.client_id, last_seen_server_seq=self.last_seen)
+        await self.ws.send(hello.model_dump_json())
+        self._reader = asyncio.create_task(self._read_loop(self.ws))
+
+    async def drop(self) -> None:
+        """Client-initiated disconnect (reconnect storm)."""
+        self._planned_drop = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self._planned_drop = False
+
+    async def reconnect(self) -> None:
+        self.stats.reconnects += 1
+        await self.connect()
+        # Ops whose echo never arrived may not have reached the server;
+        # integration is idempotent, so resending duplicates is harmless.
+        for msg_id, (_sent, op) in list(self.unacked.items()):
+            self.unacked[msg_id] = (None, op)
+            self.stats.resent += 1
+            await self._send_op(msg_id, op)
+
+    async def type_loop(self) -> None:
+        rate = self.cfg.typing_rate
+        while self.typing:
+            await self._pause(self.rnd.expovariate(rate))
+            if not self.typing or self.text_only or self.ws is None:
+                continue
+            for op in self._next_edit():
+                self._msg_counter += 1
+                msg_id = f"{self.client_id}:{self._msg_counter}"
+                self.unacked[msg_id] = (time.perf_counter(), op)
+                self.stats.sent += 1
+                try:
+                    await self._send_op(msg_id, op)
+                except ConnectionClosed:
+                    pass
+
+    async def cursor_loop(self) -> None:
+        rate = self.cfg.cursor_rate
+        while self.typing:
+            await self._pause(self.rnd.expovariate(rate))
+            if not self.typing or self.ws is None:
+                continue
+            if self.text_only:
+                anchor = self.rga.anchor_at(0)
+            else:
+                length = len(self.rga)
+                self.cursor = max(0, min(length, self.cursor + self.rnd.randint(-3, 3)))
+                anchor = self.rga.anchor_at(self.cursor)
+            msg = ClientPresenceUpdate(
+                type="presence_update",
+                doc_id=self.doc_id,
+                client_id=self.client_id,
+                cursor=CursorAnchor(anchor_id=anchor),
+            )
+            if self._presence_sent_at is None:
+                self._presence_sent_at = time.perf_counter()
+            self.stats.presence_sent += 1
+            try:
+                await self.ws.send(msg.model_dump_json())
+            except ConnectionClosed:
+                pass
+
+    async def close(self) -> None:
+        self.stopping = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    async def _pause(self, delay: float) -> None:
+        # Sleep in short slices so a low rate does not hold up the end of the run.
+        deadline = time.perf_counter() + delay
+        while self.typing:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 0.1))
+
+    def _next_edit(self) -> List[Op]:
+        length = len(self.rga)
+        if self.rnd.random() < 0.05:
+            self.cursor = self.rnd.randrange(length + 1)
+        self.cursor = min(self.cursor, length)
+        if length and self.cursor and self.rnd.random() < self.cfg.delete_ratio:
+            self.cursor -= 1
+            return self.rga.splice(self.cursor, 1, "", self.client_id)
+        ch = self.rnd.choice("abcdefghijklmnopqrstuvwxyz ")
+        ops = self.rga.splice(self.cursor, 0, ch, self.client_id)
+        self.cursor += 1
+        return ops
+
+    async def _send_op(self, msg_id: str, op: Op) -> None:
+        if self.ws is None:
+            return
+        msg = ClientOp(type="op", doc_id=self.doc_id, client_id=self.client_id, client_msg_id=msg_id, op=op)
+        await self.ws.send(msg.model_dump_json())
+
+    async def _read_loop(self, ws: ClientConnection) -> None:
+        try:
+            async for raw in ws:
+                self._handle(json.loads(raw))
+                if self.slow:
+                    await asyncio.sleep(self.cfg.slow_delay)
+        except ConnectionClosed:
+            pass
+        if self.stopping or self._planned_drop:
+            return
+        # Server-initiated close, e.g. 1013 when our send queue overflowed.
+        self.stats.slow_disconnects += 1
+        self.ws = None
+        await asyncio.sleep(0.05)
+        if not self.stopping:
+            await self.reconnect()
+
+    def _handle(self, data: dict) -> None:
+        t = data.get("type")
+        if t == "hello_ack":
+            self._expect_replay = data["server_seq"] > self.last_seen > 0
+            return
+        if t == "resync":
+            if data["server_seq"] > self.last_seen:
+                if self.last_seen > 0 or data["full_text"]:
+                    # Plain text cannot be turned back into CRDT ids.
+                    self.text_only = True
+                    self.stats.resyncs += 1
+                self.last_seen = data["server_seq"]
+            self._expect_replay = False
+            return
+        if t == "presence_update":
+            self.stats.presence_messages += 1
+            if self._presence_sent_at is not None and any(
+                u["client_id"] == self.client_id for u in data["updates"]
+            ):
+                self.stats.presence_latencies.append(time.perf_counter() - self._presence_sent_at)
+                self._presence_sent_at = None
+            return
+        if t == "op_echo":
+            echo = ServerOpEcho.model_validate(data)
+            if self._expect_replay:
+                self.stats.replays += 1
+                self._expect_replay = False
+            if not self.text_only:
+                self.rga.integrate(echo.op)
+            self.last_seen = max(self.last_seen, echo.server_seq)
+            if echo.origin_client_id == self.client_id:
+                pending = self.unacked.pop(echo.client_msg_id, None)
+                if pending is not None:
+                    self.stats.echoed += 1
+                    if pending[0] is not None:
+                        samples = self.stats.slow_latencies if self.slow else self.stats.latencies
+                        samples.append(time.perf_counter() - pending[0])
+
+
+async def _fetch_server_state(url: str, doc_id: str) -> tuple[int, str]:
+    """Join as a fresh observer; the server answers with hello_ack + resync."""
+    async with connect(url, max_size=None) as ws:
+        await ws.send(ClientHello(type="hello", doc_id=doc_id, client_id="loadgen-checker").model_dump_json())
+        while True:
+            data = json.loads(await ws.recv())
+            if data.get("type") == "resync":
+                return data["server_seq"], data["full_text"]
+
+
+async def _start_in_process() -> tuple[object, asyncio.Task[None], str]:
+    import uvicorn
+
+    from collab_engine.main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"ws://127.0.0.1:{port}/ws"
+
+
+async def run_load(cfg: LoadConfig) -> LoadReport:
+    server = None
+    server_task: Optional[asyncio.Task[None]] = None
+    url = cfg.url
+    if url is None:
+        server, server_task, url = await _start_in_process()
+
+    stats = LoadStats()
+    rss_start = _rss_bytes()
+    rss_peak = rss_start
+    run_id = f"{int(time.time() * 1000):x}"
+
+    clients: List[SimClient] = []
+    for d in range(cfg.docs):
+        doc_id = f"load-{run_id}-{d}"
+        for c in range(cfg.clients_per_doc):
+            slow = c < cfg.slow_clients
+            clients.append(SimClient(cfg, url, doc_id, f"d{d}-c{c}", stats, slow))
+
+    try:
+        # Everyone joins before anyone types: a late joiner would only get a
+        # plain-text resync and could not participate as a CRDT replica.
+        await asyncio.gather(*(c.connect() for c in clients))
+
+        t0 = time.perf_counter()
+        for c in clients:
+            c.typing = True
+        typers = [asyncio.create_task(c.type_loop()) for c in clients]
+        if cfg.cursor_rate > 0:
+            typers += [asyncio.create_task(c.cursor_loop()) for c in clients]
+
+        async def storm() -> None:
+            assert cfg.storm_at is not None
+            await asyncio.sleep(cfg.storm_at)
+            rnd = random.Random(cfg.seed)
+            victims = rnd.sample(clients, int(len(clients) * cfg.storm_fraction))
+            await asyncio.gather(*(v.drop() for v in victims))
+            await asyncio.sleep(cfg.storm_downtime)
+            await asyncio.gather(*(v.reconnect() for v in victims))
+
+        storm_task = asyncio.create_task(storm()) if cfg.storm_at is not None else None
+
+        deadline = t0 + cfg.duration
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(min(0.25, max(0.0, deadline - time.perf_counter())))
+            rss_peak = max(rss_peak, _rss_bytes())
+
+        for c in clients:
+            c.typing = False
+        await asyncio.gather(*typers)
+        if storm_task is not None:
+            await storm_task
+        elapsed = time.perf_counter() - t0
+
+        # Settle: wait for every op to be acknowledged, then for every replica to
+        # reach the server's final server_seq.
+        settle_deadline = time.perf_counter() + cfg.settle_timeout
+        while any(c.unacked for c in clients) and time.perf_counter() < settle_deadline:
+            await asyncio.sleep(0.05)
+
+        divergent: List[str] = []
+        by_doc: Dict[str, List[SimClient]] = {}
+        for c in clients:
+            by_doc.setdefault(c.doc_id, []).append(c)
+        for doc_id, members in by_doc.items():
+            server_seq, server_text = await _fetch_server_state(url, doc_id)
+            while any(m.last_seen < server_seq for m in members) and time.perf_counter() < settle_deadline:
+                await asyncio.sleep(0.05)
+            texts = {m.rga.materialize() for m in members if not m.text_only}
+            if texts and texts != {server_text}:
+                divergent.append(doc_id)
+
+        rss_end = _rss_bytes()
+        rss_peak = max(rss_peak, rss_end)
+    finally:
+        await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+        if server is not None and server_task is not None:
+            server.should_exit = True  # type: ignore[attr-defined]
+            await server_task
+
+    cfg_dict = asdict(cfg)
+    cfg_dict["url"] = cfg.url or "in-process"
+    return LoadReport(
+        config=cfg_dict,
+        elapsed_seconds=elapsed,
+        ops_sent=stats.sent,
+        ops_resent=stats.resent,
+        echoes_received=stats.echoed,
+        sent_per_second=stats.sent / elapsed if elapsed else 0.0,
+        echoes_per_second=stats.echoed / elapsed if elapsed else 0.0,
+        latency_ms=percentiles(stats.latencies),
+        slow_client_latency_ms=percentiles(stats.slow_latencies),
+        rss_start_bytes=rss_start,
+        rss_end_bytes=rss_end,
+        rss_peak_bytes=rss_peak,
+        reconnects=stats.reconnects,
+        replays=stats.replays,
+        resyncs=stats.resyncs,
+        slow_disconnects=stats.slow_disconnects,
+        presence_sent=stats.presence_sent,
+        presence_messages_received=stats.presence_messages,
+        presence_latency_ms=percentiles(stats.presence_latencies),
+        text_only_clients=sum(1 for c in clients if c.text_only),
+        converged=not divergent,
+        divergent_docs=divergent,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="ws:// URL of a running server (default: start the app in-process)")
+    parser.add_argument("--docs", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8, help="clients per document")
+    parser.add_argument("--duration", type=float, default=10.0, help="typing phase length in seconds")
+    parser.add_argument("--rate", type=float, default=5.0, help="ops per second per client")
+    parser.add_argument("--delete-ratio", type=float, default=0.1)
+    parser.add_argument("--slow-clients", type=int, default=0, help="slow consumers per document")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow client spends per message")
+    parser.add_argument("--storm-at", type=float, help="seconds into the run to start a reconnect storm")
+    parser.add_argument("--storm-fraction", type=float, default=0.5)
+    parser.add_argument("--storm-downtime", type=float, default=0.5)
+    parser.add_argument("--cursor-rate", type=float, default=0.0, help="presence updates per second per client")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    # Keep per-op INFO logs from the in-process server off stdout.
+    logging.basicConfig(level=logging.WARNING)
+
+    cfg = LoadConfig(
+        url=args.url,
+        docs=args.docs,
+        clients_per_doc=args.clients,
+        duration=args.duration,
+        typing_rate=args.rate,
+        delete_ratio=args.delete_ratio,
+        slow_clients=args.slow_clients,
+        slow_delay=args.slow_delay,
+        storm_at=args.storm_at,
+        storm_fraction=args.storm_fraction,
+        storm_downtime=args.storm_downtime,
+        cursor_rate=args.cursor_rate,
+        seed=args.seed,
+    )
+    report = asdict(asyncio.run(run_load(cfg)))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["converged"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
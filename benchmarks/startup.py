@@ -0,0 +1,220 @@
+"""Process startup and first-op-after-deploy measurements.
+
+Starts the server the way a deploy does, as a fresh `uvicorn` process, and
+measures:
+
+- `import_ms`: importing `collab_engine.main` in a fresh interpreter (median
+  of `--import-runs`). This is dominated by FastAPI/pydantic, not by this
+  package.
+- `listen_ms`: from the end of seeding until `/health` first answers.
+- `ready_ms`: from the end of seeding until `/health` answers 200, i.e. until
+  the warm-up of `COLLAB_WARM_DOCS` documents has finished.
+- `first_op_ms`: op->echo latency of the first op on each seeded document. On
+  a document that was not warmed, this includes the rebuild from the newest
+  checkpoint plus the oplog tail.
+- `steady_op_ms`: op->echo latency of a second op on the same documents.
+
+Persistence is in-memory, so state cannot outlive the process. The child
+server stands in for durable storage by seeding its own persistence layer
+(`--seed-docs` documents of `--seed-ops` ops, with checkpoints) through a
+separate `DocumentService` before it starts serving; the served service then
+starts with nothing loaded, exactly as after a restart.
+
+Usage:
+    python benchmarks/startup.py --seed-docs 4 --seed-ops 50000 --warm-docs 0
+    python benchmarks/startup.py --seed-docs 4 --seed-ops 50000 --warm-docs 4
+
+Requires `uvicorn` and the `websockets` package.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from websockets.asyncio.client import connect  # noqa: E402
+
+from collab_engine.core.protocol.messages import ClientHello, ClientOp, InsertOp  # noqa: E402
+
+
+@dataclass
+class StartupConfig:
+    seed_docs: int = 2
+    seed_ops: int = 20_000
+    warm_docs: int = 0
+    import_runs: int = 3
+    optimize: bool = False
+    timeout: float = 120.0
+
+
+@dataclass
+class StartupReport:
+    config: dict
+    import_ms: float
+    listen_ms: float
+    ready_ms: float
+    health: dict
+    first_op_ms: List[float]
+    steady_op_ms: List[float]
+
+
+def _doc_id(i: int) -> str:
+    return f"startup-doc-{i}"
+
+
+def _measure_import(runs: int) -> float:
+    code = "import time; t0 = time.perf_counter(); import collab_engine.main; print(time.perf_counter() - t0)"
+    env = dict(os.environ, PYTHONPATH=SRC)
+    samples = [
+        float(subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout)
+        for _ in range(runs)
+    ]
+    return statistics.median(samples) * 1000
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get_health(port: int) -> tuple[int, dict] | None:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1.0) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+    except OSError:
+        return None
+
+
+async def _first_ops(port: int, doc_ids: List[str]) -> tuple[List[float], List[float]]:
+    first: List[float] = []
+    steady: List[float] = []
+    for doc_id in doc_ids:
+        async with connect(f"ws://127.0.0.1:{port}/ws", max_size=None) as ws:
+            await ws.send(ClientHello(type="hello", doc_id=doc_id, client_id="startup").model_dump_json())
+            for samples, lamport in ((first, 10**9), (steady, 10**9 + 1)):
+                op = InsertOp(type="ins", parent_id=(0, "root"), id=(lamport, "startup"), value="!")
+                msg = ClientOp(type="op", doc_id=doc_id, client_id="startup", client_msg_id=f"m{lamport}", op=op)
+                t0 = time.perf_counter()
+                await ws.send(msg.model_dump_json())
+                while json.loads(await ws.recv()).get("type") != "op_echo":
+                    pass
+                samples.append((time.perf_counter() - t0) * 1000)
+    return first, steady
+
+
+async def measure(cfg: StartupConfig) -> StartupReport:
+    import_ms = _measure_import(cfg.import_runs)
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=SRC, COLLAB_WARM_DOCS=str(cfg.warm_docs))
+    args = ["--serve", "--port", str(port), "--seed-docs", str(cfg.seed_docs), "--seed-ops", str(cfg.seed_ops)]
+    # Under -O, `__debug__` is off and so are per-op CRDT invariant checks.
+    python = [sys.executable, "-O"] if cfg.optimize else [sys.executable]
+    proc = subprocess.Popen([*python, os.path.abspath(__file__), *args], env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        assert proc.stdout is not None
+        line = await asyncio.wait_for(asyncio.to_thread(proc.stdout.readline), cfg.timeout)
+        if not line:
+            raise RuntimeError("server exited before seeding finished")
+        t0 = time.perf_counter()
+        deadline = t0 + cfg.timeout
+        listen_ms: Optional[float] = None
+        while True:
+            result = await asyncio.to_thread(_get_health, port)
+            now = time.perf_counter()
+            if result is not None:
+                if listen_ms is None:
+                    listen_ms = (now - t0) * 1000
+                if result[0] == 200:
+                    ready_ms, health = (now - t0) * 1000, result[1]
+                    break
+            if now > deadline or proc.poll() is not None:
+                raise RuntimeError("server did not become ready")
+            await asyncio.sleep(0.01)
+        first, steady = await _first_ops(port, [_doc_id(i) for i in range(cfg.seed_docs)])
+    finally:
+        proc.terminate()
+        proc.wait()
+    return StartupReport(
+        config=asdict(cfg),
+        import_ms=import_ms,
+        listen_ms=listen_ms,
+        ready_ms=ready_ms,
+        health=health,
+        first_op_ms=first,
+        steady_op_ms=steady,
+    )
+
+
+def _serve(port: int, seed_docs: int, seed_ops: int) -> None:
+    import uvicorn
+
+    from collab_engine.api import ws as api_ws
+    from collab_engine.main import app
+    from collab_engine.services.document_service import DocumentService
+
+    async def seed() -> None:
+        # A separate service writes through to the served persistence layer,
+        # so the served service starts cold, as after a restart.
+        writer = DocumentService(persistence=api_ws._persistence, check_invariants=False)
+        for d in range(seed_docs):
+            parent = (0, "root")
+            for i in range(seed_ops):
+                op = InsertOp(type="ins", parent_id=parent, id=(i + 1, "seed"), value="x")
+                await writer.apply_op(doc_id=_doc_id(d), origin_client_id="seed", client_msg_id=f"s{i}", op=op)
+                parent = op.id
+
+    asyncio.run(seed())
+    print("seeded", flush=True)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-docs", type=int, default=2, help="documents persisted before the restart")
+    parser.add_argument("--seed-ops", type=int, default=20_000, help="ops per seeded document")
+    parser.add_argument("--warm-docs", type=int, default=0, help="COLLAB_WARM_DOCS for the server")
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("-O", dest="optimize", action="store_true", help="run the server with python -O")
+    parser.add_argument("--output", help="write the report as JSON here")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        _serve(args.port, args.seed_docs, args.seed_ops)
+        return 0
+
+    cfg = StartupConfig(
+        seed_docs=args.seed_docs,
+        seed_ops=args.seed_ops,
+        warm_docs=args.warm_docs,
+        import_runs=args.import_runs,
+        optimize=args.optimize,
+    )
+    report = asdict(asyncio.run(measure(cfg)))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
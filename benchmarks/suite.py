@@ -0,0 +1,646 @@
+"""Performance benchmark suite for CRDT, protocol and fan-out hot paths.
+
+Each benchmark times one hot path and reports microseconds per operation (best
+of several repeats). Results are written as JSON so a run can be compared
+against a stored baseline; a benchmark regresses when its `us_per_op` exceeds
+the baseline by more than the threshold.
+
+Usage:
+    python benchmarks/suite.py [--full] [--only NAME ...] [--output results.json]
+                               [--baseline baseline.json] [--threshold 0.25]
+
+Baselines are only meaningful on the same machine and Python build; keep the
+threshold generous on shared CI runners.
+
+`--full` uses production-scale sizes (including a 1M character document) and
+takes minutes; the default quick sizes finish in seconds. The same suite runs
+under pytest via `benchmarks/test_benchmarks.py` when `COLLAB_BENCH=1` is set.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from collab_engine.core.crdt.pending import PendingLimits  # noqa: E402
+from collab_engine.core.crdt.rga import ROOT_ID, RGA  # noqa: E402
+from collab_engine.core.protocol.messages import (  # noqa: E402
+    CursorAnchor,
+    DeleteOp,
+    InsertOp,
+    PresenceState,
+    parse_client_message,
+)
+from collab_engine.logging_config import make_handler  # noqa: E402
+from collab_engine.metrics import Counter, Histogram  # noqa: E402
+from collab_engine.persistence.base import OpRecord  # noqa: E402
+from collab_engine.persistence.memory import InMemoryPersistence  # noqa: E402
+from collab_engine.services.checkpoints import CheckpointPolicy  # noqa: E402
+from collab_engine.services.document_service import DocumentService  # noqa: E402
+from collab_engine.session.presence import PresenceManager  # noqa: E402
+from collab_engine.session.session_manager import Connection, SessionManager  # noqa: E402
+
+
+DEFAULT_THRESHOLD = 0.25
+
+
+@dataclass
+class BenchResult:
+    name: str
+    ops: int
+    seconds: float
+    us_per_op: float
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline_us: float
+    current_us: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_us / self.baseline_us
+
+
+# A benchmark is called once per repeat and returns (timed seconds, op count);
+# setup work happens inside it but outside the timed region.
+BenchFn = Callable[[bool], "tuple[float, int]"]
+
+_REGISTRY: Dict[str, BenchFn] = {}
+_FULL_ONLY: set[str] = set()
+
+
+def bench(name: str, full_only: bool = False) -> Callable[[BenchFn], BenchFn]:
+    def register(fn: BenchFn) -> BenchFn:
+        _REGISTRY[name] = fn
+        if full_only:
+            _FULL_ONLY.add(name)
+        return fn
+
+    return register
+
+
+def names(full: bool = True) -> List[str]:
+    return [n for n in _REGISTRY if full or n not in _FULL_ONLY]
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    gc.collect()
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+# -- op generators -----------------------------------------------------------
+
+
+def typing_ops(n: int, replica: str = "a") -> List[InsertOp]:
+    """Sequential typing: every char is inserted after the previous one."""
+    ops: List[InsertOp] = []
+    parent = ROOT_ID
+    for i in range(1, n + 1):
+        element_id = (i, replica)
+        ops.append(InsertOp(type="ins", parent_id=parent, id=element_id, value="abcdefghij"[i % 10]))
+        parent = element_id
+    return ops
+
+
+def random_insert_ops(n: int, seed: int = 1) -> List[InsertOp]:
+    """Inserts after uniformly random earlier elements from 8 replicas."""
+    rnd = random.Random(seed)
+    ids = [ROOT_ID]
+    ops: List[InsertOp] = []
+    for i in range(1, n + 1):
+        element_id = (i, f"r{rnd.randrange(8)}")
+        ops.append(InsertOp(type="ins", parent_id=ids[rnd.randrange(len(ids))], id=element_id, value="x"))
+        ids.append(element_id)
+    return ops
+
+
+def _rga_from(ops: List[InsertOp]) -> RGA:
+    rga = RGA(check_invariants=False)
+    for op in ops:
+        rga.integrate(op)
+    return rga
+
+
+# -- CRDT ----------------------------------------------------------------------
+
+
+@bench("integrate_sequential_typing")
+def _integrate_sequential_typing(full: bool) -> "tuple[float, int]":
+    ops = typing_ops(100_000 if full else 10_000)
+    rga = RGA(check_invariants=False)
+
+    def run() -> None:
+        for op in ops:
+            rga.integrate(op)
+
+    return _timed(run), len(ops)
+
+
+@bench("integrate_random_inserts")
+def _integrate_random_inserts(full: bool) -> "tuple[float, int]":
+    ops = random_insert_ops(100_000 if full else 10_000)
+    rga = RGA(check_invariants=False)
+
+    def run() -> None:
+        for op in ops:
+            rga.integrate(op)
+
+    return _timed(run), len(ops)
+
+
+@bench("integrate_out_of_order")
+def _integrate_out_of_order(full: bool) -> "tuple[float, int]":
+    ops = typing_ops(100_000 if full else 10_000)
+    ops.reverse()
+    rga = RGA(check_invariants=False, pending_limits=PendingLimits(max_ops=len(ops), max_bytes=1 << 32))
+
+    def run() -> None:
+        for op in ops:
+            rga.integrate(op)
+
+    return _timed(run), len(ops)
+
+
+@bench("integrate_concurrent_same_parent")
+def _integrate_concurrent_same_parent(full: bool) -> "tuple[float, int]":
+    n = 20_000 if full else 2_000
+    rnd = random.Random(2)
+    ops = [InsertOp(type="ins", parent_id=ROOT_ID, id=(rnd.randrange(n), f"r{i}"), value="x") for i in range(n)]
+    rga = RGA(check_invariants=False)
+
+    def run() -> None:
+        for op in ops:
+            rga.integrate(op)
+
+    return _timed(run), len(ops)
+
+
+@bench("integrate_deletes")
+def _integrate_deletes(full: bool) -> "tuple[float, int]":
+    inserts = typing_ops(100_000 if full else 10_000)
+    rga = _rga_from(inserts)
+    deletes = [DeleteOp(type="del", id=op.id) for op in inserts]
+    random.Random(3).shuffle(deletes)
+
+    def run() -> None:
+        for op in deletes:
+            rga.integrate(op)
+
+    return _timed(run), len(deletes)
+
+
+def _materialize(size: int) -> BenchFn:
+    def fn(full: bool) -> "tuple[float, int]":
+        rga = _rga_from(typing_ops(size))
+        rnd = random.Random(4)
+        reps = 50
+        total = 0.0
+        for _ in range(reps):
+            # Steady state: one edit since the previous materialize.
+            rga.integrate(DeleteOp(type="del", id=(rnd.randrange(1, size + 1), "a")))
+            t0 = time.perf_counter()
+            rga.materialize()
+            total += time.perf_counter() - t0
+        return total, reps
+
+    return fn
+
+
+bench("materialize_10k")(_materialize(10_000))
+bench("materialize_100k")(_materialize(100_000))
+# Building a 1M element document dominates runtime; only run it in full mode.
+bench("materialize_1m", full_only=True)(_materialize(1_000_000))
+
+
+# -- protocol ------------------------------------------------------------------
+
+
+@bench("parse_client_message")
+def _parse_client_message(full: bool) -> "tuple[float, int]":
+    n = 50_000 if full else 5_000
+    raws = [
+        json.dumps(
+            {
+                "type": "op",
+                "doc_id": "doc",
+                "client_id": "client-1",
+                "client_msg_id": f"m{i}",
+                "op": {"type": "ins", "parent_id": [i, "client-1"], "id": [i + 1, "client-1"], "value": "x"},
+            }
+        )
+        for i in range(n)
+    ]
+
+    def run() -> None:
+        for raw in raws:
+            parse_client_message(raw)
+
+    return _timed(run), n
+
+
+# -- service -------------------------------------------------------------------
+
+
+@bench("apply_op")
+def _apply_op(full: bool) -> "tuple[float, int]":
+    ops = typing_ops(20_000 if full else 2_000)
+    svc = DocumentService(persistence=InMemoryPersistence(), check_invariants=False)
+
+    async def run() -> float:
+        t0 = time.perf_counter()
+        for i, op in enumerate(ops):
+            await svc.apply_op(doc_id="doc", origin_client_id="a", client_msg_id=f"m{i}", op=op)
+        return time.perf_counter() - t0
+
+    gc.collect()
+    return asyncio.run(run()), len(ops)
+
+
+@bench("op_metrics_overhead")
+def _op_metrics_overhead(full: bool) -> "tuple[float, int]":
+    # What apply_op + broadcast record per op: four histograms and a labelled counter.
+    n = 200_000 if full else 20_000
+    hists = [Histogram(f"h{i}", "bench") for i in range(4)]
+    ops_total = Counter("c", "bench", ["doc_id"])
+    perf = time.perf_counter
+
+    gc.collect()
+    t0 = perf()
+    for _ in range(n):
+        a = perf()
+        b = perf()
+        c = perf()
+        d = perf()
+        hists[0].observe(b - a)
+        hists[1].observe(c - b)
+        hists[2].observe(d - c)
+        hists[3].observe(d - a)
+        ops_total.labels("doc").inc()
+    return perf() - t0, n
+
+
+@bench("op_info_logging_overhead")
+def _op_info_logging_overhead(full: bool) -> "tuple[float, int]":
+    # The two INFO lines per op ("crdt integrated", "op integrated") that apply_op
+    # and the ws loop used to emit, formatted as configure_logging() does.
+    n = 20_000 if full else 2_000
+    handler, _ = make_handler(stream=io.StringIO())
+    log = logging.getLogger("collab_engine.bench.oplog")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.addHandler(handler)
+    try:
+        gc.collect()
+        t0 = time.perf_counter()
+        for i in range(n):
+            log.info("crdt integrated", extra={"doc_id": "doc", "client_id": "a", "server_seq": i})
+            log.info("op integrated", extra={"doc_id": "doc", "client_id": "a", "server_seq": i})
+        return time.perf_counter() - t0, n
+    finally:
+        log.removeHandler(handler)
+
+
+class _SlowStream(io.StringIO):
+    """A log sink that blocks on every write, like a backed-up container log pipe."""
+
+    def write(self, s: str) -> int:
+        time.sleep(0.0002)
+        return super().write(s)
+
+
+def _apply_op_logging(mode: str) -> BenchFn:
+    # apply_op plus one INFO line per op into a slow sink: "disabled" drops the
+    # record at the level check, "sync" writes on the event loop, "queue" hands
+    # the record to a listener thread.
+    def run_bench(full: bool) -> "tuple[float, int]":
+        ops = typing_ops(10_000 if full else 1_000)
+        svc = DocumentService(persistence=InMemoryPersistence(), check_invariants=False)
+        handler, listener = make_handler(
+            stream=_SlowStream(), json_format=True, use_queue=mode == "queue", queue_size=len(ops) * 2
+        )
+        log = logging.getLogger(f"collab_engine.bench.apply_op_{mode}")
+        log.propagate = False
+        log.setLevel(logging.WARNING if mode == "disabled" else logging.INFO)
+        log.addHandler(handler)
+
+        async def run() -> float:
+            t0 = time.perf_counter()
+            for i, op in enumerate(ops):
+                seq = await svc.apply_op(doc_id="doc", origin_client_id="a", client_msg_id=f"m{i}", op=op)
+                log.info("op integrated", extra={"doc_id": "doc", "client_id": "a", "server_seq": seq})
+            return time.perf_counter() - t0
+
+        try:
+            gc.collect()
+            return asyncio.run(run()), len(ops)
+        finally:
+            log.removeHandler(handler)
+            if listener is not None:
+                listener.stop()
+
+    return run_bench
+
+
+bench("apply_op_logging_disabled")(_apply_op_logging("disabled"))
+bench("apply_op_logging_sync")(_apply_op_logging("sync"))
+bench("apply_op_logging_queue")(_apply_op_logging("queue"))
+
+
+@bench("cold_load_replay")
+def _cold_load_replay(full: bool) -> "tuple[float, int]":
+    ops = typing_ops(100_000 if full else 10_000)
+    persistence = InMemoryPersistence()
+    for i, op in enumerate(ops):
+        persistence.append_op(OpRecord(doc_id="doc", server_seq=i + 1, origin_client_id="a", client_msg_id=f"m{i}", op=op))
+    svc = DocumentService(persistence=persistence, check_invariants=False)
+    extra = InsertOp(type="ins", parent_id=ops[-1].id, id=(len(ops) + 1, "a"), value="x")
+
+    async def run() -> float:
+        # The first op after a restart pays the full oplog replay.
+        t0 = time.perf_counter()
+        await svc.apply_op(doc_id="doc", origin_client_id="a", client_msg_id="first", op=extra)
+        return time.perf_counter() - t0
+
+    gc.collect()
+    return asyncio.run(run()), len(ops)
+
+
+@bench("first_op_after_preload")
+def _first_op_after_preload(full: bool) -> "tuple[float, int]":
+    # Same document as cold_load_replay, but startup warm-up has preloaded it.
+    ops = typing_ops(100_000 if full else 10_000)
+    persistence = InMemoryPersistence()
+    for i, op in enumerate(ops):
+        persistence.append_op(OpRecord(doc_id="doc", server_seq=i + 1, origin_client_id="a", client_msg_id=f"m{i}", op=op))
+    svc = DocumentService(persistence=persistence, check_invariants=False)
+    extra = InsertOp(type="ins", parent_id=ops[-1].id, id=(len(ops) + 1, "a"), value="x")
+
+    async def run() -> float:
+        await svc.preload("doc")
+        t0 = time.perf_counter()
+        await svc.apply_op(doc_id="doc", origin_client_id="a", client_msg_id="first", op=extra)
+        return time.perf_counter() - t0
+
+    gc.collect()
+    return asyncio.run(run()), 1
+
+
+@bench("checkpoint_capture")
+def _checkpoint_capture(full: bool) -> "tuple[float, int]":
+    ops = typing_ops(1_000_000 if full else 100_000)
+    rga = _rga_from(ops)
+    gc.collect()
+    return _timed(rga.checkpoint), len(ops)
+
+
+@bench("checkpoint_stall")
+def _checkpoint_stall(full: bool) -> "tuple[float, int]":
+    # The pause `_maybe_checkpoint` adds under the document lock: one capture
+    # after an interval of 1000 edits scattered over the document, each followed
+    # by a `materialize` as in `apply_op`. Reported per checkpoint, not per op.
+    rnd = random.Random(7)
+    rga = _rga_from(typing_ops(1_000_000 if full else 100_000))
+    rga.checkpoint()
+    for _ in range(1000):
+        if rnd.random() < 0.25:
+            rga.splice(rnd.randrange(len(rga)), 1, "", "b")
+        else:
+            rga.splice(rnd.randrange(len(rga) + 1), 0, "y", "b")
+        rga.materialize()
+    gc.collect()
+    return _timed(rga.checkpoint), 1
+
+
+@bench("text_at_random_seq")
+def _text_at_random_seq(full: bool) -> "tuple[float, int]":
+    # Point-in-time reads spread over the whole history: mostly one checkpoint
+    # restore plus a replay of at most one interval per read, since random seqs
+    # rarely fall after a cached restore.
+    n = 100_000 if full else 20_000
+    reads = 20 if full else 10
+    policy = CheckpointPolicy(interval=1000, spacing="fixed", max_checkpoints=n)
+    svc = DocumentService(persistence=InMemoryPersistence(), check_invariants=False, checkpoint_policy=policy)
+    rnd = random.Random(7)
+    seqs = rnd.sample(range(n), reads)
+
+    async def run() -> float:
+        for i, op in enumerate(typing_ops(n)):
+            await svc.apply_op(doc_id="doc", origin_client_id="a", client_msg_id=f"m{i}", op=op)
+        t0 = time.perf_counter()
+        for seq in seqs:
+            await svc.get_text_at("doc", seq)
+        return time.perf_counter() - t0
+
+    gc.collect()
+    return asyncio.run(run()), reads
+
+
+@bench("text_at_near_head")
+def _text_at_near_head(full: bool) -> "tuple[float, int]":
+    # Reads within the last 5000 ops of a large document (a history scrubber).
+    # One untimed read restores a checkpoint; the timed reads reuse it, even
+    # across newer checkpoints, and only replay their own ops.
+    n = 400_000 if full else 50_000
+    reads = 20
+    svc = DocumentService(persistence=InMemoryPersistence(), check_invariants=False)
+    rnd = random.Random(7)
+
+    async def run() -> float:
+        await svc.apply_text_edits(doc_id="doc", origin_client_id="a", client_msg_id="i", base_server_seq=0, edits=[(0, 0, "x" * n)])
+        rga = RGA(check_invariants=False)
+        for rec in svc._persistence.get_ops_since("doc", 0) or []:
+            rga.integrate(rec.op)
+        for i in range(5000):
+            for op in rga.splice(rnd.randrange(len(rga) + 1), 0, "y", "b"):
+                await svc.apply_op(doc_id="doc", origin_client_id="b", client_msg_id=f"m{i}", op=op)
+        head = n + 5000
+        await svc.get_text_at("doc", head - 4999)
+        t0 = time.perf_counter()
+        for _ in range(reads):
+            await svc.get_text_at("doc", head - rnd.randrange(5000))
+        return time.perf_counter() - t0
+
+    gc.collect()
+    return asyncio.run(run()), reads
+
+
+# -- fan-out -------------------------------------------------------------------
+
+
+class _NullWebSocket:
+    async def send_text(self, data: str) -> None:
+        return None
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+def _broadcast(fanout: int) -> BenchFn:
+    def fn(full: bool) -> "tuple[float, int]":
+        messages = 1_000 if full else 200
+
+        async def run() -> float:
+            sessions = SessionManager()
+            conns = [Connection(websocket=_NullWebSocket(), client_id=f"c{i}") for i in range(fanout)]  # type: ignore[arg-type]
+            for c in conns:
+                await sessions.join(doc_id="doc", connection=c)
+            message = {"type": "op_echo", "doc_id": "doc", "server_seq": 0, "origin_client_id": "c0", "client_msg_id": "m"}
+            elapsed = 0.0
+            for i in range(messages):
+                message["server_seq"] = i
+                t0 = time.perf_counter()
+                await sessions.broadcast(doc_id="doc", message=message)
+                elapsed += time.perf_counter() - t0
+                # Drain outside the timed region so queues never fill up.
+                for c in conns:
+                    while not c.send_queue.empty():
+                        c.send_queue.get_nowait()
+            return elapsed
+
+        gc.collect()
+        return asyncio.run(run()), messages
+
+    return fn
+
+
+bench("broadcast_fanout_10")(_broadcast(10))
+bench("broadcast_fanout_100")(_broadcast(100))
+bench("broadcast_fanout_500")(_broadcast(500))
+
+
+@bench("presence_tick_500")
+def _presence_tick_500(full: bool) -> "tuple[float, int]":
+    # One room with 500 cursors, every cursor moving each tick: coalesce, build
+    # the update once and queue it to all 500 connections.
+    ticks = 100 if full else 20
+    cursors = 500
+
+    async def run() -> float:
+        sessions = SessionManager()
+        presence = PresenceManager()
+        conns = [Connection(websocket=_NullWebSocket(), client_id=f"c{i}") for i in range(cursors)]  # type: ignore[arg-type]
+        for c in conns:
+            await sessions.join(doc_id="doc", connection=c)
+        elapsed = 0.0
+        for t in range(ticks):
+            states = [
+                PresenceState(client_id=c.client_id, cursor=CursorAnchor(anchor_id=(t * cursors + i, c.client_id)))
+                for i, c in enumerate(conns)
+            ]
+            t0 = time.perf_counter()
+            for c, state in zip(conns, states):
+                presence.update("doc", c, state)
+            for msg in presence.drain():
+                await sessions.broadcast(msg.doc_id, msg.model_dump())
+            elapsed += time.perf_counter() - t0
+            for c in conns:
+                while not c.send_queue.empty():
+                    c.send_queue.get_nowait()
+        return elapsed
+
+    gc.collect()
+    return asyncio.run(run()), ticks
+
+
+# -- runner --------------------------------------------------------------------
+
+
+def run_one(name: str, full: bool = False, repeats: int = 5) -> BenchResult:
+    fn = _REGISTRY[name]
+    best: Optional[tuple[float, int]] = None
+    for _ in range(repeats):
+        seconds, ops = fn(full)
+        if best is None or seconds < best[0]:
+            best = (seconds, ops)
+    assert best is not None
+    seconds, ops = best
+    return BenchResult(name=name, ops=ops, seconds=seconds, us_per_op=seconds * 1e6 / ops)
+
+
+def run_suite(only: Optional[List[str]] = None, full: bool = False, repeats: int = 5) -> List[BenchResult]:
+    return [run_one(name, full=full, repeats=repeats) for name in (only or names(full))]
+
+
+def to_json(results: List[BenchResult], full: bool) -> dict:
+    return {
+        "mode": "full" if full else "quick",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {r.name: asdict(r) for r in results},
+    }
+
+
+def compare(results: List[BenchResult], baseline: dict, full: bool, threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    """Benchmarks whose us_per_op exceeds the baseline by more than `threshold`.
+
+    Raises `ValueError` if the baseline was recorded in the other mode: quick
+    and full runs share benchmark names but not sizes.
+    """
+    mode = "full" if full else "quick"
+    if baseline.get("mode", mode) != mode:
+        raise ValueError(f"baseline was recorded in {baseline['mode']} mode, this run is {mode}")
+    regressions: List[Regression] = []
+    base = baseline.get("results", {})
+    for r in results:
+        b = base.get(r.name)
+        if b is None:
+            continue
+        if r.us_per_op > b["us_per_op"] * (1 + threshold):
+            regressions.append(Regression(name=r.name, baseline_us=b["us_per_op"], current_us=r.us_per_op))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="production-scale sizes")
+    parser.add_argument("--only", nargs="*", choices=names(), help="run only these benchmarks")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or names(args.full):
+        r = run_one(name, full=args.full, repeats=args.repeats)
+        results.append(r)
+        print(f"{r.name:36s} {r.us_per_op:10.2f} us/op  ({r.ops} ops, {r.seconds:.3f}s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(to_json(results, args.full), f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare(results, baseline, args.full, args.threshold)
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            return 2
+        for reg in regressions:
+            print(f"REGRESSION {reg.name}: {reg.baseline_us:.2f} -> {reg.current_us:.2f} us/op ({reg.ratio:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
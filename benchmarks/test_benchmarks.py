@@ -0,0 +1,53 @@
+"""Run the benchmark suite under pytest.
+
+Benchmarks are skipped unless `COLLAB_BENCH=1` is set, so a plain `pytest` run
+stays fast. Optional environment variables:
+
+- `COLLAB_BENCH_FULL=1`: production-scale sizes.
+- `COLLAB_BENCH_OUTPUT=path.json`: write results JSON after the run.
+- `COLLAB_BENCH_BASELINE=path.json`: fail benchmarks that regress against it.
+- `COLLAB_BENCH_THRESHOLD=0.25`: allowed slowdown before failing.
+"""
+
+import json
+import os
+from typing import Dict
+
+import pytest
+
+import suite
+
+
+_ENABLED = os.environ.get("COLLAB_BENCH") == "1"
+_FULL = os.environ.get("COLLAB_BENCH_FULL") == "1"
+
+pytestmark = pytest.mark.skipif(not _ENABLED, reason="set COLLAB_BENCH=1 to run benchmarks")
+
+_results: Dict[str, suite.BenchResult] = {}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _write_results():
+    yield
+    output = os.environ.get("COLLAB_BENCH_OUTPUT")
+    if output and _results:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(suite.to_json(list(_results.values()), _FULL), f, indent=2, sort_keys=True)
+
+
+@pytest.mark.parametrize("name", suite.names(_FULL))
+def test_benchmark(name: str) -> None:
+    result = suite.run_one(name, full=_FULL)
+    _results[name] = result
+
+    baseline_path = os.environ.get("COLLAB_BENCH_BASELINE")
+    if not baseline_path:
+        return
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    threshold = float(os.environ.get("COLLAB_BENCH_THRESHOLD", suite.DEFAULT_THRESHOLD))
+    regressions = suite.compare([result], baseline, _FULL, threshold)
+    assert not regressions, (
+        f"{name} regressed: {regressions[0].baseline_us:.2f} -> {regressions[0].current_us:.2f} us/op "
+        f"({regressions[0].ratio:.2f}x, threshold {threshold:.0%})"
+    )
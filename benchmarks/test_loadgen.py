@@ -0,0 +1,51 @@
+"""Smoke run of the WebSocket load generator.
+
+A short in-process run with a reconnect storm, a slow consumer and cursor
+traffic; every CRDT replica must converge to the server's snapshot. The
+500-cursor room runs only with `COLLAB_BENCH=1`.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("websockets")
+
+import loadgen  # noqa: E402
+
+
+def test_short_soak_converges() -> None:
+    cfg = loadgen.LoadConfig(
+        docs=2,
+        clients_per_doc=3,
+        duration=1.5,
+        typing_rate=20.0,
+        slow_clients=1,
+        slow_delay=0.01,
+        storm_at=0.5,
+        storm_downtime=0.2,
+        cursor_rate=10.0,
+    )
+    report = asyncio.run(loadgen.run_load(cfg))
+
+    assert report.converged, report.divergent_docs
+    assert report.ops_sent > 0
+    assert report.echoes_received == report.ops_sent
+    assert report.reconnects >= 1
+    assert report.latency_ms["p50"] >= 0
+    assert report.presence_sent > 0
+    assert report.presence_latency_ms
+
+
+@pytest.mark.skipif(os.environ.get("COLLAB_BENCH") != "1", reason="set COLLAB_BENCH=1 to run load tests")
+def test_500_cursors_one_room() -> None:
+    """500 connected clients moving cursors in one document, with light typing."""
+
+    cfg = loadgen.LoadConfig(docs=1, clients_per_doc=500, duration=5.0, typing_rate=0.02, cursor_rate=2.0)
+    report = asyncio.run(loadgen.run_load(cfg))
+
+    assert report.converged, report.divergent_docs
+    assert report.echoes_received == report.ops_sent
+    assert report.slow_disconnects == 0
+    assert report.presence_messages_received > 0
@@ -0,0 +1,25 @@
+"""Smoke run of the startup measurement.
+
+A small seeded server with warm-up enabled must become ready only after
+preloading both documents, and then serve their first ops.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("uvicorn")
+pytest.importorskip("websockets")
+
+import startup  # noqa: E402
+
+
+def test_warm_start_reports_ready_after_preload() -> None:
+    cfg = startup.StartupConfig(seed_docs=2, seed_ops=500, warm_docs=2, import_runs=1, optimize=True)
+    report = asyncio.run(startup.measure(cfg))
+
+    assert report.health["status"] == "ok"
+    assert report.health["warmup"]["warmed_docs"] == 2
+    assert report.ready_ms >= report.listen_ms
+    assert report.import_ms > 0
+    assert len(report.first_op_ms) == len(report.steady_op_ms) == 2
@@ -1,18 +1,34 @@
 import asyncio
 import logging
+import time
+from typing import Iterable, List
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from collab_engine.core.crdt.ids import replica_owner
+from collab_engine.core.crdt.pending import PendingBufferFull
 from collab_engine.core.protocol.messages import (
     ClientHello,
     ClientOp,
+    ClientPresenceUpdate,
+    DocumentTextResponse,
+    InsertOp,
+    PresenceState,
     ServerHelloAck,
     ServerOpEcho,
+    ServerPresenceSnapshot,
     ServerResync,
+    TextIngestRequest,
+    TextIngestResponse,
     parse_client_message,
 )
+from collab_engine.logging_config import OP_LOG_SAMPLE_EVERY
+from collab_engine.metrics import BROADCAST_SECONDS, PRESENCE_UPDATES_TOTAL, REGISTRY, SYNC_TOTAL, GaugeFamily
+from collab_engine.persistence.base import OpRecord
 from collab_engine.persistence.memory import InMemoryPersistence
-from collab_engine.services.document_service import DocumentService
+from collab_engine.services.document_service import SERVER_REPLICA_ID, DocumentService, IngestFailed
+from collab_engine.services.warmup import Warmup, WarmupStatus
+from collab_engine.session.presence import PresenceManager
 from collab_engine.session.session_manager import Connection, SessionManager
 
 logger = logging.getLogger(__name__)
@@ -22,6 +38,180 @@ router = APIRouter()
 _persistence = InMemoryPersistence()
 _document_service = DocumentService(persistence=_persistence)
 _sessions = SessionManager()
+_presence = PresenceManager()
+_presence_task: asyncio.Task[None] | None = None
+_warmup = Warmup(service=_document_service, persistence=_persistence)
+_warmup_task: asyncio.Task[None] | None = None
+
+# Above this many ops, replaying echoes costs more than sending the full text.
+_REPLAY_LIMIT = 500
+
+
+def _collect_gauges() -> Iterable[GaugeFamily]:
+    rooms = _sessions.room_stats()
+    docs = _document_service.doc_stats()
+    families: List[GaugeFamily] = [
+        GaugeFamily(
+            "collab_room_connections",
+            "Connections joined to a document room.",
+            [({"doc_id": r.doc_id}, r.connections) for r in rooms],
+        ),
+        GaugeFamily(
+            "collab_send_queue_messages",
+            "Outbound messages queued across a room's connections.",
+            [({"doc_id": r.doc_id}, r.queued_messages) for r in rooms],
+        ),
+        GaugeFamily(
+            "collab_send_queue_max_depth",
+            "Deepest outbound queue among a room's connections.",
+            [({"doc_id": r.doc_id}, r.max_queue_depth) for r in rooms],
+        ),
+        GaugeFamily(
+            "collab_doc_server_seq",
+            "Latest server_seq of a loaded document.",
+            [({"doc_id": d.doc_id}, d.server_seq) for d in docs],
+        ),
+        GaugeFamily(
+            "collab_doc_tombstone_ratio",
+            "Deleted elements over all integrated elements.",
+            [
+                ({"doc_id": d.doc_id}, d.tombstones / (d.visible + d.tombstones) if d.visible + d.tombstones else 0.0)
+                for d in docs
+            ],
+        ),
+        GaugeFamily(
+            "collab_pending_ops",
+            "Ops buffered waiting for a missing dependency.",
+            [({"doc_id": d.doc_id}, d.pending.inserts + d.pending.deletes) for d in docs],
+        ),
+        GaugeFamily(
+            "collab_pending_bytes",
+            "Approximate size of buffered ops.",
+            [({"doc_id": d.doc_id}, d.pending.bytes) for d in docs],
+        ),
+        GaugeFamily(
+            "collab_pending_oldest_age_seconds",
+            "Age of the oldest buffered op.",
+            [({"doc_id": d.doc_id}, d.pending.oldest_age_seconds or 0.0) for d in docs],
+        ),
+        GaugeFamily(
+            "collab_presence_clients",
+            "Clients with a live cursor or selection in a document room.",
+            [({"doc_id": doc_id}, n) for doc_id, n in _presence.counts().items()],
+        ),
+    ]
+    warmup = _warmup.status()
+    families += [
+        GaugeFamily("collab_ready", "1 once startup warm-up has finished.", [({}, 1 if warmup.ready else 0)]),
+        GaugeFamily("collab_warmup_docs", "Documents preloaded by startup warm-up.", [({}, warmup.warmed_docs)]),
+        GaugeFamily("collab_warmup_seconds", "Duration of startup warm-up so far.", [({}, warmup.seconds)]),
+    ]
+    return families
+
+
+REGISTRY.add_collector(_collect_gauges)
+
+
+def _ensure_presence_ticker() -> None:
+    # Started lazily so it binds to the server's running event loop.
+    global _presence_task
+    if _presence_task is None or _presence_task.done():
+        _presence_task = asyncio.create_task(_presence.run(_sessions.broadcast))
+
+
+async def stop_presence() -> None:
+    global _presence_task
+    if _presence_task is not None:
+        _presence_task.cancel()
+        await asyncio.gather(_presence_task, return_exceptions=True)
+        _presence_task = None
+
+
+def start_warmup(top_k: int) -> None:
+    """Preload the `top_k` most recently active documents in the background."""
+    global _warmup_task
+    if top_k <= 0 or _warmup_task is not None:
+        return
+    _warmup.begin()
+    _warmup_task = asyncio.create_task(_warmup.run(top_k))
+
+
+async def stop_warmup() -> None:
+    global _warmup_task
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+        await asyncio.gather(_warmup_task, return_exceptions=True)
+        _warmup_task = None
+
+
+def readiness() -> WarmupStatus:
+    return _warmup.status()
+
+
+async def _broadcast(doc_id: str, message: dict) -> None:
+    t0 = time.perf_counter()
+    await _sessions.broadcast(doc_id=doc_id, message=message)
+    BROADCAST_SECONDS.observe(time.perf_counter() - t0)
+
+
+async def ingest_text(doc_id: str, request: TextIngestRequest) -> TextIngestResponse:
+    """Integrate plain-text edits for `doc_id` and fan the resulting ops out to its room.
+
+    Raises `BaseSeqMismatch` if `request.base_server_seq` is stale, `EditTooLarge`
+    if the edits touch too many characters and `ValueError` if an edit is out of
+    range or cannot be applied. Ops of edits applied before a failing one are
+    still fanned out.
+    """
+    edits = None
+    if request.edits is not None:
+        edits = [(e.position, e.delete_len, e.insert_text) for e in request.edits]
+    try:
+        records = await _document_service.apply_text_edits(
+            doc_id=doc_id,
+            origin_client_id=request.client_id,
+            client_msg_id=request.client_msg_id,
+            base_server_seq=request.base_server_seq,
+            edits=edits,
+            full_text=request.full_text,
+        )
+    except IngestFailed as exc:
+        await _fan_out(doc_id, exc.records)
+        raise
+    await _fan_out(doc_id, records)
+
+    server_seq = records[-1].server_seq if records else request.base_server_seq
+    return TextIngestResponse(doc_id=doc_id, server_seq=server_seq, ops=len(records))
+
+
+async def _fan_out(doc_id: str, records: List[OpRecord]) -> None:
+    if len(records) > _REPLAY_LIMIT:
+        full_text, server_seq = _document_service.get_snapshot(doc_id=doc_id)
+        await _broadcast(
+            doc_id=doc_id,
+            message=ServerResync(doc_id=doc_id, server_seq=server_seq, full_text=full_text).model_dump(),
+        )
+    else:
+        for rec in records:
+            echo = ServerOpEcho(
+                doc_id=doc_id,
+                server_seq=rec.server_seq,
+                origin_client_id=rec.origin_client_id,
+                client_msg_id=rec.client_msg_id,
+                op=rec.op,
+            )
+            await _broadcast(doc_id=doc_id, message=echo.model_dump())
+
+
+async def read_text(doc_id: str, at: int | None = None) -> DocumentTextResponse:
+    """Text of `doc_id` now, or as of server_seq `at`.
+
+    Raises `ValueError` if `at` is outside `0..server_seq`.
+    """
+    if at is None:
+        full_text, server_seq = _document_service.get_snapshot(doc_id=doc_id)
+        return DocumentTextResponse(doc_id=doc_id, server_seq=server_seq, full_text=full_text)
+    full_text = await _document_service.get_text_at(doc_id=doc_id, server_seq=at)
+    return DocumentTextResponse(doc_id=doc_id, server_seq=at, full_text=full_text)
 
 
 @router.websocket("/ws")
@@ -52,6 +242,7 @@ async def ws_endpoint(websocket: WebSocket) -> None:
         writer_task = asyncio.create_task(conn.writer_loop())
 
         await _sessions.join(doc_id=msg.doc_id, connection=conn)
+        _ensure_presence_ticker()
 
         current_seq = _document_service.get_server_seq(doc_id=msg.doc_id)
         hello_ack = ServerHelloAck(doc_id=msg.doc_id, server_seq=current_seq)
@@ -63,7 +254,7 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                 extra={"doc_id": doc_id, "client_id": client_id, "server_seq": current_seq},
             )
             replay = _persistence.get_ops_since(doc_id=msg.doc_id, since_server_seq=msg.last_seen_server_seq)
-            if replay is not None and len(replay) <= 500:
+            if replay is not None and len(replay) <= _REPLAY_LIMIT:
                 for rec in replay:
                     await conn.send_json(
                         ServerOpEcho(
@@ -74,6 +265,7 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                             op=rec.op,
                         ).model_dump()
                     )
+                SYNC_TOTAL.labels("replay").inc()
                 logger.info(
                     "ws replay done",
                     extra={"doc_id": doc_id, "client_id": client_id, "server_seq": current_seq},
@@ -84,6 +276,7 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                     "ws resync (replay unavailable)",
                     extra={"doc_id": doc_id, "client_id": client_id, "server_seq": server_seq},
                 )
+                SYNC_TOTAL.labels("resync").inc()
                 await conn.send_json(ServerResync(doc_id=msg.doc_id, server_seq=server_seq, full_text=full_text).model_dump())
         else:
             full_text, server_seq = _document_service.get_snapshot(doc_id=msg.doc_id)
@@ -91,8 +284,14 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                 "ws resync",
                 extra={"doc_id": doc_id, "client_id": client_id, "server_seq": server_seq},
             )
+            SYNC_TOTAL.labels("initial").inc()
             await conn.send_json(ServerResync(doc_id=msg.doc_id, server_seq=server_seq, full_text=full_text).model_dump())
 
+        # After the document state, so anchors refer to elements the client knows.
+        await conn.send_json(
+            ServerPresenceSnapshot(doc_id=msg.doc_id, presences=_presence.snapshot(msg.doc_id)).model_dump()
+        )
+
         while True:
             raw = await websocket.receive_text()
             try:
@@ -105,7 +304,7 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                 await websocket.close(code=1002, reason="protocol: invalid message")
                 return
 
-            if isinstance(client_msg, ClientOp):
+            if isinstance(client_msg, (ClientOp, ClientPresenceUpdate)):
                 if doc_id is None or client_msg.doc_id != doc_id:
                     logger.warning(
                         "ws protocol violation: doc_id mismatch",
@@ -122,17 +321,58 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                     await websocket.close(code=1008, reason="protocol: client_id mismatch")
                     return
 
-                server_seq = await _document_service.apply_op(
-                    doc_id=client_msg.doc_id,
-                    origin_client_id=client_msg.client_id,
-                    client_msg_id=client_msg.client_msg_id,
-                    op=client_msg.op,
-                )
+                if isinstance(client_msg, ClientPresenceUpdate):
+                    PRESENCE_UPDATES_TOTAL.inc()
+                    _presence.update(
+                        doc_id,
+                        conn,
+                        PresenceState(client_id=client_id, cursor=client_msg.cursor, selection=client_msg.selection),
+                    )
+                    continue
 
-                logger.info(
-                    "op integrated",
-                    extra={"doc_id": doc_id, "client_id": client_id, "server_seq": server_seq},
-                )
+                # Ids owned by the server (splice ids and their low aliases) are only
+                # minted by text ingestion; a client reusing one could collide with
+                # them. Deleting server-owned elements is fine.
+                op = client_msg.op
+                if isinstance(op, InsertOp) and replica_owner(op.id[1]) == SERVER_REPLICA_ID:
+                    logger.warning(
+                        "ws protocol violation: server replica id",
+                        extra={"doc_id": doc_id or "-", "client_id": client_id or "-"},
+                    )
+                    await websocket.close(code=1008, reason="protocol: replica id reserved for the server")
+                    return
+
+                # Server ids are predictable. An op buffered on one the server has not
+                # minted yet would take effect on whatever ingestion later puts there.
+                target = op.parent_id if isinstance(op, InsertOp) else op.id
+                if replica_owner(target[1]) == SERVER_REPLICA_ID and not _document_service.has_element(doc_id, target):
+                    logger.warning(
+                        "ws protocol violation: unknown server element",
+                        extra={"doc_id": doc_id or "-", "client_id": client_id or "-"},
+                    )
+                    await websocket.close(code=1008, reason="protocol: unknown server element")
+                    return
+
+                try:
+                    server_seq = await _document_service.apply_op(
+                        doc_id=client_msg.doc_id,
+                        origin_client_id=client_msg.client_id,
+                        client_msg_id=client_msg.client_msg_id,
+                        op=client_msg.op,
+                    )
+                except PendingBufferFull:
+                    logger.warning(
+                        "ws protocol violation: pending buffer full",
+                        extra={"doc_id": doc_id or "-", "client_id": client_id or "-"},
+                    )
+                    await websocket.close(code=1008, reason="protocol: too many unresolved dependencies")
+                    return
+
+                if server_seq % OP_LOG_SAMPLE_EVERY == 0 and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "op integrated",
+                        extra={"doc_id": doc_id, "client_id": client_id, "server_seq": server_seq},
+                    )
 
                 echo = ServerOpEcho(
                     doc_id=client_msg.doc_id,
@@ -141,7 +381,7 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                     client_msg_id=client_msg.client_msg_id,
                     op=client_msg.op,
                 )
-                await _sessions.broadcast(doc_id=client_msg.doc_id, message=echo.model_dump())
+                await _broadcast(doc_id=client_msg.doc_id, message=echo.model_dump())
             else:
                 logger.warning(
                     "ws protocol violation: unexpected message type",
@@ -160,6 +400,8 @@ async def ws_endpoint(websocket: WebSocket) -> None:
             pass
     finally:
         if conn is not None:
+            if doc_id is not None and client_id is not None:
+                _presence.remove(doc_id, client_id, conn)
             await _sessions.leave_any(connection=conn)
             conn.close()
         if writer_task is not None:
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+"""Per-document replica table and packed element ids.
+
+On the wire an `ElementId` is a `(lamport: int, replica_id: str)` tuple. Keeping
+those tuples as dictionary keys means every integrated element holds its own
+tuple plus a reference to a replica string, and every lookup hashes a tuple and
+compares strings.
+
+Inside the CRDT we instead represent ids as a single packed integer:
+
+    packed = (lamport << REPLICA_BITS) | replica_index
+
+where `replica_index` is the position of the replica id in a per-document
+`ReplicaTable`. Dict lookups and equality checks are then plain integer
+operations, and each replica string is stored exactly once per document.
+
+## Ordering
+
+Replica indexes are assigned in arrival order, which differs between replicas,
+so packed integers are NOT ordered like the wire tuples. Anything that needs the
+deterministic `(lamport, replica_id)` order (sibling ordering in `RGA`) must use
+`ReplicaTable.sort_key`, which restores exactly the tuple ordering.
+
+The lamport still occupies the high bits, though, so comparing packed integers
+orders them correctly by lamport. `ReplicaTable.insertion_point` relies on this
+to binary-search a sorted list with plain integer comparisons and only looks at
+replica names among ids with equal lamports.
+
+## Low aliases
+
+An insert lands directly after its parent only if its id sorts below the
+parent's existing children. Lamports are never negative, so below lamport 0 the
+only room left is in the replica name. `low_replica_id(owner, rank)` returns an
+alias of `owner` that sorts below every ordinary replica id, and below the
+aliases with a greater rank. `replica_owner` maps an alias back to its owner.
+
+Messages from clients may only carry aliases ranked `LOW_RANK_WIRE_MIN` or
+higher, and no replica id sorting below the alias space (see
+`parse_client_message`). Whatever a client sends, the server then has at least
+`LOW_RANK_WIRE_MIN` ranks left below it.
+"""
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+if TYPE_CHECKING:
+    # `messages` validates wire ids against the alias format defined here.
+    from collab_engine.core.protocol.messages import ElementId
+
+
+REPLICA_BITS = 32
+REPLICA_MASK = (1 << REPLICA_BITS) - 1
+
+_LOW_PREFIX = "\x00"
+_LOW_DIGITS = 12
+LOW_RANK_MAX = 10**_LOW_DIGITS - 1
+LOW_RANK_WIRE_MIN = (LOW_RANK_MAX + 1) // 2
+
+
+def low_replica_id(owner: str, rank: int) -> str:
+    """Alias of `owner` that sorts below ordinary replica ids, ordered by `rank`."""
+    if not 0 <= rank <= LOW_RANK_MAX:
+        raise ValueError("low alias rank out of range")
+    return f"{_LOW_PREFIX}{rank:0{_LOW_DIGITS}d}{owner}"
+
+
+def low_rank(replica_id: str) -> int | None:
+    """Rank of a low alias, or None for an ordinary replica id."""
+    digits = replica_id[1 : 1 + _LOW_DIGITS]
+    if replica_id[:1] != _LOW_PREFIX or len(digits) != _LOW_DIGITS or not digits.isdigit():
+        return None
+    return int(digits)
+
+
+def check_wire_replica_id(replica_id: str) -> None:
+    """Raise `ValueError` unless a client may send ids under `replica_id`."""
+    if not replica_id:
+        raise ValueError("replica_id must not be empty")
+    if replica_id[0] == _LOW_PREFIX:
+        rank = low_rank(replica_id)
+        if rank is None or rank < LOW_RANK_WIRE_MIN:
+            raise ValueError("replica_id sorts below the ids the server can allocate")
+
+
+def replica_owner(replica_id: str) -> str:
+    """The replica that owns `replica_id`: itself, or the owner of a low alias."""
+    if low_rank(replica_id) is None:
+        return replica_id
+    return replica_id[1 + _LOW_DIGITS :]
+
+
+class ReplicaTable:
+    """Interns replica ids for one document and packs/unpacks element ids."""
+
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, replica_id: str) -> int:
+        """Return the index for `replica_id`, assigning a new one if needed."""
+        idx = self._index.get(replica_id)
+        if idx is not None:
+            return idx
+        idx = len(self._names)
+        if idx > REPLICA_MASK:
+            raise ValueError("replica table full")
+        self._names.append(replica_id)
+        self._index[replica_id] = idx
+        return idx
+
+    def name(self, index: int) -> str:
+        return self._names[index]
+
+    def names(self) -> List[str]:
+        """Replica ids in index order; interning them in this order rebuilds the table."""
+        return list(self._names)
+
+    def pack(self, element_id: ElementId) -> int:
+        """Pack an element id, interning its replica id if it is new."""
+        lamport, replica_id = element_id
+        idx = self._index.get(replica_id)
+        if idx is None:
+            idx = self.intern(replica_id)
+        return (lamport << REPLICA_BITS) | idx
+
+    def lookup(self, element_id: ElementId) -> int | None:
+        """Pack an element id without interning; None if the replica is unknown."""
+        lamport, replica_id = element_id
+        idx = self._index.get(replica_id)
+        if idx is None:
+            return None
+        return (lamport << REPLICA_BITS) | idx
+
+    def unpack(self, packed: int) -> ElementId:
+        return (packed >> REPLICA_BITS, self._names[packed & REPLICA_MASK])
+
+    def sort_key(self, packed: int) -> ElementId:
+        """Deterministic ordering key for a packed id (same as wire tuple order)."""
+        return (packed >> REPLICA_BITS, self._names[packed & REPLICA_MASK])
+
+    def insertion_point(self, ordered: Sequence[int], packed: int) -> int:
+        """Index at which `packed` belongs in `ordered`, a list sorted by `sort_key`.
+
+        Same result as `bisect_left(ordered, sort_key(packed), key=sort_key)`.
+        """
+        floor = packed & ~REPLICA_MASK
+        lo = bisect_left(ordered, floor)
+        hi = bisect_left(ordered, floor + (1 << REPLICA_BITS), lo)
+        if hi == lo:
+            return lo
+        names = self._names
+        return bisect_left(ordered, names[packed & REPLICA_MASK], lo, hi, key=lambda p: names[p & REPLICA_MASK])
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+"""Bounded buffer for operations whose causal dependency has not arrived yet.
+
+`RGA` buffers an insert whose parent is unknown and a delete whose target is
+unknown. Without bounds a buggy or malicious client can fill memory by sending
+inserts with invented parents, so the buffer enforces per-document limits on
+the number of buffered ops and their approximate retained size, and can
+optionally expire entries that waited too long.
+
+All keys are wire `ElementId` tuples rather than packed ids. Buffering an op
+therefore never interns its replica ids, so an op rejected with
+`PendingBufferFull` (or one that is never released) leaves no trace in the
+document's `ReplicaTable`.
+
+## Expiry
+
+Expiry drops an op for good, while every other replica that received it may
+still integrate it once its dependency shows up. So expiry breaks convergence
+with any replica that shares the op. It is only safe when nothing else
+sequences, persists or forwards the buffered ops; `DocumentService` does all
+three and refuses limits with expiry.
+
+## Introspection
+
+`PendingBuffer.stats()` reports counts, approximate bytes, the age of the
+oldest buffered op and the dependency it is waiting for. A non-empty buffer
+with a growing oldest age is a causality gap worth alerting on.
+
+## Bookkeeping
+
+Every buffered op is tracked by a `_PendingEntry` that is also appended to an
+arrival-ordered deque. Released entries are only flagged dead and are dropped
+from the deque lazily, which keeps release O(1) while making "oldest entry"
+and expiry amortized O(1).
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from collab_engine.core.protocol.messages import DeleteOp, ElementId, InsertOp, Op
+
+
+# Approximate retained size of a buffered op (op model, entry, index slots),
+# excluding the inserted text itself.
+_INSERT_ENTRY_BYTES = 256
+_DELETE_ENTRY_BYTES = 128
+
+
+class PendingBufferFull(Exception):
+    """Raised when buffering an op would exceed the configured limits."""
+
+
+@dataclass(frozen=True)
+class PendingLimits:
+    max_ops: int = 10_000
+    max_bytes: int = 4 * 1024 * 1024
+    # None disables expiry; expired ops are dropped and never integrated, which
+    # diverges from replicas that keep them (see "Expiry" above).
+    max_age_seconds: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class PendingStats:
+    inserts: int
+    deletes: int
+    bytes: int
+    missing_dependencies: int
+    oldest_age_seconds: Optional[float]
+    oldest_missing_dependency: Optional[ElementId]
+
+
+@dataclass(slots=True, eq=False)
+class _PendingEntry:
+    key: ElementId
+    op_key: ElementId
+    op: Optional[InsertOp]
+    size: int
+    arrived: float
+    live: bool = True
+
+
+class PendingBuffer:
+    """Buffered inserts (keyed by missing parent) and deletes (keyed by missing target)."""
+
+    def __init__(self, limits: PendingLimits | None = None) -> None:
+        self.limits = limits or PendingLimits()
+        self.inserts: Dict[ElementId, List[_PendingEntry]] = {}
+        self.deletes: Dict[ElementId, _PendingEntry] = {}
+        self._insert_ids: Dict[ElementId, _PendingEntry] = {}
+        self._order: Deque[_PendingEntry] = deque()
+        self._ops = 0
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return self._ops
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def has_insert(self, op_key: ElementId) -> bool:
+        """True if an insert with id `op_key` is buffered."""
+        return op_key in self._insert_ids
+
+    def is_awaited(self, key: ElementId) -> bool:
+        """True if a buffered insert or delete waits for `key` to be integrated."""
+        return key in self.inserts or key in self.deletes
+
+    def add_insert(self, parent_key: ElementId, op_key: ElementId, op: InsertOp) -> None:
+        """Buffer `op` until `parent_key` is integrated. Duplicate ops are ignored."""
+        if op_key in self._insert_ids:
+            return
+        entry = self._admit(parent_key, op_key, op, _INSERT_ENTRY_BYTES + len(op.value))
+        self.inserts.setdefault(parent_key, []).append(entry)
+        self._insert_ids[op_key] = entry
+
+    def add_delete(self, key: ElementId) -> None:
+        """Buffer a delete of `key` until it is integrated. Duplicates are ignored."""
+        if key in self.deletes:
+            return
+        self.deletes[key] = self._admit(key, key, None, _DELETE_ENTRY_BYTES)
+
+    def release_inserts(self, parent_key: ElementId) -> List[InsertOp]:
+        """Remove and return the inserts waiting for `parent_key`."""
+        entries = self.inserts.pop(parent_key, None)
+        if not entries:
+            return []
+        ops: List[InsertOp] = []
+        for e in entries:
+            self._retire(e)
+            del self._insert_ids[e.op_key]
+            ops.append(e.op)  # type: ignore[arg-type]
+        return ops
+
+    def release_delete(self, key: ElementId) -> bool:
+        """Remove a buffered delete of `key`; True if one was waiting."""
+        entry = self.deletes.pop(key, None)
+        if entry is None:
+            return False
+        self._retire(entry)
+        return True
+
+    def expire(self, now: float | None = None) -> int:
+        """Drop entries older than `limits.max_age_seconds`; returns how many."""
+        max_age = self.limits.max_age_seconds
+        if max_age is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        dropped = 0
+        order = self._order
+        while order:
+            e = order[0]
+            if e.live and now - e.arrived <= max_age:
+                break
+            order.popleft()
+            if not e.live:
+                continue
+            self._retire(e)
+            if e.op is None:
+                del self.deletes[e.key]
+            else:
+                siblings = self.inserts[e.key]
+                siblings.remove(e)
+                if not siblings:
+                    del self.inserts[e.key]
+                del self._insert_ids[e.op_key]
+            dropped += 1
+        return dropped
+
+    def buffered(self) -> List[Op]:
+        """Every buffered op, in arrival order."""
+        return [e.op if e.op is not None else DeleteOp(type="del", id=e.key) for e in self._order if e.live]
+
+    def stats(self, now: float | None = None) -> PendingStats:
+        oldest = self._oldest()
+        age: Optional[float] = None
+        missing: Optional[ElementId] = None
+        if oldest is not None:
+            now = time.monotonic() if now is None else now
+            age = now - oldest.arrived
+            missing = oldest.key
+        return PendingStats(
+            inserts=len(self._insert_ids),
+            deletes=len(self.deletes),
+            bytes=self._bytes,
+            missing_dependencies=len(self.inserts.keys() | self.deletes.keys()),
+            oldest_age_seconds=age,
+            oldest_missing_dependency=missing,
+        )
+
+    def _admit(self, key: ElementId, op_key: ElementId, op: Optional[InsertOp], size: int) -> _PendingEntry:
+        now = time.monotonic()
+        if self.limits.max_age_seconds is not None:
+            self.expire(now)
+        if self._ops + 1 > self.limits.max_ops:
+            raise PendingBufferFull(f"pending ops limit reached ({self.limits.max_ops})")
+        if self._bytes + size > self.limits.max_bytes:
+            raise PendingBufferFull(f"pending bytes limit reached ({self.limits.max_bytes})")
+        entry = _PendingEntry(key=key, op_key=op_key, op=op, size=size, arrived=now)
+        if len(self._order) > 2 * self._ops + 64:
+            # A long-lived entry at the head keeps dead ones from being dropped lazily.
+            self._order = deque(e for e in self._order if e.live)
+        self._order.append(entry)
+        self._ops += 1
+        self._bytes += size
+        return entry
+
+    def _retire(self, entry: _PendingEntry) -> None:
+        entry.live = False
+        self._ops -= 1
+        self._bytes -= entry.size
+        if not self._ops:
+            self._order.clear()
+
+    def _oldest(self) -> Optional[_PendingEntry]:
+        order = self._order
+        while order and not order[0].live:
+            order.popleft()
+        return order[0] if order else None
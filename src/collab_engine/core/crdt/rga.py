@@ -17,14 +17,47 @@ Concurrent inserts after the same `parent_id` are ordered by the total ordering
 `ElementId` (Python tuple ordering of `(lamport: int, replica_id: str)`), making the
 resulting sequence deterministic across replicas given the same set of operations.
 
+## Id representation
+
+Wire `ElementId` tuples are packed into integers through a per-document
+`ReplicaTable` (see `collab_engine.core.crdt.ids`). All internal structures
+(`_nodes`, `_children`) are keyed by packed ids; sibling order is tuple
+ordering, found with `ReplicaTable.insertion_point`. The pending buffer is the
+exception: it keys by wire ids, so only integrated elements intern replicas.
+
 ## Buffering safety
 
 Operations may arrive out of causal order.
 
 - If an insert arrives before its `parent_id` exists locally, it is buffered under
-  `_pending_inserts[parent_id]` until the parent is integrated.
+  `_pending.inserts[parent_id]` until the parent is integrated.
 - If a delete arrives before the target id exists locally, it is buffered in
-  `_pending_deletes` until the id is integrated.
+  `_pending.deletes` until the id is integrated.
+
+The buffer is bounded by `PendingLimits` (see `collab_engine.core.crdt.pending`);
+an op that would exceed the limits raises `PendingBufferFull` before any state
+changes. Releasing a buffered chain uses an explicit work list, and
+`materialize` walks the tree iteratively, so long insert chains (e.g. sequential
+typing) never hit the recursion limit.
+
+## Checkpoints
+
+`checkpoint()` captures the state as an immutable `RGAState`: the index's Euler
+tour, the visible text, the tombstoned ids and any buffered ops. The tour and
+the tombstones are per-block tuples that the index caches until a block
+changes, so a checkpoint shares every unchanged block with the previous one.
+Capturing costs O(blocks + changed blocks) plus one join of the cached text,
+which is cheap enough to do under the document lock. `RGA.from_checkpoint`
+rebuilds an equivalent replica in one linear pass instead of re-integrating
+every op. Tombstone characters are not kept (nothing reads them), so restored
+tombstones have an empty `value`.
+
+## Document order
+
+Alongside the tree, a `SequenceIndex` (see `collab_engine.core.crdt.sequence`)
+keeps the preorder incrementally, so `materialize` and visible-position lookups
+do not walk the whole tree. `splice` uses it to turn a plain-text edit into
+CRDT ops.
 
 Buffering is safe because:
 
@@ -33,21 +66,52 @@ Buffering is safe because:
   same result as if they had arrived in causal order.
 """
 
+import gc
+from bisect import bisect_left
 from dataclasses import dataclass
-from typing import Dict, List, Set
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, List
 
+from collab_engine.core.crdt.ids import LOW_RANK_MAX, REPLICA_BITS, ReplicaTable, low_rank, low_replica_id
+from collab_engine.core.crdt.pending import PendingBuffer, PendingLimits, PendingStats
+from collab_engine.core.crdt.sequence import SequenceIndex
 from collab_engine.core.protocol.messages import DeleteOp, ElementId, InsertOp, Op
 
 
 ROOT_ID: ElementId = (0, "root")
 
 
-@dataclass(frozen=True)
+@dataclass(slots=True)
 class _Node:
-    id: ElementId
-    parent_id: ElementId
+    parent_id: int
     value: str
     deleted: bool = False
+    # Owned by `SequenceIndex`: the blocks holding this node's open and close
+    # markers. Keeping them here avoids a marker -> block dict.
+    open_block: Any = None
+    close_block: Any = None
+
+
+@dataclass(frozen=True)
+class RGAState:
+    """Compact immutable copy of an `RGA`, for checkpoints.
+
+    `tour` holds packed ids (valid under `replicas`, in index order) as the
+    `SequenceIndex` Euler tour in blocks, root markers included. `text` is the
+    visible text, i.e. the values of the non-tombstoned elements in tour order.
+    `tombstones` holds the tombstoned packed ids, also in blocks. Block tuples
+    may be shared with other checkpoints of the same replica.
+    """
+
+    replicas: tuple[str, ...]
+    tour: tuple[tuple[int, ...], ...]
+    text: str
+    tombstones: tuple[tuple[int, ...], ...]
+    pending: tuple[Op, ...]
+
+    def __len__(self) -> int:
+        """Integrated elements, tombstones included."""
+        return sum(len(block) for block in self.tour) // 2 - 1
 
 
 class RGA:
@@ -68,20 +132,27 @@ class RGA:
     - **Tombstone monotonicity**: once a node is marked deleted, it never becomes
       non-deleted.
     - **Pending structures only reference missing dependencies**:
-      - `_pending_inserts` keys are parent ids not (yet) present in `_nodes` at the
+      - `_pending.inserts` keys are parent ids not (yet) present in `_nodes` at the
         time they were buffered.
-      - `_pending_deletes` contains ids not present in `_nodes` at the time they were
+      - `_pending.deletes` contains ids not present in `_nodes` at the time they were
         buffered.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, check_invariants: bool = __debug__, pending_limits: PendingLimits | None = None) -> None:
+        # `check_invariants` re-validates the whole structure after every op (O(n));
+        # benchmarks and bulk loaders turn it off.
         # TODO(phase2): Use chunked inserts (strings) instead of single-character inserts to reduce overhead.
         # TODO(phase2): Implement tombstone compaction / garbage collection once causal stability is tracked.
-        self._nodes: Dict[ElementId, _Node] = {ROOT_ID: _Node(id=ROOT_ID, parent_id=ROOT_ID, value="", deleted=True)}
-        self._children: Dict[ElementId, List[ElementId]] = {ROOT_ID: []}
+        self._replicas = ReplicaTable()
+        self._root = self._replicas.pack(ROOT_ID)
+        self._nodes: Dict[int, _Node] = {self._root: _Node(parent_id=self._root, value="", deleted=True)}
+        self._children: Dict[int, List[int]] = {self._root: []}
+        self._index = SequenceIndex(self._nodes, self._root)
+        self._tombstone_count = 0
+        self._max_lamport = 0
 
-        self._pending_inserts: Dict[ElementId, List[InsertOp]] = {}
-        self._pending_deletes: Set[ElementId] = set()
+        self._pending = PendingBuffer(pending_limits)
+        self._check_invariants = check_invariants
 
     def integrate(self, op: Op) -> None:
         """Integrate a single CRDT operation.
@@ -92,85 +163,430 @@ class RGA:
         """
         if isinstance(op, InsertOp):
             self._integrate_insert(op)
-            if __debug__:
+            if self._check_invariants:
                 self._assert_invariants()
             return
         if isinstance(op, DeleteOp):
             self._integrate_delete(op)
-            if __debug__:
+            if self._check_invariants:
                 self._assert_invariants()
             return
         raise TypeError("unknown op")
 
     def materialize(self) -> str:
         """Materialize the current sequence as plain text."""
-        out: list[str] = []
-        self._dfs(ROOT_ID, out)
-        return "".join(out)
+        return self._index.text()
+
+    def __len__(self) -> int:
+        """Number of visible elements."""
+        return len(self._index)
+
+    def tombstone_count(self) -> int:
+        """Number of integrated elements that have been deleted (root excluded)."""
+        return self._tombstone_count
+
+    def splice(self, position: int, delete_len: int, insert_text: str, replica_id: str) -> List[Op]:
+        """Apply a plain-text edit and return the CRDT ops that express it.
+
+        Deletes `delete_len` visible elements starting at `position`, then inserts
+        `insert_text` at `position`. New elements get ids owned by `replica_id`
+        (possibly through a low alias, see `collab_engine.core.crdt.ids`); the
+        caller must ensure no other replica uses that id or its aliases. The
+        returned ops are already integrated, in an order that integrates cleanly on
+        any replica. Raises `ValueError` without changing anything if the edit is
+        out of range or no free id sorts at the insertion point.
+
+        Post-condition: the state invariants documented on the class hold (checked
+        once per call rather than per generated op).
+        """
+        if position < 0 or delete_len < 0 or position + delete_len > len(self._index):
+            raise ValueError("edit out of range")
+
+        if insert_text:
+            # Picked before anything changes, so a splice that finds no free id
+            # leaves the replica untouched. Deleting the text after the parent
+            # does not change the parent's children.
+            parent_id = self._index.id_at(position - 1) if position else self._root
+            kids = self._children[parent_id]
+            if kids:
+                # Children are visited in ascending id order, so landing directly
+                # after the parent needs an id below its current first child.
+                element_id = self._id_below(self._replicas.unpack(kids[0]), replica_id)
+            else:
+                element_id = self._next_id(replica_id)
+
+        ops: List[Op] = []
+        if delete_len:
+            doomed = list(islice(self._index.iter_visible(position), delete_len))
+            for node_id in doomed:
+                op = DeleteOp(type="del", id=self._replicas.unpack(node_id))
+                self._integrate_delete(op)
+                ops.append(op)
+
+        if insert_text:
+            parent = self._replicas.unpack(parent_id)
+            for ch in insert_text:
+                ops.append(InsertOp(type="ins", parent_id=parent, id=element_id, value=ch))
+                op_id = self._replicas.pack(element_id)
+                self._place_and_drain(op_id, parent_id, ch)
+                parent = element_id
+                parent_id = op_id
+                element_id = self._next_id(replica_id)
+
+        if self._check_invariants:
+            self._assert_invariants()
+        return ops
+
+    def checkpoint(self) -> RGAState:
+        """Capture the current state; shares nothing mutable with `self`."""
+        return RGAState(
+            replicas=tuple(self._replicas.names()),
+            tour=self._index.tour(),
+            text=self._index.text(),
+            tombstones=self._index.tombstones(),
+            pending=tuple(self._pending.buffered()),
+        )
+
+    @classmethod
+    def from_checkpoint(
+        cls,
+        state: RGAState,
+        check_invariants: bool = __debug__,
+        pending_limits: PendingLimits | None = None,
+    ) -> "RGA":
+        """Rebuild a replica equivalent to the one `state` was captured from."""
+        rga = cls(check_invariants=check_invariants, pending_limits=pending_limits)
+        for name in state.replicas:
+            rga._replicas.intern(name)
+        if rga._replicas.names() != list(state.replicas):
+            raise ValueError("checkpoint replica table does not start with the root replica")
+
+        nodes = rga._nodes
+        children = rga._children
+        tombstones = set(chain.from_iterable(state.tombstones))
+        chars = iter(state.text)
+        stack = [rga._root]
+        push = stack.append
+        pop = stack.pop
+        # Millions of new container objects would otherwise trigger repeated
+        # full collections while nothing here can form a cycle.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            markers = chain.from_iterable(state.tour)
+            next(markers)  # root's open marker; its close marker pops `stack` empty
+            for m in markers:
+                if m & 1:
+                    pop()
+                    continue
+                node_id = m >> 1
+                parent_id = stack[-1]
+                if node_id in tombstones:
+                    nodes[node_id] = _Node(parent_id, "", True)
+                else:
+                    nodes[node_id] = _Node(parent_id, next(chars), False)
+                children[parent_id].append(node_id)
+                children[node_id] = []
+                push(node_id)
+            rga._index = SequenceIndex.from_tour(nodes, rga._root, state.tour)
+            rga._tombstone_count = len(tombstones)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        rga._max_lamport = max(nodes) >> REPLICA_BITS
+
+        for op in state.pending:
+            if isinstance(op, InsertOp):
+                rga._integrate_insert(op)
+            else:
+                rga._integrate_delete(op)
+        if check_invariants:
+            rga._assert_invariants()
+        return rga
+
+    def anchor_at(self, position: int) -> ElementId:
+        """Element a caret at visible `position` attaches to with `right` affinity.
+
+        Position 0 anchors to `ROOT_ID`; otherwise to the element before the caret.
+        """
+        if position < 0 or position > len(self._index):
+            raise ValueError("position out of range")
+        if position == 0:
+            return self._replicas.unpack(self._root)
+        return self._replicas.unpack(self._index.id_at(position - 1))
+
+    def resolve_anchor(self, anchor_id: ElementId, affinity: str = "right") -> int | None:
+        """Visible caret position for an anchor, or None if the element is unknown.
+
+        A tombstoned anchor still resolves, to where the element used to be.
+        """
+        packed = self._replicas.lookup(anchor_id)
+        if packed is None or packed not in self._nodes:
+            return None
+        position = self._index.position_of(packed)
+        if affinity == "right" and not self._nodes[packed].deleted:
+            position += 1
+        return position
+
+    def pending_stats(self) -> PendingStats:
+        """Counts, size and oldest missing dependency of buffered ops."""
+        return self._pending.stats()
 
     def has(self, element_id: ElementId) -> bool:
         """Return True iff the element id is integrated (not merely buffered)."""
-        return element_id in self._nodes
+        packed = self._replicas.lookup(element_id)
+        return packed is not None and packed in self._nodes
+
+    def text_after(self, ops: Iterable[Op]) -> str:
+        """Text this replica would have after integrating `ops`, leaving it unchanged.
+
+        New elements go into a small overlay keyed by wire ids instead of into the
+        replica, and their text is spliced into the current text at the index
+        markers they would be inserted before. This costs O(k log k + blocks) for
+        k ops, so one restored replica can serve many point-in-time reads.
+        """
+        replicas = self._replicas
+        nodes = self._nodes
+
+        def integrated(element_id: ElementId) -> int | None:
+            packed = replicas.lookup(element_id)
+            return packed if packed is not None and packed in nodes else None
+
+        values: Dict[ElementId, str] = {}
+        kids: Dict[ElementId, List[ElementId]] = {}
+        added_dead: set[ElementId] = set()
+        dead: set[int] = set()
+        waiting: Dict[ElementId, List[InsertOp]] = {}
+        waiting_deletes: set[ElementId] = set()
+
+        for op in chain(self._pending.buffered(), ops):
+            if isinstance(op, DeleteOp):
+                packed = integrated(op.id)
+                if packed is not None:
+                    if not nodes[packed].deleted:
+                        dead.add(packed)
+                elif op.id in values:
+                    added_dead.add(op.id)
+                else:
+                    waiting_deletes.add(op.id)
+                continue
+            ready = [op]
+            while ready:
+                ins = ready.pop()
+                if ins.id in values or integrated(ins.id) is not None:
+                    continue
+                if ins.parent_id not in values and integrated(ins.parent_id) is None:
+                    waiting.setdefault(ins.parent_id, []).append(ins)
+                    continue
+                values[ins.id] = ins.value
+                kids.setdefault(ins.parent_id, []).append(ins.id)
+                if ins.id in waiting_deletes:
+                    waiting_deletes.discard(ins.id)
+                    added_dead.add(ins.id)
+                ready.extend(waiting.pop(ins.id, ()))
+
+        if not values and not dead:
+            return self.materialize()
+
+        # New children of an integrated parent land before the open marker of
+        # its next greater integrated child, or before its own close marker.
+        anchors: Dict[int, List[ElementId]] = {}
+        for parent, new in kids.items():
+            new.sort()
+            parent_id = integrated(parent)
+            if parent_id is None:
+                continue
+            siblings = self._children[parent_id]
+            for kid in new:
+                i = bisect_left(siblings, kid, key=replicas.sort_key)
+                marker = siblings[i] * 2 if i < len(siblings) else parent_id * 2 + 1
+                anchors.setdefault(marker, []).append(kid)
+
+        def render(roots: List[ElementId]) -> str:
+            parts: List[str] = []
+            stack = [iter(roots)]
+            while stack:
+                for kid in stack[-1]:
+                    if kid not in added_dead:
+                        parts.append(values[kid])
+                    grandkids = kids.get(kid)
+                    if grandkids:
+                        stack.append(iter(grandkids))
+                        break
+                else:
+                    stack.pop()
+            return "".join(parts)
+
+        located = self._index.locate([*anchors, *(packed * 2 for packed in dead)])
+        # (visible position, 0 = insert before it / 1 = delete it, tour order, text)
+        events = [(*located[marker], roots) for marker, roots in anchors.items()]
+        changes = sorted(
+            [(visible, 0, order, render(roots)) for visible, order, roots in events]
+            + [(located[packed * 2][0], 1, located[packed * 2][1], "") for packed in dead]
+        )
+        base = self.materialize()
+        out: List[str] = []
+        cursor = 0
+        for visible, kind, _order, text in changes:
+            out.append(base[cursor:visible])
+            out.append(text)
+            cursor = visible + kind
+        out.append(base[cursor:])
+        return "".join(out)
+
+    def _id_below(self, first: ElementId, replica_id: str) -> ElementId:
+        """A fresh id owned by `replica_id` that sorts below `first`.
+
+        Tries a constant number of candidates: one lamport lower, then a low alias
+        one rank below `first` (or the top rank if `first` is not an alias), then
+        the top-rank alias one lamport lower. Repeated inserts at the same spot
+        walk the lamport down to 0 and then the alias rank down, so each pick is
+        O(1) and no lamport goes negative.
+        """
+        lamport, name = first
+        rank = low_rank(name)
+        below = LOW_RANK_MAX if rank is None else rank - 1
+        candidates = []
+        if lamport:
+            candidates.append((lamport - 1, replica_id))
+        candidates.extend((lamport, low_replica_id(replica_id, r)) for r in range(below, max(below - 4, -1), -1))
+        if lamport:
+            candidates.append((lamport - 1, low_replica_id(replica_id, LOW_RANK_MAX)))
+        for candidate in candidates:
+            if candidate < first and not self._is_known(candidate):
+                return candidate
+        raise ValueError("no free element id sorts before the insertion point")
+
+    def _next_id(self, replica_id: str) -> ElementId:
+        """A fresh id owned by `replica_id` above every integrated lamport."""
+        element_id = (self._max_lamport + 1, replica_id)
+        while self._pending and self._is_known(element_id):
+            element_id = (element_id[0] + 1, replica_id)
+        return element_id
+
+    def _is_known(self, element_id: ElementId) -> bool:
+        # Ids that buffered ops wait for count as taken too: minting one would
+        # release a foreign insert under it, or a foreign delete of it.
+        packed = self._replicas.lookup(element_id)
+        if packed is not None and packed in self._nodes:
+            return True
+        pending = self._pending
+        return pending.has_insert(element_id) or pending.is_awaited(element_id)
 
     def _assert_invariants(self) -> None:
-        if ROOT_ID not in self._nodes:
+        if self._root not in self._nodes:
             raise AssertionError("ROOT_ID missing from nodes")
-        if ROOT_ID not in self._children:
+        if self._root not in self._children:
             raise AssertionError("ROOT_ID missing from children")
 
         for node_id, node in self._nodes.items():
-            if node_id != ROOT_ID and node.parent_id not in self._nodes:
-                raise AssertionError(f"missing parent for integrated node: {node_id} -> {node.parent_id}")
+            if node_id != self._root and node.parent_id not in self._nodes:
+                raise AssertionError(
+                    f"missing parent for integrated node: {self._replicas.unpack(node_id)} -> "
+                    f"{self._replicas.unpack(node.parent_id)}"
+                )
             if node_id not in self._children:
-                raise AssertionError(f"children index missing key for node: {node_id}")
+                raise AssertionError(f"children index missing key for node: {self._replicas.unpack(node_id)}")
 
         for parent_id, kids in self._children.items():
-            if kids != sorted(kids):
-                raise AssertionError(f"children list not sorted for parent: {parent_id}")
+            if kids != sorted(kids, key=self._replicas.sort_key):
+                raise AssertionError(f"children list not sorted for parent: {self._replicas.unpack(parent_id)}")
             if len(kids) != len(set(kids)):
-                raise AssertionError(f"children list contains duplicates for parent: {parent_id}")
+                raise AssertionError(f"children list contains duplicates for parent: {self._replicas.unpack(parent_id)}")
+
+        out: list[str] = []
+        self._dfs(self._root, out)
+        if self._index.text() != "".join(out):
+            raise AssertionError("sequence index out of sync with tree order")
 
     def _integrate_insert(self, op: InsertOp) -> None:
-        if op.id in self._nodes:
+        replicas = self._replicas
+        nodes = self._nodes
+        op_id = replicas.lookup(op.id)
+        if op_id is not None and op_id in nodes:
             return
 
-        if op.parent_id not in self._nodes:
-            self._pending_inserts.setdefault(op.parent_id, []).append(op)
+        parent_id = replicas.lookup(op.parent_id)
+        if parent_id is None or parent_id not in nodes:
+            # Not interned yet: a buffered (or rejected) op must not grow the table.
+            self._pending.add_insert(op.parent_id, op.id, op)
             return
 
-        self._nodes[op.id] = _Node(id=op.id, parent_id=op.parent_id, value=op.value, deleted=False)
-        self._children.setdefault(op.id, [])
-
-        siblings = self._children.setdefault(op.parent_id, [])
-        siblings.append(op.id)
-        siblings.sort()
-
-        if op.id in self._pending_deletes:
-            self._pending_deletes.remove(op.id)
-            self._tombstone(op.id)
-
-        pending = self._pending_inserts.pop(op.id, None)
-        if pending:
-            for child in pending:
-                self._integrate_insert(child)
+        if op_id is None:
+            op_id = replicas.pack(op.id)
+        self._place(op_id, parent_id, op.value)
+        if self._pending:
+            self._drain(op_id)
+
+    def _place_and_drain(self, op_id: int, parent_id: int, value: str) -> None:
+        self._place(op_id, parent_id, value)
+        if self._pending:
+            self._drain(op_id)
+
+    def _drain(self, op_id: int) -> None:
+        # Released children are drained from a work list instead of recursing.
+        ready = self._release(op_id)
+        while ready:
+            child = ready.pop()
+            child_id = self._replicas.pack(child.id)
+            if child_id not in self._nodes:
+                self._place(child_id, self._replicas.pack(child.parent_id), child.value)
+                ready.extend(self._release(child_id))
+
+    def _release(self, op_id: int) -> List[InsertOp]:
+        """Apply a buffered delete of `op_id` and return inserts waiting on it."""
+        element_id = self._replicas.unpack(op_id)
+        if self._pending.release_delete(element_id):
+            self._tombstone(op_id)
+        return self._pending.release_inserts(element_id)
+
+    def _place(self, op_id: int, parent_id: int, value: str) -> None:
+        self._nodes[op_id] = _Node(parent_id, value)
+        children = self._children
+        children[op_id] = []
+
+        lamport = op_id >> REPLICA_BITS
+        if lamport > self._max_lamport:
+            self._max_lamport = lamport
+
+        siblings = children[parent_id]
+        if siblings:
+            i = self._replicas.insertion_point(siblings, op_id)
+            siblings.insert(i, op_id)
+            self._index.insert(op_id, parent_id, siblings[i + 1] if i + 1 < len(siblings) else None)
+        else:
+            siblings.append(op_id)
+            self._index.insert(op_id, parent_id, None)
 
     def _integrate_delete(self, op: DeleteOp) -> None:
-        if op.id not in self._nodes:
-            self._pending_deletes.add(op.id)
+        op_id = self._replicas.lookup(op.id)
+        if op_id is None or op_id not in self._nodes:
+            self._pending.add_delete(op.id)
             return
-        self._tombstone(op.id)
+        self._tombstone(op_id)
 
-    def _tombstone(self, element_id: ElementId) -> None:
-        n = self._nodes[element_id]
-        if n.deleted:
+    def _tombstone(self, element_id: int) -> None:
+        node = self._nodes[element_id]
+        if node.deleted:
             return
-        self._nodes[element_id] = _Node(id=n.id, parent_id=n.parent_id, value=n.value, deleted=True)
-
-    def _dfs(self, parent_id: ElementId, out: list[str]) -> None:
-        for child_id in self._children.get(parent_id, []):
-            node = self._nodes.get(child_id)
-            if node is None:
-                continue
-            if not node.deleted:
-                out.append(node.value)
-            self._dfs(child_id, out)
+        node.deleted = True
+        self._tombstone_count += 1
+        self._index.tombstone(element_id)
+
+    def _dfs(self, parent_id: int, out: list[str]) -> None:
+        nodes = self._nodes
+        children = self._children
+        stack = [iter(children.get(parent_id, []))]
+        while stack:
+            for child_id in stack[-1]:
+                node = nodes.get(child_id)
+                if node is None:
+                    continue
+                if not node.deleted:
+                    out.append(node.value)
+                grandchildren = children.get(child_id)
+                if grandchildren:
+                    stack.append(iter(grandchildren))
+                    break
+            else:
+                stack.pop()
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+"""Document-order index over integrated RGA nodes.
+
+`RGA` stores the tree (`_children`), whose preorder walk is the document. Walking
+the tree on every `materialize` is O(n) Python work, and mapping a visible text
+position to an element id needs the same walk. `SequenceIndex` keeps the
+preorder incrementally instead.
+
+## Representation
+
+The index stores an Euler tour of the tree: every node contributes an *open*
+marker (`id * 2`) and a *close* marker (`id * 2 + 1`), and a node's subtree lies
+exactly between its two markers. Inserting a node is therefore a constant number
+of lookups:
+
+- before its next greater sibling's open marker, or
+- before its parent's close marker if it is the last child.
+
+The marker list is split into blocks of bounded size. Each block tracks how many
+visible (non-tombstoned) nodes it contains and caches its visible text, so
+`text()` joins one string per block and `id_at()` skips whole blocks by count.
+
+Every node records the blocks holding its two markers in its own `open_block`
+and `close_block` slots, instead of in a marker -> block dict. Two dict entries
+per element would cost more than the packed ids save.
+
+## Snapshots
+
+`tour()` and `tombstones()` return immutable tuples, one per block. A block
+keeps its tuples cached until it changes, so consecutive checkpoints share the
+tuples of unchanged blocks. Capturing costs O(blocks + markers in changed
+blocks), not O(n).
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+
+_BLOCK_SPLIT = 512
+
+
+class _Block:
+    __slots__ = ("markers", "visible", "text", "frozen", "dead")
+
+    def __init__(self, markers: List[int], visible: int) -> None:
+        self.markers = markers
+        self.visible = visible
+        # Caches, reset to None whenever they go stale: visible text, markers
+        # as a tuple, and ids of tombstoned nodes.
+        self.text: Optional[str] = None
+        self.frozen: Optional[Tuple[int, ...]] = None
+        self.dead: Optional[Tuple[int, ...]] = None
+
+
+class SequenceIndex:
+    """Blocked Euler-tour index giving document order for packed node ids.
+
+    `nodes` is the owning RGA's node map. The index reads `value` and `deleted`
+    from it, owns the nodes' `open_block`/`close_block` slots, and must be told
+    about every insert and tombstone.
+    """
+
+    def __init__(self, nodes: Mapping[int, Any], root: int) -> None:
+        self._nodes = nodes
+        self._root = root
+        block = _Block([root * 2, root * 2 + 1], visible=0)
+        self._blocks: List[_Block] = [block]
+        root_node = nodes[root]
+        root_node.open_block = root_node.close_block = block
+        self._visible = 0
+        # Where the last insert's close marker landed; consecutive typing inserts
+        # the next node right before it, which skips the scan in `insert`.
+        self._hint_block: Optional[_Block] = None
+        self._hint_pos = 0
+
+    @classmethod
+    def from_tour(cls, nodes: Mapping[int, Any], root: int, tour: Tuple[Tuple[int, ...], ...]) -> "SequenceIndex":
+        """Rebuild an index from blocks previously returned by `tour()`."""
+        index = cls(nodes, root)
+        blocks: List[_Block] = []
+        total = 0
+        for chunk in tour:
+            markers = list(chunk)
+            block = _Block(markers, visible=0)
+            visible = 0
+            dead: List[int] = []
+            for m in markers:
+                node = nodes[m >> 1]
+                if m & 1:
+                    node.close_block = block
+                else:
+                    node.open_block = block
+                    if not node.deleted:
+                        visible += 1
+                    elif m >> 1 != root:
+                        dead.append(m >> 1)
+            block.visible = visible
+            block.frozen = chunk
+            block.dead = tuple(dead)
+            blocks.append(block)
+            total += visible
+        index._blocks = blocks
+        index._visible = total
+        return index
+
+    def __len__(self) -> int:
+        """Number of visible elements."""
+        return self._visible
+
+    def tour(self) -> Tuple[Tuple[int, ...], ...]:
+        """Immutable copy of the Euler tour, one tuple of markers per block, root first."""
+        frozen: List[Tuple[int, ...]] = []
+        for block in self._blocks:
+            if block.frozen is None:
+                block.frozen = tuple(block.markers)
+            frozen.append(block.frozen)
+        return tuple(frozen)
+
+    def tombstones(self) -> Tuple[Tuple[int, ...], ...]:
+        """Packed ids of tombstoned elements (root excluded), one tuple per block.
+
+        Ids within a block are not necessarily in document order.
+        """
+        nodes = self._nodes
+        root = self._root
+        dead: List[Tuple[int, ...]] = []
+        for block in self._blocks:
+            if block.dead is None and block.visible * 2 == len(block.markers):
+                block.dead = ()
+            elif block.dead is None:
+                opened = [m >> 1 for m in block.markers if not m & 1]
+                block.dead = tuple([i for i, node in zip(opened, map(nodes.__getitem__, opened)) if node.deleted and i != root])
+            dead.append(block.dead)
+        return tuple(dead)
+
+    def insert(self, node_id: int, parent_id: int, next_sibling: Optional[int]) -> None:
+        """Record a newly integrated leaf `node_id`.
+
+        `next_sibling` is the smallest sibling greater than `node_id`, if any.
+        """
+        if next_sibling is not None:
+            anchor = next_sibling * 2
+            block = self._nodes[next_sibling].open_block
+        else:
+            anchor = parent_id * 2 + 1
+            block = self._nodes[parent_id].close_block
+        markers = block.markers
+        i = self._hint_pos
+        if block is not self._hint_block or i >= len(markers) or markers[i] != anchor:
+            i = markers.index(anchor)
+        opening = node_id * 2
+        markers[i:i] = (opening, opening + 1)
+        node = self._nodes[node_id]
+        node.open_block = node.close_block = block
+        if not node.deleted:
+            block.visible += 1
+            self._visible += 1
+        else:
+            block.dead = None
+        block.text = None
+        block.frozen = None
+        self._hint_block = block
+        self._hint_pos = i + 1
+        if len(markers) > _BLOCK_SPLIT:
+            self._hint_block = None
+            self._split(block)
+
+    def tombstone(self, node_id: int) -> None:
+        """Record that a previously visible node became a tombstone."""
+        block = self._nodes[node_id].open_block
+        block.visible -= 1
+        block.text = None
+        if block.dead is not None:
+            block.dead += (node_id,)
+        self._visible -= 1
+
+    def text(self) -> str:
+        return "".join(self._block_text(b) for b in self._blocks)
+
+    def id_at(self, position: int) -> int:
+        """Packed id of the visible element at `position`."""
+        for node_id in self.iter_visible(position):
+            return node_id
+        raise IndexError("position out of range")
+
+    def iter_visible(self, start: int = 0) -> Iterator[int]:
+        """Yield packed ids of visible elements from position `start` onwards."""
+        if start < 0:
+            raise IndexError("position out of range")
+        nodes = self._nodes
+        skip = start
+        for block in self._blocks:
+            if skip >= block.visible:
+                skip -= block.visible
+                continue
+            for m in block.markers:
+                if m & 1:
+                    continue
+                if nodes[m >> 1].deleted:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                yield m >> 1
+
+    def position_of(self, node_id: int) -> int:
+        """Number of visible elements strictly before `node_id` in document order."""
+        opening = node_id * 2
+        block = self._nodes[node_id].open_block
+        before = 0
+        for b in self._blocks:
+            if b is block:
+                break
+            before += b.visible
+        nodes = self._nodes
+        for m in block.markers:
+            if m == opening:
+                return before
+            if not m & 1 and not nodes[m >> 1].deleted:
+                before += 1
+        raise KeyError(node_id)
+
+    def locate(self, markers: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+        """Map each marker to `(visible elements before it, its index in the tour)`."""
+        nodes = self._nodes
+        starts: Dict[int, Tuple[int, int]] = {}
+        visible = count = 0
+        for block in self._blocks:
+            starts[id(block)] = (visible, count)
+            visible += block.visible
+            count += len(block.markers)
+        wanted: Dict[int, List[int]] = {}
+        blocks: Dict[int, _Block] = {}
+        for m in markers:
+            node = nodes[m >> 1]
+            block = node.close_block if m & 1 else node.open_block
+            wanted.setdefault(id(block), []).append(m)
+            blocks[id(block)] = block
+        # One scan per touched block, however many markers land in it.
+        located: Dict[int, Tuple[int, int]] = {}
+        for key, ms in wanted.items():
+            visible, count = starts[key]
+            pending = set(ms)
+            for i, x in enumerate(blocks[key].markers):
+                if x in pending:
+                    located[x] = (visible, count + i)
+                    pending.discard(x)
+                    if not pending:
+                        break
+                if not x & 1 and not nodes[x >> 1].deleted:
+                    visible += 1
+        return located
+
+    def _block_text(self, block: _Block) -> str:
+        if block.text is None:
+            opened = map(self._nodes.__getitem__, [m >> 1 for m in block.markers if not m & 1])
+            block.text = "".join([node.value for node in opened if not node.deleted])
+        return block.text
+
+    def _split(self, block: _Block) -> None:
+        half = len(block.markers) // 2
+        moved = block.markers[half:]
+        del block.markers[half:]
+
+        nodes = self._nodes
+        visible = 0
+        new_block = _Block(moved, visible=0)
+        for m in moved:
+            node = nodes[m >> 1]
+            if m & 1:
+                node.close_block = new_block
+            else:
+                node.open_block = new_block
+                if not node.deleted:
+                    visible += 1
+        new_block.visible = visible
+        block.visible -= visible
+        block.text = None
+        block.frozen = None
+        block.dead = None
+
+        i = self._blocks.index(block)
+        self._blocks.insert(i + 1, new_block)
@@ -1,10 +1,31 @@
 import json
+import sys
 from typing import Annotated, Any, Literal, Union
 
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field, ValidationInfo, model_validator
 
+from collab_engine.core.crdt.ids import check_wire_replica_id
 
-ElementId = tuple[int, str]
+
+# Validation context of messages received from clients (`parse_client_message`).
+_FROM_CLIENT = {"from_client": True}
+
+
+def _intern_element_id(value: tuple[int, str], info: ValidationInfo) -> tuple[int, str]:
+    # Packed ids put the lamport in the high bits, which only orders correctly
+    # for non-negative lamports.
+    if value[0] < 0:
+        raise ValueError("lamport must be non-negative")
+    # A client id sorting below everything the server can allocate would leave
+    # no room to insert text before it. The server's own ids may go lower.
+    if (not value[1] or value[1][0] == "\x00") and info.context and info.context.get("from_client"):
+        check_wire_replica_id(value[1])
+    # Decoded JSON yields a fresh replica_id string per op; interning makes every
+    # op from the same replica share one string object in op records and buffers.
+    return (value[0], sys.intern(value[1]))
+
+
+ElementId = Annotated[tuple[int, str], AfterValidator(_intern_element_id)]
 
 
 class InsertOp(BaseModel):
@@ -37,7 +58,32 @@ class ClientOp(BaseModel):
     op: Op
 
 
-ClientMessage = Union[ClientHello, ClientOp]
+class CursorAnchor(BaseModel):
+    """A caret attached to a CRDT element: just before it (`left`) or just after it (`right`).
+
+    A caret at the start of the document is `ROOT_ID` with `right` affinity.
+    """
+
+    anchor_id: ElementId
+    affinity: Literal["left", "right"] = "right"
+
+
+class Selection(BaseModel):
+    start: CursorAnchor
+    end: CursorAnchor
+
+
+class ClientPresenceUpdate(BaseModel):
+    """Ephemeral cursor/selection state; never sequenced or persisted."""
+
+    type: Literal["presence_update"]
+    doc_id: str = Field(min_length=1)
+    client_id: str = Field(min_length=1)
+    cursor: CursorAnchor | None = None
+    selection: Selection | None = None
+
+
+ClientMessage = Union[ClientHello, ClientOp, ClientPresenceUpdate]
 
 
 class ServerHelloAck(BaseModel):
@@ -62,14 +108,73 @@ class ServerOpEcho(BaseModel):
     op: Op
 
 
-ServerMessage = Union[ServerHelloAck, ServerResync, ServerOpEcho]
+class PresenceState(BaseModel):
+    client_id: str
+    cursor: CursorAnchor | None = None
+    selection: Selection | None = None
+
+
+class ServerPresenceSnapshot(BaseModel):
+    """Every known presence in the room, sent once on join."""
+
+    type: Literal["presence_snapshot"] = "presence_snapshot"
+    doc_id: str
+    presences: list[PresenceState]
+
+
+class ServerPresenceUpdate(BaseModel):
+    """Presence changes coalesced over one tick: latest state per changed client."""
+
+    type: Literal["presence_update"] = "presence_update"
+    doc_id: str
+    updates: list[PresenceState]
+    removed: list[str] = Field(default_factory=list)
+
+
+ServerMessage = Union[ServerHelloAck, ServerResync, ServerOpEcho, ServerPresenceSnapshot, ServerPresenceUpdate]
+
+
+class TextEdit(BaseModel):
+    position: int = Field(ge=0)
+    delete_len: int = Field(default=0, ge=0)
+    insert_text: str = ""
+
+
+class TextIngestRequest(BaseModel):
+    """HTTP text ingestion: either a new full text or ordered index-based edits."""
+
+    base_server_seq: int = Field(ge=0)
+    full_text: str | None = None
+    edits: list[TextEdit] | None = None
+    client_id: str = Field(default="http-ingest", min_length=1)
+    client_msg_id: str = Field(default="ingest", min_length=1)
+
+    @model_validator(mode="after")
+    def _exactly_one_payload(self) -> "TextIngestRequest":
+        if (self.full_text is None) == (self.edits is None):
+            raise ValueError("exactly one of full_text or edits is required")
+        return self
+
+
+class TextIngestResponse(BaseModel):
+    doc_id: str
+    server_seq: int
+    ops: int
+
+
+class DocumentTextResponse(BaseModel):
+    doc_id: str
+    server_seq: int
+    full_text: str
 
 
 def parse_client_message(raw_text: str) -> ClientMessage:
     data: Any = json.loads(raw_text)
     t = data.get("type")
     if t == "hello":
-        return ClientHello.model_validate(data)
+        return ClientHello.model_validate(data, context=_FROM_CLIENT)
     if t == "op":
-        return ClientOp.model_validate(data)
+        return ClientOp.model_validate(data, context=_FROM_CLIENT)
+    if t == "presence_update":
+        return ClientPresenceUpdate.model_validate(data, context=_FROM_CLIENT)
     raise ValueError(f"unknown message type: {t!r}")
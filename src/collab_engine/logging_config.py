@@ -1,5 +1,49 @@
+"""Logging setup.
+
+By default records go synchronously to stdout as text. Environment variables
+switch on the optional pieces:
+
+- `COLLAB_LOG_QUEUE=1`: the event loop only enqueues records; a `QueueListener`
+  thread formats and writes them. The queue is bounded, and records are
+  dropped (and counted) instead of blocking when the consumer falls behind.
+- `COLLAB_LOG_FORMAT=json`: one JSON object per line, with doc_id, client_id
+  and server_seq as fields.
+- `COLLAB_LOG_SAMPLE=logger=rate,...`: keep a fraction (0..1] of a logger's
+  records below WARNING.
+- `COLLAB_LOG_RATE_LIMIT=logger=per_second,...`: token-bucket limit for a
+  logger's records below WARNING.
+
+Drops are exported as `collab_log_records_dropped_total{reason=...}`.
+"""
+
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO, Tuple
+
+from collab_engine.metrics import counter
+
+
+# Per-op hot-path events are logged at DEBUG for one op in this many.
+OP_LOG_SAMPLE_EVERY = 100
+
+LOG_QUEUE_SIZE = 10_000
+
+_TEXT_FORMAT = (
+    "%(asctime)s %(levelname)s %(name)s %(message)s doc_id=%(doc_id)s client_id=%(client_id)s server_seq=%(server_seq)s"
+)
+
+DROPPED_TOTAL = counter("collab_log_records_dropped_total", "Log records dropped before output.", ["reason"])
+
+_listener: Optional[QueueListener] = None
+
+_EXC_FORMATTER = logging.Formatter()
 
 
 class _SafeExtraFormatter(logging.Formatter):
@@ -10,16 +54,156 @@ class _SafeExtraFormatter(logging.Formatter):
         return super().format(record)
 
 
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "doc_id": getattr(record, "doc_id", None),
+            "client_id": getattr(record, "client_id", None),
+            "server_seq": getattr(record, "server_seq", None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"))
+
+
+class _SamplingFilter(logging.Filter):
+    """Keep one in every `round(1 / rate)` records below WARNING."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        if not 0 < rate <= 1:
+            raise ValueError("sample rate must be in (0, 1]")
+        self._every = max(1, round(1 / rate))
+        self._seen = 0
+        self._dropped = DROPPED_TOTAL.labels("sampled")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        self._seen += 1
+        if self._seen % self._every == 0:
+            return True
+        self._dropped.inc()
+        return False
+
+
+class _RateLimitFilter(logging.Filter):
+    """Token bucket: `per_second` records below WARNING, bursting to one second's worth."""
+
+    def __init__(self, per_second: float) -> None:
+        super().__init__()
+        if per_second <= 0:
+            raise ValueError("rate limit must be positive")
+        self._rate = per_second
+        self._tokens = per_second
+        self._last = time.monotonic()
+        self._dropped = DROPPED_TOTAL.labels("rate_limited")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self._rate, self._tokens + (now - self._last) * self._rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self._dropped.inc()
+        return False
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock `prepare` folds the traceback into `msg`, which would put it
+        # in JSON's "msg" instead of "exc". Merge only the args, and render the
+        # traceback into `exc_text` for the output formatter to place.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED_TOTAL.labels("queue_full").inc()
+
+
+def make_handler(
+    stream: Optional[TextIO] = None,
+    json_format: bool = False,
+    use_queue: bool = False,
+    queue_size: int = LOG_QUEUE_SIZE,
+) -> Tuple[logging.Handler, Optional[QueueListener]]:
+    """Build the output handler; with `use_queue`, also a started listener the caller must stop."""
+    output = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    output.setFormatter(_JsonFormatter() if json_format else _SafeExtraFormatter(fmt=_TEXT_FORMAT))
+    if not use_queue:
+        return output, None
+
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    listener = QueueListener(q, output, respect_handler_level=True)
+    listener.start()
+    return _DroppingQueueHandler(q), listener
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, value = item.rpartition("=")
+        if not name:
+            raise ValueError(f"expected logger=value, got {item!r}")
+        rates[name] = float(value)
+    return rates
+
+
+def install_filters(sample_rates: Dict[str, float], rate_limits: Dict[str, float]) -> None:
+    """Attach sampling / rate-limit filters to the named loggers (their own records only)."""
+    for name, rate in sample_rates.items():
+        logging.getLogger(name).addFilter(_SamplingFilter(rate))
+    for name, per_second in rate_limits.items():
+        logging.getLogger(name).addFilter(_RateLimitFilter(per_second))
+
+
+def shutdown_logging() -> None:
+    """Flush and stop the queue listener, if one is running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def configure_logging() -> None:
+    global _listener
     root = logging.getLogger()
     if root.handlers:
         return
 
-    handler = logging.StreamHandler(sys.stdout)
-    formatter = _SafeExtraFormatter(
-        fmt="%(asctime)s %(levelname)s %(name)s %(message)s doc_id=%(doc_id)s client_id=%(client_id)s server_seq=%(server_seq)s",
+    handler, listener = make_handler(
+        json_format=os.environ.get("COLLAB_LOG_FORMAT", "text") == "json",
+        use_queue=os.environ.get("COLLAB_LOG_QUEUE") == "1",
+    )
+    if listener is not None:
+        _listener = listener
+        atexit.register(shutdown_logging)
+
+    install_filters(
+        _parse_rates(os.environ.get("COLLAB_LOG_SAMPLE", "")),
+        _parse_rates(os.environ.get("COLLAB_LOG_RATE_LIMIT", "")),
     )
-    handler.setFormatter(formatter)
 
     root.setLevel(logging.INFO)
     root.addHandler(handler)
@@ -1,17 +1,73 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+
+from collab_engine.api.ws import ingest_text, read_text, readiness, start_warmup, stop_presence, stop_warmup
 from collab_engine.api.ws import router as ws_router
+from collab_engine.core.protocol.messages import DocumentTextResponse, TextIngestRequest, TextIngestResponse
 from collab_engine.logging_config import configure_logging
+from collab_engine.metrics import REGISTRY
+from collab_engine.services.document_service import BaseSeqMismatch, EditTooLarge
 
 
 configure_logging()
 
-app = FastAPI(title="collab-engine")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # COLLAB_WARM_DOCS=K preloads the K most recently active documents after
+    # startup; /health answers 503 until that finishes.
+    start_warmup(int(os.environ.get("COLLAB_WARM_DOCS", "0")))
+    yield
+    await stop_warmup()
+    await stop_presence()
+
+
+app = FastAPI(title="collab-engine", lifespan=lifespan)
 
 
 @app.get("/health")
-async def health() -> dict:
-    return {"status": "ok"}
+async def health(response: Response) -> dict:
+    status = readiness()
+    if not status.ready:
+        response.status_code = 503
+    return {
+        "status": "ok" if status.ready else "warming",
+        "warmup": {
+            "target_docs": status.target_docs,
+            "warmed_docs": status.warmed_docs,
+            "failed_docs": status.failed_docs,
+            "seconds": round(status.seconds, 3),
+        },
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/docs/{doc_id}/text", response_model=DocumentTextResponse)
+async def get_text(doc_id: str, at: int | None = None) -> DocumentTextResponse:
+    try:
+        return await read_text(doc_id=doc_id, at=at)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+
+@app.post("/docs/{doc_id}/text", response_model=TextIngestResponse)
+async def post_text(doc_id: str, body: TextIngestRequest) -> TextIngestResponse:
+    try:
+        return await ingest_text(doc_id=doc_id, request=body)
+    except BaseSeqMismatch as exc:
+        raise HTTPException(status_code=409, detail={"error": "stale base_server_seq", "server_seq": exc.server_seq})
+    except EditTooLarge as exc:
+        raise HTTPException(status_code=413, detail={"error": "edit too large", "size": exc.size, "limit": exc.limit})
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
 
 
 app.include_router(ws_router)
@@ -0,0 +1,245 @@
+"""Prometheus-style metrics without external dependencies.
+
+Hot paths record into module-level `Counter` / `Histogram` objects, which cost a
+dict lookup and an integer add per observation. Point-in-time values (room
+sizes, queue depths, pending buffers, tombstone ratios) are not tracked on the
+hot path at all; they are read from the live objects by collector callbacks
+when `/metrics` is scraped.
+
+`REGISTRY.render()` produces the Prometheus text exposition format (0.0.4).
+
+Per-document series are labelled with `doc_id`, so series count grows with the
+number of loaded documents.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+
+Labels = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+
+# Seconds; tuned for sub-millisecond hot paths with a tail into slow persistence.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    1.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._children: Dict[Labels, _CounterChild] = {}
+        if not self.labelnames:
+            self._children[()] = _CounterChild()
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _CounterChild())
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].value += amount
+
+    def remove(self, *values: str) -> None:
+        self._children.pop(values, None)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Labels, _HistogramChild] = {}
+        if not self.labelnames:
+            self._children[()] = _HistogramChild(self.buckets)
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for key, child in list(self._children.items()):
+            base = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += n
+                labels = dict(base, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {child.count}")
+        return lines
+
+
+class GaugeFamily:
+    """A gauge whose samples are produced at scrape time by a collector."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help: str, samples: Iterable[Sample]) -> None:
+        self.name = name
+        self.help = help
+        self.samples = list(samples)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self.samples]
+
+
+Collector = Callable[[], Iterable[GaugeFamily]]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            families: List[object] = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for collect in collectors:
+            families.extend(collect())
+
+        lines: List[str] = []
+        for fam in families:
+            lines.append(f"# HELP {fam.name} {fam.help}")  # type: ignore[attr-defined]
+            lines.append(f"# TYPE {fam.name} {fam.type_name}")  # type: ignore[attr-defined]
+            lines.extend(fam.render())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    c = Counter(name, help, labelnames)
+    REGISTRY.register(c)
+    return c
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    h = Histogram(name, help, labelnames, buckets)
+    REGISTRY.register(h)
+    return h
+
+
+# -- hot-path metrics ------------------------------------------------------------
+
+INTEGRATE_SECONDS = histogram("collab_integrate_seconds", "Time to integrate one op into the CRDT.")
+MATERIALIZE_SECONDS = histogram("collab_materialize_seconds", "Time to materialize document text after an op.")
+PERSIST_SECONDS = histogram("collab_persist_seconds", "Time to append an op record and store the snapshot.")
+CHECKPOINT_SECONDS = histogram("collab_checkpoint_seconds", "Time to capture and store one checkpoint.")
+HISTORY_READ_SECONDS = histogram("collab_history_read_seconds", "Time to materialize a document at a past server_seq.")
+BROADCAST_SECONDS = histogram("collab_broadcast_seconds", "Time to fan one message out to a document room.")
+
+OPS_TOTAL = counter("collab_ops_total", "Ops sequenced per document.", ["doc_id"])
+SYNC_TOTAL = counter(
+    "collab_sync_total",
+    "Client (re)joins by catch-up path: replay of op echoes or full-text resync.",
+    ["kind"],
+)
+PRESENCE_UPDATES_TOTAL = counter("collab_presence_updates_total", "Presence updates received from clients.")
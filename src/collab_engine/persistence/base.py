@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Protocol
+from typing import Iterable, Protocol
 
+from collab_engine.core.crdt.rga import RGAState
 from collab_engine.core.protocol.messages import Op
 
 
@@ -15,6 +16,16 @@ class OpRecord:
     op: Op
 
 
+@dataclass(frozen=True)
+class Checkpoint:
+    """Document state at `server_seq`: CRDT state to resume replay from, plus its text."""
+
+    doc_id: str
+    server_seq: int
+    full_text: str
+    crdt_state: RGAState
+
+
 class Persistence(Protocol):
     def append_op(self, record: OpRecord) -> None: ...
 
@@ -22,6 +33,20 @@ class Persistence(Protocol):
 
     def get_latest_server_seq(self, doc_id: str) -> int: ...
 
-    def get_snapshot_text(self, doc_id: str) -> tuple[str, int] | None: ...
+    def get_snapshot_text(self, doc_id: str) -> tuple[str, int] | None:
+        """The last stored `(full_text, server_seq)` pair, never a newer seq with older text."""
+        ...
 
     def store_snapshot_text(self, doc_id: str, server_seq: int, full_text: str) -> None: ...
+
+    def get_ops_range(self, doc_id: str, since_server_seq: int, until_server_seq: int) -> list[OpRecord]: ...
+
+    def store_checkpoint(self, checkpoint: Checkpoint) -> None: ...
+
+    def get_checkpoint(self, doc_id: str, at_or_before: int) -> Checkpoint | None: ...
+
+    def get_checkpoint_seqs(self, doc_id: str) -> list[int]: ...
+
+    def delete_checkpoints(self, doc_id: str, server_seqs: Iterable[int]) -> None: ...
+
+    def recent_doc_ids(self, limit: int) -> list[str]: ...
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import threading
-from dataclasses import dataclass
-from typing import Dict, List
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import islice
+from operator import attrgetter
+from typing import Dict, Iterable, List
 
-from collab_engine.persistence.base import OpRecord, Persistence
+from collab_engine.persistence.base import Checkpoint, OpRecord, Persistence
+
+
+_SEQ = attrgetter("server_seq")
 
 
 @dataclass
@@ -12,25 +19,43 @@ class _DocStore:
     last_seq: int
     ops: List[OpRecord]
     snapshot_text: str
+    # The snapshot can trail `last_seq` while a batch is being appended.
+    snapshot_seq: int = 0
+    checkpoints: Dict[int, Checkpoint] = field(default_factory=dict)
+    checkpoint_seqs: List[int] = field(default_factory=list)
 
 
 class InMemoryPersistence(Persistence):
     def __init__(self) -> None:
         self._lock = threading.Lock()
         self._docs: Dict[str, _DocStore] = {}
+        # Doc ids ordered by their last appended op, most recent last.
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
 
     def append_op(self, record: OpRecord) -> None:
         with self._lock:
             ds = self._docs.setdefault(record.doc_id, _DocStore(last_seq=0, ops=[], snapshot_text=""))
             ds.ops.append(record)
             ds.last_seq = record.server_seq
+            self._recent[record.doc_id] = None
+            self._recent.move_to_end(record.doc_id)
 
     def get_ops_since(self, doc_id: str, since_server_seq: int) -> list[OpRecord] | None:
         with self._lock:
             ds = self._docs.get(doc_id)
             if ds is None:
                 return []
-            return [r for r in ds.ops if r.server_seq > since_server_seq]
+            return ds.ops[bisect_right(ds.ops, since_server_seq, key=_SEQ) :]
+
+    def get_ops_range(self, doc_id: str, since_server_seq: int, until_server_seq: int) -> list[OpRecord]:
+        """Records with `since_server_seq < server_seq <= until_server_seq`."""
+        with self._lock:
+            ds = self._docs.get(doc_id)
+            if ds is None:
+                return []
+            lo = bisect_right(ds.ops, since_server_seq, key=_SEQ)
+            hi = bisect_right(ds.ops, until_server_seq, lo=lo, key=_SEQ)
+            return ds.ops[lo:hi]
 
     def get_latest_server_seq(self, doc_id: str) -> int:
         with self._lock:
@@ -42,10 +67,48 @@ class InMemoryPersistence(Persistence):
             ds = self._docs.get(doc_id)
             if ds is None:
                 return None
-            return (ds.snapshot_text, ds.last_seq)
+            return (ds.snapshot_text, ds.snapshot_seq)
 
     def store_snapshot_text(self, doc_id: str, server_seq: int, full_text: str) -> None:
         with self._lock:
             ds = self._docs.setdefault(doc_id, _DocStore(last_seq=0, ops=[], snapshot_text=""))
             ds.snapshot_text = full_text
+            ds.snapshot_seq = server_seq
             ds.last_seq = max(ds.last_seq, server_seq)
+
+    def store_checkpoint(self, checkpoint: Checkpoint) -> None:
+        with self._lock:
+            ds = self._docs.setdefault(checkpoint.doc_id, _DocStore(last_seq=0, ops=[], snapshot_text=""))
+            if checkpoint.server_seq not in ds.checkpoints:
+                insort(ds.checkpoint_seqs, checkpoint.server_seq)
+            ds.checkpoints[checkpoint.server_seq] = checkpoint
+
+    def get_checkpoint(self, doc_id: str, at_or_before: int) -> Checkpoint | None:
+        """The newest checkpoint with `server_seq <= at_or_before`."""
+        with self._lock:
+            ds = self._docs.get(doc_id)
+            if ds is None:
+                return None
+            i = bisect_right(ds.checkpoint_seqs, at_or_before)
+            if i == 0:
+                return None
+            return ds.checkpoints[ds.checkpoint_seqs[i - 1]]
+
+    def get_checkpoint_seqs(self, doc_id: str) -> list[int]:
+        with self._lock:
+            ds = self._docs.get(doc_id)
+            return list(ds.checkpoint_seqs) if ds else []
+
+    def delete_checkpoints(self, doc_id: str, server_seqs: Iterable[int]) -> None:
+        with self._lock:
+            ds = self._docs.get(doc_id)
+            if ds is None:
+                return
+            for seq in server_seqs:
+                if ds.checkpoints.pop(seq, None) is not None:
+                    del ds.checkpoint_seqs[bisect_left(ds.checkpoint_seqs, seq)]
+
+    def recent_doc_ids(self, limit: int) -> list[str]:
+        """Up to `limit` doc ids, most recently written first."""
+        with self._lock:
+            return list(islice(reversed(self._recent), limit))
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+"""Checkpoint scheduling and retention.
+
+`DocumentService` stores a `Checkpoint` (CRDT state + text) every
+`CheckpointPolicy.interval` ops. A historical `server_seq` is then one
+checkpoint restore plus a replay whose length depends on the retention below,
+and cold loads replay only the ops after the newest checkpoint.
+
+Retention decides which checkpoints survive as the document grows:
+
+- `fixed`: keep the newest `max_checkpoints`, evenly spaced `interval` apart.
+  Reads anywhere in that window replay at most `interval` ops; older history
+  replays from the oldest kept checkpoint (or from zero).
+- `exponential`: group checkpoints into age bands `[interval * 2**(k-1),
+  interval * 2**k)` and keep the oldest checkpoint in each band, plus the newest
+  overall. Recent history stays dense, old history gets sparser, and the number
+  of checkpoints grows with `log2(ops / interval)` rather than with `ops`.
+  The price is that replay grows with the age of the read: reading `server_seq`
+  at `head` replays fewer than `2 * max(interval, head - server_seq)` ops
+  (e.g. up to ~1M ops for a read halfway into a 1M-op document), for as long as
+  the bands fit in `max_checkpoints`.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Literal, Sequence, Set
+
+
+@dataclass(frozen=True)
+class CheckpointPolicy:
+    interval: int = 1000
+    spacing: Literal["fixed", "exponential"] = "exponential"
+    max_checkpoints: int = 32
+
+    def __post_init__(self) -> None:
+        if self.interval < 1 or self.max_checkpoints < 1:
+            raise ValueError("interval and max_checkpoints must be positive")
+
+
+def retained(seqs: Sequence[int], head: int, policy: CheckpointPolicy) -> Set[int]:
+    """Checkpoint server_seqs to keep when the document is at `head`."""
+    if not seqs:
+        return set()
+    ordered = sorted(seqs)
+    if policy.spacing == "fixed":
+        return set(ordered[-policy.max_checkpoints :])
+
+    oldest_in_band: Dict[int, int] = {}
+    for seq in ordered:
+        band = ((head - seq) // policy.interval).bit_length()
+        oldest_in_band.setdefault(band, seq)
+    keep = set(oldest_in_band.values())
+    keep.add(ordered[-1])
+    return set(sorted(keep)[-policy.max_checkpoints :])
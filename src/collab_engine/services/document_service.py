@@ -2,29 +2,120 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, List
 
+from collab_engine.core.crdt.pending import PendingLimits, PendingStats
 from collab_engine.core.crdt.rga import RGA
-from collab_engine.core.protocol.messages import Op
-from collab_engine.persistence.base import OpRecord, Persistence
+from collab_engine.core.protocol.messages import ElementId, Op
+from collab_engine.logging_config import OP_LOG_SAMPLE_EVERY
+from collab_engine.metrics import (
+    CHECKPOINT_SECONDS,
+    HISTORY_READ_SECONDS,
+    INTEGRATE_SECONDS,
+    MATERIALIZE_SECONDS,
+    OPS_TOTAL,
+    PERSIST_SECONDS,
+)
+from collab_engine.persistence.base import Checkpoint, OpRecord, Persistence
+from collab_engine.services.checkpoints import CheckpointPolicy, retained
+from collab_engine.services.text_diff import diff_edits
 
 
 logger = logging.getLogger(__name__)
 
+# Replica id owning elements created by the server itself (text ingestion).
+# Clients must not use it as their replica id.
+SERVER_REPLICA_ID = "server"
+
+# Point-in-time reads keep this many restored checkpoints around as read-only
+# bases; any read after a cached base replays onto it without restoring again.
+_HISTORY_CACHE_SIZE = 4
+
+# Text ingestion touching more characters than this (diffed, or deleted plus
+# inserted) runs in a worker thread instead of on the event loop.
+_INLINE_EDIT_CHARS = 4096
+
+
+class BaseSeqMismatch(Exception):
+    """The caller's base server_seq is not the document's current server_seq."""
+
+    def __init__(self, server_seq: int) -> None:
+        super().__init__(f"document is at server_seq {server_seq}")
+        self.server_seq = server_seq
+
+
+class EditTooLarge(Exception):
+    """A text edit would delete plus insert more characters than the service allows."""
+
+    def __init__(self, size: int, limit: int) -> None:
+        super().__init__(f"edit touches {size} characters, the limit is {limit}")
+        self.size = size
+        self.limit = limit
+
+
+class IngestFailed(ValueError):
+    """A text edit could not be applied after earlier edits of the same batch were.
+
+    The ops of those earlier edits are sequenced and persisted like any others;
+    `records` holds them so the caller can still fan them out.
+    """
+
+    def __init__(self, message: str, records: list[OpRecord]) -> None:
+        super().__init__(message)
+        self.records = records
+
+
+@dataclass(frozen=True)
+class DocStats:
+    """Point-in-time view of a loaded document, for metrics collection."""
+
+    doc_id: str
+    server_seq: int
+    visible: int
+    tombstones: int
+    pending: PendingStats
+
 
 @dataclass
 class _DocState:
     lock: asyncio.Lock
     crdt: RGA
     server_seq: int
+    checkpoint_seq: int = 0
+
+
+@dataclass
+class _HistoryBase:
+    crdt: RGA
+    server_seq: int
 
 
 class DocumentService:
-    def __init__(self, persistence: Persistence) -> None:
+    def __init__(
+        self,
+        persistence: Persistence,
+        pending_limits: PendingLimits | None = None,
+        check_invariants: bool = __debug__,
+        checkpoint_policy: CheckpointPolicy | None = CheckpointPolicy(),
+        max_edit_chars: int | None = 1_000_000,
+    ) -> None:
+        if pending_limits is not None and pending_limits.max_age_seconds is not None:
+            # Buffered ops are already sequenced, persisted and echoed; dropping one
+            # here would leave this replica behind the oplog and every client.
+            raise ValueError("pending op expiry cannot be combined with a sequenced oplog")
         self._persistence = persistence
+        self._max_edit_chars = max_edit_chars
+        self._pending_limits = pending_limits
+        self._check_invariants = check_invariants
+        self._checkpoint_policy = checkpoint_policy
         self._docs: Dict[str, _DocState] = {}
         self._global_lock = asyncio.Lock()
+        self._history: "OrderedDict[tuple[str, int], _HistoryBase]" = OrderedDict()
+        self._history_lock = threading.Lock()
 
     def get_server_seq(self, doc_id: str) -> int:
         return self._persistence.get_latest_server_seq(doc_id)
@@ -32,16 +123,22 @@ class DocumentService:
     async def apply_op(self, doc_id: str, origin_client_id: str, client_msg_id: str, op: Op) -> int:
         doc = await self._get_or_create_doc(doc_id)
         async with doc.lock:
+            # Integrate first: an op rejected by the CRDT (PendingBufferFull) must not
+            # consume a server_seq.
+            t0 = time.perf_counter()
+            doc.crdt.integrate(op)
+            t1 = time.perf_counter()
+
             doc.server_seq += 1
             server_seq = doc.server_seq
-
-            doc.crdt.integrate(op)
             full_text = doc.crdt.materialize()
+            t2 = time.perf_counter()
 
-            logger.info(
-                "crdt integrated",
-                extra={"doc_id": doc_id, "client_id": origin_client_id, "server_seq": server_seq},
-            )
+            if server_seq % OP_LOG_SAMPLE_EVERY == 0 and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "crdt integrated",
+                    extra={"doc_id": doc_id, "client_id": origin_client_id, "server_seq": server_seq},
+                )
 
             self._persistence.append_op(
                 OpRecord(
@@ -53,39 +150,281 @@ class DocumentService:
                 )
             )
             self._persistence.store_snapshot_text(doc_id=doc_id, server_seq=server_seq, full_text=full_text)
+            t3 = time.perf_counter()
 
+            INTEGRATE_SECONDS.observe(t1 - t0)
+            MATERIALIZE_SECONDS.observe(t2 - t1)
+            PERSIST_SECONDS.observe(t3 - t2)
+            OPS_TOTAL.labels(doc_id).inc()
+
+            self._maybe_checkpoint(doc_id, doc)
             return server_seq
 
+    async def apply_text_edits(
+        self,
+        doc_id: str,
+        origin_client_id: str,
+        client_msg_id: str,
+        base_server_seq: int,
+        edits: list[tuple[int, int, str]] | None = None,
+        full_text: str | None = None,
+    ) -> list[OpRecord]:
+        """Convert plain-text edits into CRDT ops and sequence them atomically.
+
+        Either `edits` (applied in order; each position refers to the text after the
+        previous edit) or `full_text` (diffed against the current text) must be given.
+        `base_server_seq` must equal the current server_seq, otherwise
+        `BaseSeqMismatch` is raised and nothing changes. Edits deleting plus
+        inserting more than `max_edit_chars` characters in total raise
+        `EditTooLarge`, also before anything changes. Returns the appended records.
+
+        Each edit's ops are sequenced and persisted as soon as it is applied, so
+        the replica never runs ahead of the oplog. If an edit fails (`ValueError`)
+        after earlier ones were applied, `IngestFailed` carries their records.
+
+        Large diffs and splices run in a worker thread while the document lock is
+        held, so other documents keep being served. Until the batch is done,
+        `get_snapshot` keeps returning the text and server_seq from before it.
+        """
+        doc = await self._get_or_create_doc(doc_id)
+        async with doc.lock:
+            if base_server_seq != doc.server_seq:
+                raise BaseSeqMismatch(doc.server_seq)
+
+            if full_text is not None:
+                current = doc.crdt.materialize()
+                if len(current) + len(full_text) > _INLINE_EDIT_CHARS:
+                    edits = await asyncio.to_thread(diff_edits, current, full_text)
+                else:
+                    edits = diff_edits(current, full_text)
+            edits = edits or []
+
+            length = len(doc.crdt)
+            size = 0
+            for position, delete_len, insert_text in edits:
+                if position < 0 or delete_len < 0 or position + delete_len > length:
+                    raise ValueError("edit out of range")
+                length += len(insert_text) - delete_len
+                size += delete_len + len(insert_text)
+            if self._max_edit_chars is not None and size > self._max_edit_chars:
+                raise EditTooLarge(size, self._max_edit_chars)
+
+            try:
+                if size > _INLINE_EDIT_CHARS:
+                    records = await asyncio.to_thread(self._ingest, doc_id, doc, edits, origin_client_id, client_msg_id)
+                else:
+                    records = self._ingest(doc_id, doc, edits, origin_client_id, client_msg_id)
+            except IngestFailed as exc:
+                OPS_TOTAL.labels(doc_id).inc(len(exc.records))
+                self._maybe_checkpoint(doc_id, doc)
+                raise
+            if records:
+                OPS_TOTAL.labels(doc_id).inc(len(records))
+                self._maybe_checkpoint(doc_id, doc)
+
+            logger.info(
+                "text edits integrated",
+                extra={"doc_id": doc_id, "client_id": origin_client_id, "server_seq": doc.server_seq},
+            )
+            return records
+
+    def _ingest(
+        self,
+        doc_id: str,
+        doc: _DocState,
+        edits: list[tuple[int, int, str]],
+        origin_client_id: str,
+        client_msg_id: str,
+    ) -> list[OpRecord]:
+        # Called under doc.lock, possibly from a worker thread. A failing splice
+        # changes nothing, and the ops of every splice before it are already in
+        # the oplog, so the replica and the oplog always agree.
+        records: list[OpRecord] = []
+        persist_seconds = 0.0
+        try:
+            for position, delete_len, insert_text in edits:
+                ops = doc.crdt.splice(position, delete_len, insert_text, SERVER_REPLICA_ID)
+                t0 = time.perf_counter()
+                for op in ops:
+                    doc.server_seq += 1
+                    rec = OpRecord(
+                        doc_id=doc_id,
+                        server_seq=doc.server_seq,
+                        origin_client_id=origin_client_id,
+                        client_msg_id=f"{client_msg_id}:{len(records)}",
+                        op=op,
+                    )
+                    self._persistence.append_op(rec)
+                    records.append(rec)
+                persist_seconds += time.perf_counter() - t0
+        except ValueError as exc:
+            if not records:
+                raise
+            raise IngestFailed(str(exc), records) from exc
+        finally:
+            if records:
+                t0 = time.perf_counter()
+                self._persistence.store_snapshot_text(doc_id=doc_id, server_seq=doc.server_seq, full_text=doc.crdt.materialize())
+                PERSIST_SECONDS.observe(persist_seconds + time.perf_counter() - t0)
+        return records
+
+    async def get_text_at(self, doc_id: str, server_seq: int) -> str:
+        """Document text as of `server_seq` (0 is the empty document).
+
+        Replays the ops since the newest checkpoint at or before `server_seq` onto
+        a restored copy of that checkpoint, in a worker thread so the event loop
+        keeps serving. Restoring is O(document), roughly a second per million
+        elements, and is paid once per checkpoint while the copy stays in a small
+        LRU. Each read after a cached copy costs O(replayed ops + document / 512)
+        and leaves the copy untouched. Raises `ValueError` if `server_seq` is
+        negative or ahead of the document.
+        """
+        head = self._persistence.get_latest_server_seq(doc_id)
+        if server_seq < 0 or server_seq > head:
+            raise ValueError(f"server_seq must be between 0 and {head}")
+        return await asyncio.to_thread(self._text_at, doc_id, server_seq)
+
+    def has_element(self, doc_id: str, element_id: ElementId) -> bool:
+        """True if `element_id` is integrated in the loaded document (False if not loaded)."""
+        ds = self._docs.get(doc_id)
+        return ds is not None and ds.crdt.has(element_id)
+
+    def get_pending_stats(self, doc_id: str) -> PendingStats | None:
+        """Buffered-op introspection for a loaded document (None if not loaded)."""
+        ds = self._docs.get(doc_id)
+        if ds is None:
+            return None
+        return ds.crdt.pending_stats()
+
+    def doc_stats(self) -> List[DocStats]:
+        """Snapshot of every loaded document; cost is O(pending ops), not O(document)."""
+        return [
+            DocStats(
+                doc_id=doc_id,
+                server_seq=ds.server_seq,
+                visible=len(ds.crdt),
+                tombstones=ds.crdt.tombstone_count(),
+                pending=ds.crdt.pending_stats(),
+            )
+            for doc_id, ds in list(self._docs.items())
+        ]
+
     def get_snapshot(self, doc_id: str) -> tuple[str, int]:
         snap = self._persistence.get_snapshot_text(doc_id)
         if snap is None:
             return ("", 0)
         return snap
 
+    def _maybe_checkpoint(self, doc_id: str, doc: _DocState) -> None:
+        # Called under doc.lock, so the captured state is exactly doc.server_seq.
+        policy = self._checkpoint_policy
+        if policy is None or doc.server_seq - doc.checkpoint_seq < policy.interval:
+            return
+        t0 = time.perf_counter()
+        state = doc.crdt.checkpoint()
+        self._persistence.store_checkpoint(
+            Checkpoint(doc_id=doc_id, server_seq=doc.server_seq, full_text=state.text, crdt_state=state)
+        )
+        doc.checkpoint_seq = doc.server_seq
+
+        seqs = self._persistence.get_checkpoint_seqs(doc_id)
+        keep = retained(seqs, doc.server_seq, policy)
+        self._persistence.delete_checkpoints(doc_id, [s for s in seqs if s not in keep])
+        CHECKPOINT_SECONDS.observe(time.perf_counter() - t0)
+
+    def _text_at(self, doc_id: str, server_seq: int) -> str:
+        t0 = time.perf_counter()
+        checkpoint = self._persistence.get_checkpoint(doc_id, at_or_before=server_seq)
+        if checkpoint is not None and checkpoint.server_seq == server_seq:
+            HISTORY_READ_SECONDS.observe(time.perf_counter() - t0)
+            return checkpoint.full_text
+        checkpoint_seq = checkpoint.server_seq if checkpoint is not None else 0
+
+        with self._history_lock:
+            base = None
+            for (cached_doc, cached_seq), cached in self._history.items():
+                if cached_doc == doc_id and cached_seq <= server_seq and (base is None or cached_seq > base.server_seq):
+                    base = cached
+            if base is not None:
+                self._history.move_to_end((doc_id, base.server_seq))
+
+        # An older base beats restoring the checkpoint until its extra replay
+        # outweighs the restore, which costs about one replayed op per element.
+        restore_cost = len(checkpoint.crdt_state) if checkpoint is not None else 0
+        if base is None or (base.server_seq < checkpoint_seq and checkpoint_seq - base.server_seq > restore_cost):
+            if checkpoint is not None:
+                crdt = RGA.from_checkpoint(checkpoint.crdt_state, check_invariants=False, pending_limits=self._pending_limits)
+            else:
+                crdt = RGA(check_invariants=False, pending_limits=self._pending_limits)
+            base = _HistoryBase(crdt=crdt, server_seq=checkpoint_seq)
+            with self._history_lock:
+                self._history[(doc_id, checkpoint_seq)] = base
+                while len(self._history) > _HISTORY_CACHE_SIZE:
+                    self._history.popitem(last=False)
+
+        # `text_after` leaves the base untouched, so later reads can share it.
+        text = base.crdt.text_after(rec.op for rec in self._persistence.get_ops_range(doc_id, base.server_seq, server_seq))
+        HISTORY_READ_SECONDS.observe(time.perf_counter() - t0)
+        return text
+
+    async def preload(self, doc_id: str) -> bool:
+        """Load `doc_id` ahead of its first op; False if it was already loaded.
+
+        The rebuild (checkpoint restore plus oplog tail replay) runs in a worker
+        thread, so the event loop keeps serving other documents meanwhile. If a
+        client's first op loads the document first, the preloaded state is
+        discarded: nothing else appends ops for a document that is not loaded.
+        """
+        if doc_id in self._docs:
+            return False
+        ds = await asyncio.to_thread(self._load_doc, doc_id)
+        async with self._global_lock:
+            if doc_id in self._docs:
+                return False
+            self._install_doc(doc_id, ds)
+            return True
+
     async def _get_or_create_doc(self, doc_id: str) -> _DocState:
+        ds = self._docs.get(doc_id)
+        if ds is not None:
+            return ds
         async with self._global_lock:
             ds = self._docs.get(doc_id)
             if ds is not None:
                 return ds
+            ds = self._load_doc(doc_id)
+            self._install_doc(doc_id, ds)
+            return ds
 
-            crdt = RGA()
-            server_seq = self._persistence.get_latest_server_seq(doc_id)
-            ops = self._persistence.get_ops_since(doc_id=doc_id, since_server_seq=0) or []
-            if ops:
-                logger.info(
-                    "crdt rebuild from oplog start",
-                    extra={"doc_id": doc_id, "client_id": "-", "server_seq": server_seq},
-                )
-            for rec in ops:
-                crdt.integrate(rec.op)
-            full_text = crdt.materialize()
-            self._persistence.store_snapshot_text(doc_id=doc_id, server_seq=server_seq, full_text=full_text)
-            if ops:
-                logger.info(
-                    "crdt rebuild from oplog done",
-                    extra={"doc_id": doc_id, "client_id": "-", "server_seq": server_seq},
-                )
+    def _load_doc(self, doc_id: str) -> _DocState:
+        """Rebuild a document from its newest checkpoint and the ops after it."""
+        server_seq = self._persistence.get_latest_server_seq(doc_id)
+        checkpoint = self._persistence.get_checkpoint(doc_id, at_or_before=server_seq)
+        if checkpoint is not None:
+            crdt = RGA.from_checkpoint(
+                checkpoint.crdt_state,
+                check_invariants=self._check_invariants,
+                pending_limits=self._pending_limits,
+            )
+            checkpoint_seq = checkpoint.server_seq
+        else:
+            crdt = RGA(check_invariants=self._check_invariants, pending_limits=self._pending_limits)
+            checkpoint_seq = 0
+        ops = self._persistence.get_ops_range(doc_id, checkpoint_seq, server_seq)
+        if ops:
+            logger.info(
+                "crdt rebuild from oplog start",
+                extra={"doc_id": doc_id, "client_id": "-", "server_seq": server_seq},
+            )
+        for rec in ops:
+            crdt.integrate(rec.op)
+        if ops:
+            logger.info(
+                "crdt rebuild from oplog done",
+                extra={"doc_id": doc_id, "client_id": "-", "server_seq": server_seq},
+            )
+        return _DocState(lock=asyncio.Lock(), crdt=crdt, server_seq=server_seq, checkpoint_seq=checkpoint_seq)
 
-            ds = _DocState(lock=asyncio.Lock(), crdt=crdt, server_seq=server_seq)
-            self._docs[doc_id] = ds
-            return ds
+    def _install_doc(self, doc_id: str, ds: _DocState) -> None:
+        self._persistence.store_snapshot_text(doc_id=doc_id, server_seq=ds.server_seq, full_text=ds.crdt.materialize())
+        self._docs[doc_id] = ds
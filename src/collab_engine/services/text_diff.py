@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+"""Plain-text diffing for server-side text ingestion.
+
+`single_edit` reduces "old text -> new text" to one `(position, delete_len,
+insert_text)` replacement by trimming the common prefix and suffix. This is the
+minimal edit for the common case of a single contiguous change (typing,
+pasting, replacing a selection) and runs in linear time with C-speed
+comparisons, which keeps multi-MB documents in the millisecond range.
+
+On its own, though, two changes far apart (say the first and the last
+character) turn into "replace everything in between". `diff_edits` therefore
+splits what is left between the common prefix and suffix into lines (long lines
+into fixed-size pieces) and aligns them in the style of patience diff. Lines
+that occur exactly once on each side serve as anchors, and the longest
+increasing run of anchors is kept. A gap between anchors with the same number
+of lines on both sides and few differing lines is compared line by line. Other
+gaps are diffed with Myers' algorithm, capped so that its O((n + m) * d) work
+stays bounded. Past the cap, equal-sized gaps still go line by line, and any
+other gap becomes one trimmed edit. A general LCS
+(`difflib` degrades to quadratic on repetitive text) has no such bound. The
+price is a less minimal edit when changes are both many and shifted.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from typing import List
+
+_CHUNK = 4096
+
+# Middles up to this many characters are returned as one edit without diffing.
+_DIFF_MIN_CHARS = 1024
+# Longer lines are split into pieces of this size before aligning.
+_MAX_TOKEN = 256
+# Bounds on Myers' edit distance per gap, and on (n + m) * d token comparisons.
+_MAX_D = 128
+_MAX_WORK = 2_000_000
+
+
+def _common_prefix_len(a: str, b: str, limit: int) -> int:
+    i = 0
+    while i < limit:
+        j = min(i + _CHUNK, limit)
+        if a[i:j] == b[i:j]:
+            i = j
+            continue
+        while a[i] == b[i]:
+            i += 1
+        return i
+    return limit
+
+
+def _common_suffix_len(a: str, b: str, limit: int) -> int:
+    la = len(a)
+    lb = len(b)
+    n = 0
+    while n < limit:
+        m = min(n + _CHUNK, limit)
+        if a[la - m : la - n] == b[lb - m : lb - n]:
+            n = m
+            continue
+        while a[la - n - 1] == b[lb - n - 1]:
+            n += 1
+        return n
+    return limit
+
+
+def single_edit(old: str, new: str) -> tuple[int, int, str]:
+    """Return `(position, delete_len, insert_text)` turning `old` into `new`."""
+    limit = min(len(old), len(new))
+    prefix = _common_prefix_len(old, new, limit)
+    suffix = _common_suffix_len(old, new, limit - prefix)
+    return (prefix, len(old) - prefix - suffix, new[prefix : len(new) - suffix])
+
+
+def _tokens(text: str) -> List[str]:
+    tokens: List[str] = []
+    for line in text.splitlines(keepends=True):
+        if len(line) <= _MAX_TOKEN:
+            tokens.append(line)
+        else:
+            tokens.extend(line[i : i + _MAX_TOKEN] for i in range(0, len(line), _MAX_TOKEN))
+    return tokens
+
+
+def _anchors(a_tokens: List[str], b_tokens: List[str]) -> List[tuple[int, int]]:
+    """Longest run of `(i, j)` pairs of tokens unique on both sides, increasing in both."""
+    a_counts = Counter(a_tokens)
+    b_counts = Counter(b_tokens)
+    b_index = {t: j for j, t in enumerate(b_tokens) if b_counts[t] == 1 and a_counts[t] == 1}
+    pairs = [(i, b_index[t]) for i, t in enumerate(a_tokens) if t in b_index]
+
+    # Longest increasing subsequence on j (pairs are already increasing in i).
+    tails: List[int] = []
+    tail_at: List[int] = []
+    back: List[int] = []
+    for k, (_i, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        back.append(tail_at[pos - 1] if pos else -1)
+        if pos == len(tails):
+            tails.append(j)
+            tail_at.append(k)
+        else:
+            tails[pos] = j
+            tail_at[pos] = k
+    run: List[tuple[int, int]] = []
+    k = tail_at[-1] if tail_at else -1
+    while k >= 0:
+        run.append(pairs[k])
+        k = back[k]
+    run.reverse()
+    return run
+
+
+def _myers(a: List[str], b: List[str], max_d: int) -> List[tuple[int, int, int, int]] | None:
+    """Changed blocks `(i1, i2, j1, j2)` of a shortest edit script, or None beyond `max_d`."""
+    n = len(a)
+    m = len(b)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace: List[List[int]] = []
+    for d in range(max_d + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _myers_blocks(trace, d, k, offset)
+    return None
+
+
+def _myers_blocks(trace: List[List[int]], d: int, k: int, offset: int) -> List[tuple[int, int, int, int]]:
+    # Walk back from the end: each step d came from diagonal k + 1 (an insertion)
+    # or k - 1 (a deletion), recorded as the single-token move it made.
+    steps: List[tuple[int, int, int, int]] = []
+    for step in range(d, 0, -1):
+        v = trace[step]
+        if k == -step or (k != step and v[offset + k - 1] < v[offset + k + 1]):
+            k += 1
+            x = v[offset + k]
+            steps.append((x, x, x - k, x - k + 1))
+        else:
+            k -= 1
+            x = v[offset + k]
+            steps.append((x, x + 1, x - k, x - k))
+    steps.reverse()
+
+    blocks: List[tuple[int, int, int, int]] = []
+    for i1, i2, j1, j2 in steps:
+        if blocks and blocks[-1][1] == i1 and blocks[-1][3] == j1:
+            blocks[-1] = (blocks[-1][0], i2, blocks[-1][2], j2)
+        else:
+            blocks.append((i1, i2, j1, j2))
+    return blocks
+
+
+def diff_edits(old: str, new: str) -> List[tuple[int, int, str]]:
+    """Return edits turning `old` into `new`, in the form `apply_text_edits` takes.
+
+    Edits are in document order and each position refers to the text after the
+    previous edit.
+    """
+    limit = min(len(old), len(new))
+    prefix = _common_prefix_len(old, new, limit)
+    suffix = _common_suffix_len(old, new, limit - prefix)
+    a = old[prefix : len(old) - suffix]
+    b = new[prefix : len(new) - suffix]
+    if not a and not b:
+        return []
+    if not a or not b or len(a) + len(b) <= _DIFF_MIN_CHARS:
+        return [(prefix, len(a), b)]
+
+    a_tokens = _tokens(a)
+    b_tokens = _tokens(b)
+    a_offsets = [0, *accumulate(map(len, a_tokens))]
+    b_offsets = [0, *accumulate(map(len, b_tokens))]
+    edits: List[tuple[int, int, str]] = []
+
+    def replace(i1: int, i2: int, j1: int, j2: int) -> None:
+        position, delete_len, insert_text = single_edit(a[a_offsets[i1] : a_offsets[i2]], b[b_offsets[j1] : b_offsets[j2]])
+        if delete_len or insert_text:
+            edits.append((prefix + b_offsets[j1] + position, delete_len, insert_text))
+
+    i = j = 0
+    for ai, bj in [*_anchors(a_tokens, b_tokens), (len(a_tokens), len(b_tokens))]:
+        gap_a = a_tokens[i:ai]
+        gap_b = b_tokens[j:bj]
+        changed = [k for k, (x, y) in enumerate(zip(gap_a, gap_b)) if x != y] if len(gap_a) == len(gap_b) else None
+        blocks = None
+        if changed is None or len(changed) > _MAX_D:
+            blocks = _myers(gap_a, gap_b, min(_MAX_D, _MAX_WORK // (len(gap_a) + len(gap_b))))
+        if blocks is not None:
+            for i1, i2, j1, j2 in blocks:
+                replace(i + i1, i + i2, j + j1, j + j2)
+        elif changed is not None:
+            for k in changed:
+                replace(i + k, i + k + 1, j + k, j + k + 1)
+        else:
+            replace(i, ai, j, bj)
+        i, j = ai + 1, bj + 1
+    return edits
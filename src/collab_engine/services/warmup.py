@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+"""Background warm-up of recently active documents after a restart.
+
+Without it, the first op on each document after a deploy pays the document's
+rebuild (checkpoint restore plus oplog tail replay) inside `apply_op`. `Warmup`
+preloads the `top_k` most recently written documents, newest first, through
+`DocumentService.preload`, and reports progress so `/health` can keep the
+process out of rotation until warm-up is done.
+
+Warm-up is best-effort: a document that fails to load is logged and skipped,
+and is then loaded on demand like any other document.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Literal
+
+from collab_engine.persistence.base import Persistence
+from collab_engine.services.document_service import DocumentService
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WarmupStatus:
+    state: Literal["warming", "ready"]
+    target_docs: int
+    warmed_docs: int
+    failed_docs: int
+    seconds: float
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+
+class Warmup:
+    def __init__(self, service: DocumentService, persistence: Persistence) -> None:
+        self._service = service
+        self._persistence = persistence
+        self._state: Literal["warming", "ready"] = "ready"
+        self._target = 0
+        self._warmed = 0
+        self._failed = 0
+        self._started = 0.0
+        self._finished = 0.0
+
+    def begin(self) -> None:
+        """Report `warming` from now until `run` finishes."""
+        self._state = "warming"
+        self._started = self._finished = time.perf_counter()
+
+    def status(self) -> WarmupStatus:
+        end = self._finished if self._state == "ready" else time.perf_counter()
+        return WarmupStatus(
+            state=self._state,
+            target_docs=self._target,
+            warmed_docs=self._warmed,
+            failed_docs=self._failed,
+            seconds=end - self._started,
+        )
+
+    async def run(self, top_k: int) -> None:
+        """Preload the `top_k` most recently written documents, one at a time."""
+        if self._state != "warming":
+            self.begin()
+        try:
+            doc_ids = self._persistence.recent_doc_ids(top_k) if top_k > 0 else []
+            self._target = len(doc_ids)
+            logger.info("warmup start: %d docs", len(doc_ids))
+            for doc_id in doc_ids:
+                try:
+                    await self._service.preload(doc_id)
+                except Exception:
+                    self._failed += 1
+                    logger.exception("warmup failed", extra={"doc_id": doc_id})
+                else:
+                    self._warmed += 1
+        finally:
+            self._state = "ready"
+            self._finished = time.perf_counter()
+        logger.info("warmup done: %d docs in %.3fs", self._warmed, self._finished - self._started)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from collab_engine.core.protocol.messages import PresenceState, ServerPresenceUpdate
+
+logger = logging.getLogger(__name__)
+
+# Coalescing window: each room gets at most one presence broadcast per tick.
+PRESENCE_TICK_SECONDS = 0.05
+
+Broadcast = Callable[[str, dict[str, Any]], Awaitable[None]]
+
+
+@dataclass
+class _PresenceRoom:
+    # Latest state per client, and the connection that owns it.
+    states: Dict[str, PresenceState] = field(default_factory=dict)
+    owners: Dict[str, object] = field(default_factory=dict)
+    # Changes since the last tick.
+    dirty: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+
+
+class PresenceManager:
+    """Ephemeral cursor/selection state per document room.
+
+    Presence lives outside the CRDT: it is never sequenced or persisted, only the
+    latest state per client is kept, and updates are coalesced so a room costs at
+    most one broadcast per tick regardless of how fast cursors move.
+    """
+
+    def __init__(self) -> None:
+        self._rooms: Dict[str, _PresenceRoom] = {}
+
+    def update(self, doc_id: str, owner: object, state: PresenceState) -> None:
+        room = self._rooms.setdefault(doc_id, _PresenceRoom())
+        room.states[state.client_id] = state
+        room.owners[state.client_id] = owner
+        room.dirty.add(state.client_id)
+        room.removed.discard(state.client_id)
+
+    def remove(self, doc_id: str, client_id: str, owner: object) -> None:
+        """Drop a client's presence, unless a newer connection of the same client owns it."""
+        room = self._rooms.get(doc_id)
+        if room is None or room.owners.get(client_id) is not owner:
+            return
+        del room.states[client_id]
+        del room.owners[client_id]
+        room.dirty.discard(client_id)
+        room.removed.add(client_id)
+
+    def snapshot(self, doc_id: str) -> List[PresenceState]:
+        room = self._rooms.get(doc_id)
+        return list(room.states.values()) if room is not None else []
+
+    def counts(self) -> Dict[str, int]:
+        """Live presence entries per room."""
+        return {doc_id: len(room.states) for doc_id, room in list(self._rooms.items()) if room.states}
+
+    def drain(self) -> List[ServerPresenceUpdate]:
+        """Collect one coalesced update per room with changes, and reset the change sets."""
+        out: List[ServerPresenceUpdate] = []
+        for doc_id, room in list(self._rooms.items()):
+            if room.dirty or room.removed:
+                out.append(
+                    ServerPresenceUpdate(
+                        doc_id=doc_id,
+                        updates=[room.states[c] for c in room.dirty],
+                        removed=sorted(room.removed),
+                    )
+                )
+                room.dirty = set()
+                room.removed = set()
+            if not room.states:
+                del self._rooms[doc_id]
+        return out
+
+    async def run(self, broadcast: Broadcast, interval: float = PRESENCE_TICK_SECONDS) -> None:
+        """Broadcast coalesced updates every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            for msg in self.drain():
+                try:
+                    await broadcast(msg.doc_id, msg.model_dump())
+                except Exception:
+                    logger.exception("presence broadcast failed", extra={"doc_id": msg.doc_id})
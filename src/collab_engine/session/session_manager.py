@@ -4,7 +4,7 @@ import asyncio
 import json
 import logging
 from dataclasses import dataclass, field
-from typing import Any, Dict, Set
+from typing import Any, Dict, List, Set
 
 from fastapi import WebSocket
 
@@ -21,7 +21,12 @@ class Connection:
     async def send_json(self, payload: dict[str, Any]) -> None:
         if self.closed:
             return
-        msg = json.dumps(payload, separators=(",", ":"))
+        await self.send_text(json.dumps(payload, separators=(",", ":")))
+
+    async def send_text(self, msg: str) -> None:
+        """Queue an already-serialized message."""
+        if self.closed:
+            return
         try:
             self.send_queue.put_nowait(msg)
         except asyncio.QueueFull:
@@ -43,6 +48,16 @@ class Connection:
         self.closed = True
 
 
+@dataclass(frozen=True)
+class RoomStats:
+    """Point-in-time view of a document room, for metrics collection."""
+
+    doc_id: str
+    connections: int
+    queued_messages: int
+    max_queue_depth: int
+
+
 class SessionManager:
     def __init__(self) -> None:
         self._lock = asyncio.Lock()
@@ -70,5 +85,27 @@ class SessionManager:
         async with self._lock:
             conns = list(self._doc_rooms.get(doc_id, set()))
 
+        if not conns:
+            return
+        # Serialize once per broadcast, not once per connection.
+        msg = json.dumps(message, separators=(",", ":"))
         for c in conns:
-            await c.send_json(message)
+            await c.send_text(msg)
+
+    def room_stats(self) -> List[RoomStats]:
+        """Snapshot of every room's size and outbound queue depths.
+
+        Reads without the lock; call from the event loop thread.
+        """
+        stats: List[RoomStats] = []
+        for doc_id, room in list(self._doc_rooms.items()):
+            depths = [c.send_queue.qsize() for c in room]
+            stats.append(
+                RoomStats(
+                    doc_id=doc_id,
+                    connections=len(depths),
+                    queued_messages=sum(depths),
+                    max_queue_depth=max(depths, default=0),
+                )
+            )
+        return stats
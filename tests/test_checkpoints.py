@@ -0,0 +1,187 @@
+"""Tests for checkpoints and point-in-time reads.
+
+These tests validate that a restored checkpoint is an equivalent CRDT replica,
+that retention keeps the expected checkpoints, and that reading the document at
+any server_seq matches a replay from zero.
+"""
+
+import asyncio
+import random
+from bisect import bisect_right
+
+import pytest
+
+from collab_engine.core.crdt.rga import ROOT_ID, RGA
+from collab_engine.core.protocol.messages import DeleteOp, InsertOp
+from collab_engine.persistence.memory import InMemoryPersistence
+from collab_engine.services.checkpoints import CheckpointPolicy, retained
+from collab_engine.services.document_service import DocumentService
+
+
+def _random_ops(n: int, seed: int) -> list:
+    """Ops from three replicas typing and deleting at random positions."""
+    rnd = random.Random(seed)
+    rga = RGA(check_invariants=False)
+    ops = []
+    while len(ops) < n:
+        if len(rga) and rnd.random() < 0.25:
+            ops.extend(rga.splice(rnd.randrange(len(rga)), 1, "", "a"))
+        else:
+            ops.extend(rga.splice(rnd.randrange(len(rga) + 1), 0, rnd.choice("xyz"), rnd.choice("abc")))
+    return ops[:n]
+
+
+def test_checkpoint_restores_equivalent_replica() -> None:
+    """A restored replica must match the original, keep buffered ops and keep converging."""
+
+    ops = _random_ops(600, seed=3)
+    original = RGA()
+    for op in ops[:400]:
+        original.integrate(op)
+    original.integrate(InsertOp(type="ins", parent_id=(9999, "q"), id=(10000, "q"), value="!"))
+    original.integrate(DeleteOp(type="del", id=(5000, "q")))
+
+    state = original.checkpoint()
+    restored = RGA.from_checkpoint(state)
+    assert restored.materialize() == original.materialize()
+    assert len(restored) == len(original)
+    assert restored.tombstone_count() == original.tombstone_count()
+    assert restored.pending_stats().inserts == 1 and restored.pending_stats().deletes == 1
+
+    for op in ops[400:]:
+        original.integrate(op)
+        restored.integrate(op)
+    assert restored.materialize() == original.materialize()
+    assert restored.splice(0, 0, "^", "z") == original.splice(0, 0, "^", "z")
+
+    # The checkpoint must not change when the source moves on.
+    assert RGA.from_checkpoint(state).materialize() != original.materialize()
+
+
+def test_text_after_matches_replay_and_leaves_replica_alone() -> None:
+    """Overlaying ops, out of order and with duplicates, must equal integrating them."""
+
+    for seed in range(20):
+        ops = _random_ops(500, seed=seed)
+        rnd = random.Random(seed)
+        base = RGA(check_invariants=False)
+        for op in ops[:300]:
+            base.integrate(op)
+        tail = ops[300:] + rnd.sample(ops[250:], 40)
+        rnd.shuffle(tail)
+        # Some of the tail is already buffered in the base.
+        for op in tail[:30]:
+            base.integrate(op)
+
+        before = base.checkpoint()
+        reference = RGA.from_checkpoint(before, check_invariants=False)
+        for op in tail:
+            reference.integrate(op)
+
+        assert base.text_after(tail) == reference.materialize(), seed
+        assert base.checkpoint() == before
+
+
+def test_consecutive_checkpoints_share_unchanged_blocks() -> None:
+    """A capture must reuse the previous capture's unchanged blocks and still restore exactly."""
+
+    rga = RGA(check_invariants=False)
+    for op in _random_ops(5000, seed=7):
+        rga.integrate(op)
+    first = rga.checkpoint()
+
+    rga.splice(len(rga) - 1, 1, "", "a")
+    rga.splice(len(rga), 0, "!", "b")
+    rga.splice(0, 0, "^", "b")
+    second = rga.checkpoint()
+
+    assert len(first.tour) > 3
+    shared = sum(a is b for a, b in zip(first.tour[1:-1], second.tour[1:-1]))
+    assert shared == len(first.tour) - 2
+    assert second.tombstones[1:-1] == first.tombstones[1:-1]
+
+    restored = RGA.from_checkpoint(second)
+    assert restored.materialize() == rga.materialize()
+    assert restored.tombstone_count() == rga.tombstone_count()
+    assert RGA.from_checkpoint(first).materialize() != rga.materialize()
+
+
+def test_retention_policies() -> None:
+    """Fixed keeps the newest N; exponential thins old checkpoints by age band."""
+
+    seqs = list(range(100, 100_001, 100))
+    fixed = CheckpointPolicy(interval=100, spacing="fixed", max_checkpoints=8)
+    assert retained(seqs, 100_000, fixed) == set(range(99_300, 100_001, 100))
+
+    exp = CheckpointPolicy(interval=100, spacing="exponential", max_checkpoints=64)
+    kept = sorted(retained(seqs, 100_000, exp))
+    assert kept[-1] == 100_000
+    assert len(kept) <= 12
+    # Gaps grow with age: bands double, so a gap is under 3x the newer checkpoint's age.
+    for older, newer in zip(kept, kept[1:]):
+        assert newer - older < 3 * max(100, 100_000 - newer)
+
+    assert retained([], 10, exp) == set()
+    with pytest.raises(ValueError):
+        CheckpointPolicy(interval=0)
+
+
+@pytest.mark.parametrize("interval", [7, 100])
+def test_replay_length_is_bounded(interval: int) -> None:
+    """Replay from the nearest kept checkpoint stays under 2 * max(interval, age of the read)."""
+
+    exp = CheckpointPolicy(interval=interval, spacing="exponential")
+    fixed = CheckpointPolicy(interval=interval, spacing="fixed", max_checkpoints=8)
+    kept = {exp: [], fixed: []}
+    for head in range(interval, 400 * interval + 1, interval):
+        # Retention runs after every checkpoint, as in `DocumentService`.
+        for policy in kept:
+            kept[policy] = sorted(retained([*kept[policy], head], head, policy))
+        # Replay is longest just before a kept checkpoint.
+        probes = {head, *range(0, head, 5), *(s - 1 for policy in kept for s in kept[policy])}
+        for seq in probes:
+            exp_base = kept[exp][bisect_right(kept[exp], seq) - 1] if seq >= kept[exp][0] else 0
+            assert seq - exp_base < 2 * max(interval, head - seq), (head, seq)
+            if seq >= kept[fixed][0]:
+                fixed_base = kept[fixed][bisect_right(kept[fixed], seq) - 1]
+                assert seq - fixed_base < interval, (head, seq)
+
+
+@pytest.mark.parametrize("spacing", ["fixed", "exponential"])
+def test_text_at_any_seq_matches_full_replay(spacing: str) -> None:
+    """Reads at arbitrary server_seqs must equal a replay from zero, also after a cold load."""
+
+    ops = _random_ops(1200, seed=11)
+    persistence = InMemoryPersistence()
+    policy = CheckpointPolicy(interval=100, spacing=spacing, max_checkpoints=6)
+    svc = DocumentService(persistence=persistence, check_invariants=False, checkpoint_policy=policy)
+
+    reference = RGA(check_invariants=False)
+    expected = [""]
+    for op in ops:
+        reference.integrate(op)
+        expected.append(reference.materialize())
+
+    async def run() -> None:
+        for i, op in enumerate(ops):
+            await svc.apply_op(doc_id="d", origin_client_id="a", client_msg_id=f"m{i}", op=op)
+
+        seqs = persistence.get_checkpoint_seqs("d")
+        assert 0 < len(seqs) <= 6 and seqs[-1] == 1200
+
+        rnd = random.Random(5)
+        probes = [0, 1, 100, 1200] + rnd.sample(range(1201), 40) + list(range(700, 760, 7))
+        for seq in probes:
+            assert await svc.get_text_at("d", seq) == expected[seq], seq
+
+        with pytest.raises(ValueError):
+            await svc.get_text_at("d", 1201)
+
+        cold = DocumentService(persistence=persistence, checkpoint_policy=policy)
+        await cold.apply_op(
+            doc_id="d", origin_client_id="b", client_msg_id="late", op=InsertOp(type="ins", parent_id=ROOT_ID, id=(10**6, "b"), value="!")
+        )
+        reference.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(10**6, "b"), value="!"))
+        assert cold.get_snapshot("d") == (reference.materialize(), 1201)
+
+    asyncio.run(run())
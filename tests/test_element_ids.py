@@ -0,0 +1,96 @@
+"""Tests for replica interning and packed element ids.
+
+These tests validate that packing ids into integers is invisible to CRDT
+semantics: ordering must match `(lamport, replica_id)` tuple ordering no matter
+in which order replicas were first seen.
+"""
+
+import json
+
+from collab_engine.core.crdt.ids import ReplicaTable
+from collab_engine.core.crdt.rga import ROOT_ID, RGA
+from collab_engine.core.protocol.messages import ClientOp, InsertOp, parse_client_message
+
+
+def test_pack_unpack_roundtrip() -> None:
+    """Packing then unpacking must return the original id."""
+
+    table = ReplicaTable()
+    for element_id in [(0, "root"), (1, "a"), (2**40, "b"), (7, "a")]:
+        assert table.unpack(table.pack(element_id)) == element_id
+
+    assert len(table) == 3
+    assert table.lookup((1, "unknown")) is None
+    assert table.lookup((3, "a")) == table.pack((3, "a"))
+
+
+def test_sort_key_matches_tuple_order_regardless_of_intern_order() -> None:
+    """Sort keys must follow tuple ordering, not replica arrival order."""
+
+    ids = [(2, "z"), (1, "b"), (1, "a"), (2, "a"), (10, "m")]
+    table = ReplicaTable()
+    packed = [table.pack(i) for i in ids]
+
+    ordered = [table.unpack(p) for p in sorted(packed, key=table.sort_key)]
+    assert ordered == sorted(ids)
+
+
+def test_insertion_point_matches_sort_key_bisect() -> None:
+    """Integer bisection with name tie-breaks must agree with sorting by `sort_key`."""
+
+    table = ReplicaTable()
+    names = ["m", "c", "x", "a", "q"]
+    ordered: list[int] = []
+    for lamport in [3, 1, 3, 2, 3, 1, 5, 3]:
+        for name in names:
+            packed = table.pack((lamport, name))
+            if packed in ordered:
+                continue
+            ordered.insert(table.insertion_point(ordered, packed), packed)
+        names.reverse()
+    assert ordered == sorted(ordered, key=table.sort_key)
+    assert table.insertion_point(ordered, table.pack((3, "b"))) == [table.unpack(p) for p in ordered].index((3, "c"))
+
+
+def test_concurrent_inserts_ordered_by_replica_name_not_arrival() -> None:
+    """Replicas interned in reverse name order must still order deterministically."""
+
+    ops = [
+        InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "c"), value="C"),
+        InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "b"), value="B"),
+        InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "a"), value="A"),
+        InsertOp(type="ins", parent_id=ROOT_ID, id=(2, "a"), value="D"),
+    ]
+
+    rga1 = RGA()
+    for op in ops:
+        rga1.integrate(op)
+
+    rga2 = RGA()
+    for op in reversed(ops):
+        rga2.integrate(op)
+
+    assert rga1.materialize() == "ABCD"
+    assert rga2.materialize() == "ABCD"
+    assert rga1.has((1, "b"))
+    assert not rga1.has((1, "never-seen"))
+
+
+def test_decoded_replica_ids_are_interned() -> None:
+    """Ops decoded from separate JSON messages must share replica id strings."""
+
+    def raw(lamport: int) -> str:
+        return json.dumps(
+            {
+                "type": "op",
+                "doc_id": "d",
+                "client_id": "c",
+                "client_msg_id": f"m{lamport}",
+                "op": {"type": "ins", "parent_id": [0, "root"], "id": [lamport, "replica-" + "x" * 8], "value": "a"},
+            }
+        )
+
+    m1 = parse_client_message(raw(1))
+    m2 = parse_client_message(raw(2))
+    assert isinstance(m1, ClientOp) and isinstance(m2, ClientOp)
+    assert m1.op.id[1] is m2.op.id[1]
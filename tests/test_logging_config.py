@@ -0,0 +1,119 @@
+"""Tests for the logging pipeline.
+
+These tests validate structured JSON output, per-logger sampling and rate
+limiting, and that queue mode drops rather than blocks when it falls behind.
+"""
+
+import io
+import json
+import logging
+
+import pytest
+
+from collab_engine.logging_config import (
+    DROPPED_TOTAL,
+    _parse_rates,
+    _RateLimitFilter,
+    _SamplingFilter,
+    make_handler,
+)
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    log = logging.getLogger(name)
+    log.handlers = [handler]
+    log.filters = []
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    return log
+
+
+def test_json_output_carries_context_fields() -> None:
+    """JSON lines must include doc_id/client_id/server_seq and survive the queue hop."""
+
+    stream = io.StringIO()
+    handler, listener = make_handler(stream=stream, json_format=True, use_queue=True)
+    log = _logger("collab_engine.test.json", handler)
+    log.info("op %s", "integrated", extra={"doc_id": "d", "client_id": "c", "server_seq": 7})
+    log.warning("no context")
+    assert listener is not None
+    listener.stop()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["msg"] == "op integrated"
+    assert (first["doc_id"], first["client_id"], first["server_seq"]) == ("d", "c", 7)
+    assert first["level"] == "INFO"
+    assert second["doc_id"] is None
+
+
+@pytest.mark.parametrize("json_format", [True, False])
+def test_queued_exception_keeps_traceback_out_of_msg(json_format: bool) -> None:
+    """`logger.exception` through the queue keeps the message and the traceback apart."""
+
+    stream = io.StringIO()
+    handler, listener = make_handler(stream=stream, json_format=json_format, use_queue=True)
+    log = _logger("collab_engine.test.exc", handler)
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        log.exception("apply failed for %s", "d", extra={"doc_id": "d"})
+    assert listener is not None
+    listener.stop()
+
+    output = stream.getvalue()
+    if json_format:
+        (entry,) = [json.loads(line) for line in output.splitlines()]
+        assert entry["msg"] == "apply failed for d"
+        assert entry["exc"].startswith("Traceback") and "RuntimeError: boom" in entry["exc"]
+        assert entry["doc_id"] == "d"
+    else:
+        first, *rest = output.splitlines()
+        assert "apply failed for d" in first and "doc_id=d" in first
+        assert rest[0].startswith("Traceback") and rest[-1] == "RuntimeError: boom"
+
+
+def test_sampling_and_rate_limit_spare_warnings() -> None:
+    """Filters thin INFO/DEBUG volume but never drop WARNING and above."""
+
+    stream = io.StringIO()
+    handler, _ = make_handler(stream=stream, json_format=True)
+    log = _logger("collab_engine.test.sampled", handler)
+    log.addFilter(_SamplingFilter(0.1))
+    for i in range(100):
+        log.info("tick", extra={"server_seq": i})
+    log.warning("kept")
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 11
+
+    stream = io.StringIO()
+    handler, _ = make_handler(stream=stream)
+    log = _logger("collab_engine.test.limited", handler)
+    log.addFilter(_RateLimitFilter(5))
+    for _ in range(1000):
+        log.debug("burst")
+    log.error("kept")
+    assert len(stream.getvalue().splitlines()) == 6
+
+
+def test_full_queue_drops_and_counts() -> None:
+    """A stalled queue must not block the caller."""
+
+    stream = io.StringIO()
+    handler, listener = make_handler(stream=stream, use_queue=True, queue_size=3)
+    assert listener is not None
+    listener.stop()  # nothing drains the queue now
+
+    log = _logger("collab_engine.test.queue", handler)
+    before = DROPPED_TOTAL.labels("queue_full").value
+    for _ in range(10):
+        log.info("x")
+    assert DROPPED_TOTAL.labels("queue_full").value - before == 7
+
+
+def test_parse_rates() -> None:
+    """Env specs map logger names to numbers."""
+
+    assert _parse_rates("") == {}
+    assert _parse_rates("collab_engine.api.ws=0.01, a.b=50") == {"collab_engine.api.ws": 0.01, "a.b": 50.0}
+    with pytest.raises(ValueError):
+        _parse_rates("nonsense")
@@ -0,0 +1,69 @@
+"""Tests for Prometheus-style metrics.
+
+These tests validate the text exposition format and that the document service
+and session manager expose the values the `/metrics` collector reads.
+"""
+
+import asyncio
+
+from collab_engine.core.crdt.rga import ROOT_ID
+from collab_engine.core.protocol.messages import DeleteOp, InsertOp
+from collab_engine.metrics import OPS_TOTAL, Counter, GaugeFamily, Histogram, Registry
+from collab_engine.persistence.memory import InMemoryPersistence
+from collab_engine.services.document_service import DocumentService
+from collab_engine.session.session_manager import Connection, SessionManager
+
+
+def test_render_exposition_format() -> None:
+    """Histogram buckets must be cumulative and labels escaped."""
+
+    reg = Registry()
+    h = Histogram("t_seconds", "timing", buckets=(0.1, 1.0))
+    c = Counter("t_total", "count", ["doc_id"])
+    reg.register(h)
+    reg.register(c)
+    reg.add_collector(lambda: [GaugeFamily("t_gauge", "gauge", [({"doc_id": 'a"b'}, 0.5)])])
+
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v)
+    c.labels("d").inc()
+    c.labels("d").inc(2)
+
+    lines = reg.render().splitlines()
+    assert "# TYPE t_seconds histogram" in lines
+    assert 't_seconds_bucket{le="0.1"} 1' in lines
+    assert 't_seconds_bucket{le="1"} 2' in lines
+    assert 't_seconds_bucket{le="+Inf"} 3' in lines
+    assert "t_seconds_count 3" in lines
+    assert 't_total{doc_id="d"} 3' in lines
+    assert 't_gauge{doc_id="a\\"b"} 0.5' in lines
+
+
+def test_service_and_sessions_expose_stats() -> None:
+    """Op counters, tombstone counts and room queue depths must be observable."""
+
+    svc = DocumentService(persistence=InMemoryPersistence())
+    sessions = SessionManager()
+    before = OPS_TOTAL.labels("m").value
+
+    async def run() -> None:
+        await svc.apply_op("m", "a", "1", InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "a"), value="x"))
+        await svc.apply_op("m", "a", "2", InsertOp(type="ins", parent_id=(1, "a"), id=(2, "a"), value="y"))
+        await svc.apply_op("m", "a", "3", DeleteOp(type="del", id=(1, "a")))
+
+        conns = [Connection(websocket=None, client_id=f"c{i}") for i in range(3)]  # type: ignore[arg-type]
+        for conn in conns:
+            await sessions.join(doc_id="m", connection=conn)
+        await conns[0].send_json({"k": 1})
+        await conns[0].send_json({"k": 2})
+        await conns[1].send_json({"k": 3})
+
+    asyncio.run(run())
+
+    assert OPS_TOTAL.labels("m").value - before == 3
+    (stats,) = [d for d in svc.doc_stats() if d.doc_id == "m"]
+    assert (stats.server_seq, stats.visible, stats.tombstones) == (3, 1, 1)
+    assert stats.pending.inserts == 0
+
+    (room,) = sessions.room_stats()
+    assert (room.connections, room.queued_messages, room.max_queue_depth) == (3, 3, 2)
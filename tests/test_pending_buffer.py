@@ -0,0 +1,178 @@
+"""Tests for the bounded pending-dependency buffer.
+
+These tests validate that buffered ops are bounded and introspectable, that
+rejected ops leave state untouched, and that long out-of-order chains drain
+without recursion.
+"""
+
+import asyncio
+import random
+import time
+
+import pytest
+
+from collab_engine.core.crdt.pending import PendingBuffer, PendingBufferFull, PendingLimits
+from collab_engine.core.crdt.rga import ROOT_ID, RGA
+from collab_engine.core.protocol.messages import DeleteOp, InsertOp
+from collab_engine.persistence.memory import InMemoryPersistence
+from collab_engine.services.document_service import DocumentService
+
+
+def _orphan(i: int) -> InsertOp:
+    return InsertOp(type="ins", parent_id=(10_000 + i, "ghost"), id=(i, "evil"), value="x")
+
+
+def test_pending_ops_limit_rejects_without_mutating_state() -> None:
+    """An op over the limit must raise and leave the buffer unchanged."""
+
+    rga = RGA(pending_limits=PendingLimits(max_ops=3))
+    for i in range(3):
+        rga.integrate(_orphan(i))
+
+    with pytest.raises(PendingBufferFull):
+        rga.integrate(_orphan(3))
+    with pytest.raises(PendingBufferFull):
+        rga.integrate(DeleteOp(type="del", id=(99, "ghost")))
+
+    # Duplicates of already-buffered ops do not consume budget.
+    rga.integrate(_orphan(0))
+
+    stats = rga.pending_stats()
+    assert stats.inserts == 3
+    assert stats.deletes == 0
+    assert stats.missing_dependencies == 3
+
+
+def test_pending_bytes_limit() -> None:
+    """The approximate byte budget must be enforced independently of op count."""
+
+    rga = RGA(pending_limits=PendingLimits(max_ops=1_000, max_bytes=600))
+    rga.integrate(_orphan(0))
+    rga.integrate(_orphan(1))
+    with pytest.raises(PendingBufferFull):
+        rga.integrate(_orphan(2))
+    assert rga.pending_stats().bytes <= 600
+
+
+def test_pending_stats_report_oldest_missing_dependency() -> None:
+    """Stats must name the dependency the oldest buffered op is waiting for."""
+
+    rga = RGA()
+    assert rga.pending_stats().oldest_missing_dependency is None
+
+    rga.integrate(DeleteOp(type="del", id=(7, "late")))
+    rga.integrate(InsertOp(type="ins", parent_id=(5, "p"), id=(6, "c"), value="c"))
+
+    stats = rga.pending_stats()
+    assert stats.inserts == 1
+    assert stats.deletes == 1
+    assert stats.oldest_missing_dependency == (7, "late")
+    assert stats.oldest_age_seconds is not None and stats.oldest_age_seconds >= 0
+
+    rga.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(7, "late"), value="L"))
+    stats = rga.pending_stats()
+    assert stats.deletes == 0
+    assert stats.oldest_missing_dependency == (5, "p")
+    assert rga.materialize() == ""
+
+
+def test_expired_entries_are_dropped() -> None:
+    """Entries older than max_age_seconds must be dropped from every index."""
+
+    buf = PendingBuffer(PendingLimits(max_age_seconds=5.0))
+    op = _orphan(0)
+    buf.add_insert(op.parent_id, op.id, op)
+    buf.add_delete((3, "ghost"))
+
+    assert buf.expire(now=time.monotonic()) == 0
+    assert buf.expire(now=time.monotonic() + 10.0) == 2
+    assert len(buf) == 0
+    assert buf.bytes == 0
+    assert buf.release_inserts(op.parent_id) == []
+    assert not buf.release_delete((3, "ghost"))
+
+
+def test_service_refuses_pending_expiry() -> None:
+    """Expiring ops that were already sequenced would diverge from the oplog, so the service refuses it."""
+
+    with pytest.raises(ValueError):
+        DocumentService(persistence=InMemoryPersistence(), pending_limits=PendingLimits(max_age_seconds=5.0))
+
+
+def test_buffered_and_rejected_ops_do_not_intern_replicas() -> None:
+    """Only integrated elements may add replica ids to the document's table."""
+
+    rga = RGA(pending_limits=PendingLimits(max_ops=2))
+    rga.integrate(_orphan(0))
+    rga.integrate(DeleteOp(type="del", id=(1, "ghost-target")))
+    with pytest.raises(PendingBufferFull):
+        rga.integrate(_orphan(1))
+    assert rga.checkpoint().replicas == ("root",)
+
+    rga.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "ghost-target"), value="t"))
+    assert rga.checkpoint().replicas == ("root", "ghost-target")
+    assert rga.materialize() == ""
+
+
+def test_service_rejected_op_does_not_consume_server_seq() -> None:
+    """A PendingBufferFull op must not advance server_seq or reach the op log."""
+
+    persistence = InMemoryPersistence()
+    svc = DocumentService(persistence=persistence, pending_limits=PendingLimits(max_ops=1))
+
+    async def run() -> None:
+        await svc.apply_op(doc_id="d", origin_client_id="c", client_msg_id="m1", op=_orphan(0))
+        with pytest.raises(PendingBufferFull):
+            await svc.apply_op(doc_id="d", origin_client_id="c", client_msg_id="m2", op=_orphan(1))
+
+    asyncio.run(run())
+
+    assert persistence.get_latest_server_seq("d") == 1
+    stats = svc.get_pending_stats("d")
+    assert stats is not None and stats.inserts == 1
+
+
+def test_stress_100k_reverse_order_chain_drains_iteratively() -> None:
+    """A 100k-long chain delivered in reverse must drain without recursion."""
+
+    n = 100_000
+    ops = [
+        InsertOp(type="ins", parent_id=(i - 1, "a") if i > 1 else ROOT_ID, id=(i, "a"), value="ab"[i % 2])
+        for i in range(1, n + 1)
+    ]
+
+    rga = RGA(check_invariants=False, pending_limits=PendingLimits(max_ops=n, max_bytes=1 << 30))
+    for op in reversed(ops):
+        rga.integrate(op)
+
+    assert len(rga.materialize()) == n
+    assert rga.pending_stats().inserts == 0
+
+
+def test_stress_100k_shuffled_ops_converge() -> None:
+    """100k shuffled inserts and deletes must converge to the in-order result."""
+
+    rnd = random.Random(1234)
+    n = 100_000
+    ids = [ROOT_ID]
+    ops: list = []
+    for i in range(1, n + 1):
+        element_id = (i, f"r{rnd.randrange(16)}")
+        ops.append(InsertOp(type="ins", parent_id=ids[rnd.randrange(len(ids))], id=element_id, value="x"))
+        ids.append(element_id)
+        if rnd.random() < 0.1:
+            ops.append(DeleteOp(type="del", id=ids[rnd.randrange(1, len(ids))]))
+
+    in_order = RGA(check_invariants=False)
+    for op in ops:
+        in_order.integrate(op)
+
+    shuffled = list(ops)
+    rnd.shuffle(shuffled)
+    out_of_order = RGA(check_invariants=False, pending_limits=PendingLimits(max_ops=len(ops), max_bytes=1 << 30))
+    for op in shuffled:
+        out_of_order.integrate(op)
+
+    assert out_of_order.pending_stats().inserts == 0
+    assert out_of_order.pending_stats().deletes == 0
+    assert out_of_order.materialize() == in_order.materialize()
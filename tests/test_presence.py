@@ -0,0 +1,152 @@
+"""Tests for ephemeral presence.
+
+These tests validate that cursor anchors survive concurrent edits, that presence
+updates are coalesced to the latest state per client, and that a 500-cursor room
+costs one broadcast per tick.
+"""
+
+import asyncio
+import json
+
+from collab_engine.core.crdt.rga import ROOT_ID, RGA
+from collab_engine.core.protocol.messages import (
+    ClientPresenceUpdate,
+    CursorAnchor,
+    PresenceState,
+    parse_client_message,
+)
+from collab_engine.session.presence import PresenceManager
+from collab_engine.session.session_manager import Connection, SessionManager
+
+
+class _NullWebSocket:
+    async def send_text(self, data: str) -> None:
+        return None
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+def _state(client_id: str, anchor: tuple[int, str]) -> PresenceState:
+    return PresenceState(client_id=client_id, cursor=CursorAnchor(anchor_id=anchor))
+
+
+def test_anchor_survives_concurrent_edits() -> None:
+    """An anchored caret must follow its element through inserts and deletes before it."""
+
+    rga = RGA()
+    rga.splice(0, 0, "hello", "a")
+    anchor = rga.anchor_at(3)  # after "hel"
+    assert rga.anchor_at(0) == ROOT_ID
+    assert rga.resolve_anchor(anchor) == 3
+    assert rga.resolve_anchor(anchor, "left") == 2
+
+    rga.splice(0, 0, ">>", "b")
+    assert rga.resolve_anchor(anchor) == 5
+
+    rga.splice(2, 2, "", "b")  # deletes "he"
+    assert rga.materialize() == ">>llo"
+    assert rga.resolve_anchor(anchor) == 3
+
+    rga.splice(2, 1, "", "b")  # deletes the anchor itself
+    assert rga.resolve_anchor(anchor) == 2
+    assert rga.resolve_anchor((999, "nobody")) is None
+    assert rga.resolve_anchor(ROOT_ID) == 0
+
+
+def test_parse_presence_update() -> None:
+    """presence_update must parse with a cursor and an optional selection."""
+
+    raw = json.dumps(
+        {
+            "type": "presence_update",
+            "doc_id": "d",
+            "client_id": "c",
+            "cursor": {"anchor_id": [3, "c"], "affinity": "left"},
+            "selection": {"start": {"anchor_id": [0, "root"]}, "end": {"anchor_id": [3, "c"]}},
+        }
+    )
+    msg = parse_client_message(raw)
+    assert isinstance(msg, ClientPresenceUpdate)
+    assert msg.cursor is not None and msg.cursor.anchor_id == (3, "c")
+    assert msg.selection is not None and msg.selection.start.affinity == "right"
+
+
+def test_updates_coalesce_to_latest_state() -> None:
+    """Many updates in one tick collapse into one message with the latest state."""
+
+    presence = PresenceManager()
+    owner = object()
+    for i in range(10):
+        presence.update("d", owner, _state("c", (i, "c")))
+    presence.update("d", object(), _state("e", (1, "e")))
+
+    (msg,) = presence.drain()
+    assert {s.client_id: s.cursor.anchor_id for s in msg.updates if s.cursor} == {"c": (9, "c"), "e": (1, "e")}
+    assert presence.drain() == []
+
+    # A stale connection of the same client must not erase the newer state.
+    presence.remove("d", "c", object())
+    assert len(presence.snapshot("d")) == 2
+    presence.remove("d", "c", owner)
+    (msg,) = presence.drain()
+    assert msg.updates == [] and msg.removed == ["c"]
+    assert [s.client_id for s in presence.snapshot("d")] == ["e"]
+
+
+def test_500_cursors_one_broadcast_per_tick() -> None:
+    """A room of 500 moving cursors sends each connection one message per tick."""
+
+    async def run() -> None:
+        sessions = SessionManager()
+        presence = PresenceManager()
+        conns = [Connection(websocket=_NullWebSocket(), client_id=f"c{i}") for i in range(500)]  # type: ignore[arg-type]
+        for c in conns:
+            await sessions.join(doc_id="d", connection=c)
+
+        for step in range(5):
+            for c in conns:
+                presence.update("d", c, _state(c.client_id, (step, c.client_id)))
+        for msg in presence.drain():
+            await sessions.broadcast(msg.doc_id, msg.model_dump())
+
+        assert all(c.send_queue.qsize() == 1 for c in conns)
+        tick = json.loads(conns[0].send_queue.get_nowait())
+        assert tick["type"] == "presence_update"
+        assert len(tick["updates"]) == 500
+        assert all(u["cursor"]["anchor_id"][0] == 4 for u in tick["updates"])
+
+        for c in conns[:250]:
+            presence.remove("d", c.client_id, c)
+            await sessions.leave_any(connection=c)
+        (msg,) = presence.drain()
+        assert len(msg.removed) == 250
+        assert len(presence.snapshot("d")) == 250
+        assert presence.counts() == {"d": 250}
+
+    asyncio.run(run())
+
+
+def test_ticker_broadcasts_and_forgets_empty_rooms() -> None:
+    """The tick loop must publish pending changes and drop rooms nobody is in."""
+
+    sent: list[tuple[str, dict]] = []
+
+    async def broadcast(doc_id: str, message: dict) -> None:
+        sent.append((doc_id, message))
+
+    async def run() -> None:
+        presence = PresenceManager()
+        owner = object()
+        presence.update("d", owner, _state("c", (1, "c")))
+        task = asyncio.create_task(presence.run(broadcast, interval=0.01))
+        await asyncio.sleep(0.05)
+        presence.remove("d", "c", owner)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        assert presence.counts() == {}
+
+    asyncio.run(run())
+    assert [m["type"] for _, m in sent] == ["presence_update", "presence_update"]
+    assert sent[1][1]["removed"] == ["c"]
+
@@ -0,0 +1,299 @@
+"""Tests for server-side plain-text ingestion.
+
+These tests validate that plain-text edits become CRDT ops that reproduce the
+intended text, that the generated ops converge on an independent replica, and
+that DocumentService sequences them atomically against a base server_seq.
+"""
+
+import asyncio
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from collab_engine.core.crdt.ids import LOW_RANK_WIRE_MIN, low_replica_id, replica_owner
+from collab_engine.core.crdt.rga import ROOT_ID, RGA
+from collab_engine.core.protocol.messages import ClientOp, DeleteOp, InsertOp, parse_client_message
+from collab_engine.persistence.memory import InMemoryPersistence
+from collab_engine.services.document_service import BaseSeqMismatch, DocumentService, EditTooLarge, IngestFailed
+from collab_engine.services.text_diff import diff_edits, single_edit
+
+
+def test_single_edit_trims_common_prefix_and_suffix() -> None:
+    """The diff must be the single contiguous replacement between texts."""
+
+    assert single_edit("hello world", "hello brave world") == (6, 0, "brave ")
+    assert single_edit("abc", "abc") == (3, 0, "")
+    assert single_edit("", "xyz") == (0, 0, "xyz")
+    assert single_edit("aaaa", "aa") == (2, 2, "")
+    assert single_edit("abcdef", "abXYef") == (2, 2, "XY")
+
+    big = "x" * 10_000 + "middle" + "y" * 10_000
+    assert single_edit(big, big.replace("middle", "MID")) == (10_000, 6, "MID")
+
+
+def test_diff_edits_keeps_distant_changes_small() -> None:
+    """Changes far apart must become separate small edits that reproduce the new text."""
+
+    line = "lorem ipsum dolor sit amet, consectetur adipiscing elit\n"
+    doc = line * (2_000_000 // len(line))
+    assert diff_edits(doc, "X" + doc[1:-1] + "Y") == [(0, 1, "X"), (len(doc) - 1, 1, "Y")]
+    assert diff_edits(doc, doc) == []
+
+    def apply(text: str, edits: list[tuple[int, int, str]]) -> str:
+        for position, delete_len, insert_text in edits:
+            text = text[:position] + insert_text + text[position + delete_len :]
+        return text
+
+    rnd = random.Random(3)
+    for _ in range(200):
+        old = "".join(rnd.choice(["a", "b", "\n", "line\n"]) for _ in range(rnd.randrange(2000)))
+        chars = list(old)
+        for _ in range(rnd.randrange(6)):
+            p = rnd.randrange(len(chars) + 1)
+            chars[p : p + rnd.randrange(8)] = rnd.choice(["", "c", "new\n", "x\ny"])
+        new = "".join(chars)
+        assert apply(old, diff_edits(old, new)) == new
+
+
+def test_splice_inserts_between_existing_children() -> None:
+    """Inserting right after an element that already has children must land in place."""
+
+    rga = RGA()
+    rga.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "a"), value="A"))
+    rga.integrate(InsertOp(type="ins", parent_id=(1, "a"), id=(2, "a"), value="B"))
+
+    rga.splice(1, 0, "xy", "server")
+    assert rga.materialize() == "AxyB"
+
+    rga.splice(0, 0, "<", "server")
+    rga.splice(len(rga), 0, ">", "server")
+    assert rga.materialize() == "<AxyB>"
+
+    rga.splice(2, 2, "", "server")
+    assert rga.materialize() == "<AB>"
+
+
+def test_repeated_prepends_keep_lamports_non_negative() -> None:
+    """Prepending again and again must pick ids below the first child without negative lamports."""
+
+    rga = RGA(check_invariants=False)
+    rga.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(3, "a"), value="A"))
+    rga.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "server"), value="S"))
+    ops = []
+    for i in range(200):
+        ops.extend(rga.splice(0, 0, str(i % 10), "server"))
+    expected = "".join(str(i % 10) for i in reversed(range(200))) + "SA"
+    assert rga.materialize() == expected
+    assert all(op.id[0] >= 0 and replica_owner(op.id[1]) == "server" for op in ops)
+
+    replica = RGA()
+    replica.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(1, "server"), value="S"))
+    for op in reversed(ops):
+        replica.integrate(op)
+    replica.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(3, "a"), value="A"))
+    assert replica.materialize() == expected
+
+    with pytest.raises(ValidationError):
+        InsertOp(type="ins", parent_id=ROOT_ID, id=(-1, "a"), value="x")
+
+
+def test_wire_ids_leave_room_below_them() -> None:
+    """Replica ids sorting below what the server can allocate are refused on the wire."""
+
+    def client_op(replica_id: str) -> str:
+        op = InsertOp(type="ins", parent_id=ROOT_ID, id=(0, replica_id), value="x")
+        return ClientOp(type="op", doc_id="d", client_id="c", client_msg_id="m", op=op).model_dump_json()
+
+    for replica_id in ("", "\x00", "\x00a", low_replica_id("a", 0), low_replica_id("a", LOW_RANK_WIRE_MIN - 1)):
+        with pytest.raises(ValidationError):
+            parse_client_message(client_op(replica_id))
+    parse_client_message(client_op(low_replica_id("a", LOW_RANK_WIRE_MIN)))
+
+    rga = RGA()
+    rga.integrate(InsertOp(type="ins", parent_id=ROOT_ID, id=(0, low_replica_id("a", LOW_RANK_WIRE_MIN)), value="A"))
+    for _ in range(10):
+        rga.splice(0, 0, "x", "server")
+    assert rga.materialize() == "x" * 10 + "A"
+
+
+def test_failed_ingest_keeps_replica_and_oplog_in_step() -> None:
+    """An edit failing after earlier ones were applied must leave those ops sequenced and persisted."""
+
+    persistence = InMemoryPersistence()
+    svc = DocumentService(persistence=persistence)
+    # Refused from clients now; stands in for any id the server cannot allocate below.
+    floor = InsertOp(type="ins", parent_id=ROOT_ID, id=(0, ""), value="E")
+
+    async def run() -> None:
+        await svc.apply_op(doc_id="d", origin_client_id="c", client_msg_id="m0", op=floor)
+        with pytest.raises(IngestFailed) as failed:
+            await svc.apply_text_edits(
+                doc_id="d", origin_client_id="bot", client_msg_id="i1", base_server_seq=1, edits=[(1, 0, "tail"), (0, 0, "head")]
+            )
+        assert [rec.server_seq for rec in failed.value.records] == [2, 3, 4, 5]
+        assert svc.get_snapshot("d") == ("Etail", 5)
+
+        replay = RGA()
+        for rec in persistence.get_ops_since(doc_id="d", since_server_seq=0) or []:
+            replay.integrate(rec.op)
+        assert replay.materialize() == "Etail"
+
+    asyncio.run(run())
+
+
+def test_splice_skips_ids_buffered_ops_wait_for() -> None:
+    """Ids that buffered ops wait for must not be minted, or the ops would apply to server text."""
+
+    rga = RGA()
+    rga.splice(0, 0, "hello", "server")
+    rga.integrate(InsertOp(type="ins", parent_id=(6, "server"), id=(7, "c"), value="!"))
+    rga.integrate(DeleteOp(type="del", id=(7, "server")))
+    rga.integrate(InsertOp(type="ins", parent_id=(0, "server"), id=(8, "c"), value="?"))
+
+    ops = rga.splice(5, 0, " world", "server")
+    ops += rga.splice(0, 0, "<", "server")
+    assert rga.materialize() == "<hello world"
+    assert {(6, "server"), (7, "server"), (0, "server")}.isdisjoint(op.id for op in ops)
+    assert rga.pending_stats().inserts == 2 and rga.pending_stats().deletes == 1
+
+
+def test_splice_ops_converge_on_other_replica() -> None:
+    """Ops returned by splice must rebuild the same text on a fresh replica."""
+
+    rnd = random.Random(7)
+    source = RGA(check_invariants=False)
+    ops = source.splice(0, 0, "the quick brown fox", "server")
+    expected = "the quick brown fox"
+
+    for _ in range(300):
+        position = rnd.randrange(len(expected) + 1)
+        delete_len = rnd.randrange(min(3, len(expected) - position) + 1)
+        insert_text = "".join(rnd.choice("abc ") for _ in range(rnd.randrange(4)))
+        ops.extend(source.splice(position, delete_len, insert_text, "server"))
+        expected = expected[:position] + insert_text + expected[position + delete_len :]
+
+    assert source.materialize() == expected
+
+    replica = RGA()
+    for op in ops:
+        replica.integrate(op)
+    assert replica.materialize() == expected
+
+
+def test_splice_rejects_out_of_range_edits() -> None:
+    """Out-of-range edits must raise before changing state."""
+
+    rga = RGA()
+    rga.splice(0, 0, "abc", "server")
+    with pytest.raises(ValueError):
+        rga.splice(2, 5, "", "server")
+    with pytest.raises(ValueError):
+        rga.splice(4, 0, "x", "server")
+    assert rga.materialize() == "abc"
+
+
+def test_service_full_text_ingest_is_sequenced_and_replayable() -> None:
+    """Ingested edits must be persisted as sequenced ops that replay to the same text."""
+
+    persistence = InMemoryPersistence()
+    svc = DocumentService(persistence=persistence)
+
+    async def run() -> None:
+        await svc.apply_text_edits(
+            doc_id="d", origin_client_id="bot", client_msg_id="i1", base_server_seq=0, full_text="hello world"
+        )
+        seq = svc.get_server_seq("d")
+        records = await svc.apply_text_edits(
+            doc_id="d", origin_client_id="bot", client_msg_id="i2", base_server_seq=seq, full_text="hello brave world"
+        )
+        assert [r.server_seq for r in records] == list(range(seq + 1, seq + 1 + len("brave ")))
+
+        with pytest.raises(BaseSeqMismatch):
+            await svc.apply_text_edits(
+                doc_id="d", origin_client_id="bot", client_msg_id="i3", base_server_seq=seq, edits=[(0, 1, "")]
+            )
+        with pytest.raises(ValueError):
+            await svc.apply_text_edits(
+                doc_id="d",
+                origin_client_id="bot",
+                client_msg_id="i4",
+                base_server_seq=svc.get_server_seq("d"),
+                edits=[(0, 0, "ok"), (100, 0, "too far")],
+            )
+
+    asyncio.run(run())
+
+    snap_text, snap_seq = persistence.get_snapshot_text("d") or ("", 0)
+    assert snap_text == "hello brave world"
+    assert snap_seq == len("hello world") + len("brave ")
+
+    rga = RGA()
+    for rec in persistence.get_ops_since(doc_id="d", since_server_seq=0) or []:
+        rga.integrate(rec.op)
+    assert rga.materialize() == snap_text
+
+
+def test_service_ingest_edits_only_changed_characters() -> None:
+    """Full-text ingest of a large document with both ends changed must emit a few ops; oversized edits are refused."""
+
+    persistence = InMemoryPersistence()
+    svc = DocumentService(persistence=persistence, check_invariants=False, max_edit_chars=60_000)
+    text = "".join(f"line {i}\n" for i in range(5_000))
+
+    async def run() -> None:
+        await svc.apply_text_edits(doc_id="big", origin_client_id="bot", client_msg_id="i1", base_server_seq=0, full_text=text)
+        seq = svc.get_server_seq("big")
+        changed = "L" + text[1:-1] + "!"
+        records = await svc.apply_text_edits(
+            doc_id="big", origin_client_id="bot", client_msg_id="i2", base_server_seq=seq, full_text=changed
+        )
+        assert len(records) == 4
+        assert svc.get_snapshot("big") == (changed, seq + 4)
+
+        with pytest.raises(EditTooLarge):
+            await svc.apply_text_edits(
+                doc_id="big", origin_client_id="bot", client_msg_id="i3", base_server_seq=seq + 4, full_text=text[::-1]
+            )
+        assert svc.get_server_seq("big") == seq + 4
+
+    asyncio.run(run())
+
+
+def test_snapshot_stays_consistent_during_threaded_ingest() -> None:
+    """Snapshot reads while a large batch is appended from a worker thread must pair text with its own seq."""
+
+    svc = DocumentService(persistence=InMemoryPersistence(), check_invariants=False)
+    big = "x" * 20_000
+
+    async def run() -> None:
+        await svc.apply_text_edits(doc_id="d", origin_client_id="bot", client_msg_id="i1", base_server_seq=0, edits=[(0, 0, "abc")])
+        ingest = asyncio.create_task(
+            svc.apply_text_edits(doc_id="d", origin_client_id="bot", client_msg_id="i2", base_server_seq=3, edits=[(3, 0, big)])
+        )
+        seen = set()
+        while not ingest.done():
+            seen.add(svc.get_snapshot("d"))
+            await asyncio.sleep(0)
+        await ingest
+        seen.add(svc.get_snapshot("d"))
+        assert seen <= {("abc", 3), ("abc" + big, 3 + len(big))}
+        assert ("abc" + big, 3 + len(big)) in seen
+
+    asyncio.run(run())
+
+
+def test_large_document_edits() -> None:
+    """Edits deep inside a large document must map positions correctly."""
+
+    rga = RGA(check_invariants=False)
+    text = "".join(chr(97 + (i % 26)) for i in range(50_000))
+    rga.splice(0, 0, text, "server")
+
+    rga.splice(40_000, 10, "EDIT", "server")
+    rga.splice(5, 0, "HEAD", "server")
+    text = text[:40_000] + "EDIT" + text[40_010:]
+    text = text[:5] + "HEAD" + text[5:]
+
+    assert rga.materialize() == text
+    assert len(rga) == len(text)
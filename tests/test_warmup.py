@@ -0,0 +1,96 @@
+"""Tests for startup warm-up.
+
+These tests validate that the most recently written documents are preloaded
+from their checkpoints, that readiness reports warming until preloading is done,
+and that a failed or raced preload never loses state.
+"""
+
+import asyncio
+
+from collab_engine.core.crdt.rga import ROOT_ID
+from collab_engine.core.protocol.messages import InsertOp
+from collab_engine.persistence.memory import InMemoryPersistence
+from collab_engine.services.checkpoints import CheckpointPolicy
+from collab_engine.services.document_service import DocumentService
+from collab_engine.services.warmup import Warmup
+
+
+def _seed(persistence: InMemoryPersistence, doc_ids: list[str], ops: int) -> None:
+    async def run() -> None:
+        writer = DocumentService(persistence=persistence, checkpoint_policy=CheckpointPolicy(interval=10))
+        for doc_id in doc_ids:
+            parent = ROOT_ID
+            for i in range(ops):
+                op = InsertOp(type="ins", parent_id=parent, id=(i + 1, "w"), value=doc_id[-1])
+                await writer.apply_op(doc_id=doc_id, origin_client_id="w", client_msg_id=f"m{i}", op=op)
+                parent = op.id
+
+    asyncio.run(run())
+
+
+def test_recent_doc_ids_most_recent_first() -> None:
+    """Docs are ordered by their last written op, newest first."""
+
+    persistence = InMemoryPersistence()
+    _seed(persistence, ["a", "b", "c"], ops=3)
+    _seed(persistence, ["a"], ops=1)
+    assert persistence.recent_doc_ids(10) == ["a", "c", "b"]
+    assert persistence.recent_doc_ids(2) == ["a", "c"]
+
+
+def test_warmup_preloads_top_k_and_reports_ready() -> None:
+    """Only the top-K docs are loaded, and status moves from warming to ready."""
+
+    persistence = InMemoryPersistence()
+    _seed(persistence, ["a", "b", "c"], ops=25)
+
+    async def run() -> None:
+        svc = DocumentService(persistence=persistence)
+        warmup = Warmup(service=svc, persistence=persistence)
+        assert warmup.status().ready
+
+        warmup.begin()
+        assert warmup.status().state == "warming"
+        await warmup.run(top_k=2)
+
+        status = warmup.status()
+        assert status.ready and status.target_docs == 2 and status.warmed_docs == 2
+        assert sorted(d.doc_id for d in svc.doc_stats()) == ["b", "c"]
+        assert [d.server_seq for d in svc.doc_stats()] == [25, 25]
+        assert svc.get_snapshot("c") == ("c" * 25, 25)
+
+        # A preloaded doc keeps serving ops from where persistence left off.
+        op = InsertOp(type="ins", parent_id=(25, "w"), id=(26, "w"), value="!")
+        assert await svc.apply_op(doc_id="c", origin_client_id="w", client_msg_id="late", op=op) == 26
+        assert svc.get_snapshot("c") == ("c" * 25 + "!", 26)
+
+    asyncio.run(run())
+
+
+def test_preload_yields_to_an_earlier_load_and_failures_are_skipped() -> None:
+    """A doc loaded by a client first is kept; a doc that fails to load is skipped."""
+
+    persistence = InMemoryPersistence()
+    _seed(persistence, ["a", "b"], ops=5)
+
+    async def run() -> None:
+        svc = DocumentService(persistence=persistence)
+        op = InsertOp(type="ins", parent_id=(5, "w"), id=(6, "w"), value="!")
+        await svc.apply_op(doc_id="b", origin_client_id="w", client_msg_id="first", op=op)
+        assert await svc.preload("b") is False
+        assert svc.get_snapshot("b") == ("bbbbb!", 6)
+
+        original = svc._load_doc
+
+        def flaky(doc_id: str):  # type: ignore[no-untyped-def]
+            if doc_id == "a":
+                raise RuntimeError("corrupt checkpoint")
+            return original(doc_id)
+
+        svc._load_doc = flaky  # type: ignore[method-assign]
+        warmup = Warmup(service=svc, persistence=persistence)
+        await warmup.run(top_k=5)
+        status = warmup.status()
+        assert status.ready and status.failed_docs == 1 and status.warmed_docs == 1
+
+    asyncio.run(run())
@@ -0,0 +1,115 @@
+"""Tests for WebSocket protocol enforcement.
+
+These tests drive `ws_endpoint` with a scripted socket and validate that
+protocol violations close the connection with the documented code before the
+op reaches the document.
+"""
+
+import asyncio
+import json
+
+from fastapi import WebSocketDisconnect
+
+from collab_engine.api import ws as api_ws
+from collab_engine.core.crdt.ids import LOW_RANK_MAX, low_replica_id
+from collab_engine.core.crdt.rga import ROOT_ID
+from collab_engine.core.protocol.messages import ClientHello, ClientOp, DeleteOp, InsertOp
+from collab_engine.services.document_service import SERVER_REPLICA_ID
+
+
+class _ScriptedWebSocket:
+    """Delivers `messages` in order, then disconnects; records sends and the close."""
+
+    def __init__(self, messages: list[str]) -> None:
+        self._messages = list(messages)
+        self.sent: list[dict] = []
+        self.closed: tuple[int, str | None] | None = None
+
+    async def accept(self) -> None:
+        return None
+
+    async def receive_text(self) -> str:
+        if not self._messages or self.closed is not None:
+            raise WebSocketDisconnect(code=1000)
+        return self._messages.pop(0)
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.closed = (code, reason)
+
+
+def _session(doc_id: str, *ops: InsertOp | DeleteOp) -> list[str]:
+    messages = [ClientHello(type="hello", doc_id=doc_id, client_id="c").model_dump_json()]
+    for i, op in enumerate(ops):
+        messages.append(ClientOp(type="op", doc_id=doc_id, client_id="c", client_msg_id=f"m{i}", op=op).model_dump_json())
+    return messages
+
+
+def test_client_insert_with_server_replica_id_is_rejected() -> None:
+    """Inserts under the server's replica id or its aliases close with 1008; deletes of integrated server ids pass."""
+
+    async def run() -> None:
+        for replica_id in (SERVER_REPLICA_ID, low_replica_id(SERVER_REPLICA_ID, LOW_RANK_MAX)):
+            doc_id = f"ws-reserved-{len(replica_id)}"
+            socket = _ScriptedWebSocket(_session(doc_id, InsertOp(type="ins", parent_id=ROOT_ID, id=(1, replica_id), value="x")))
+            await api_ws.ws_endpoint(socket)  # type: ignore[arg-type]
+            assert socket.closed is not None and socket.closed[0] == 1008
+            assert api_ws._document_service.get_server_seq(doc_id) == 0
+
+        doc_id = "ws-reserved-ok"
+        await api_ws._document_service.apply_text_edits(
+            doc_id=doc_id, origin_client_id="bot", client_msg_id="i", base_server_seq=0, edits=[(0, 0, "ab")]
+        )
+        socket = _ScriptedWebSocket(
+            _session(
+                doc_id,
+                InsertOp(type="ins", parent_id=(1, SERVER_REPLICA_ID), id=(3, "c"), value="x"),
+                DeleteOp(type="del", id=(2, SERVER_REPLICA_ID)),
+            )
+        )
+        await api_ws.ws_endpoint(socket)  # type: ignore[arg-type]
+        assert socket.closed is None
+        assert api_ws._document_service.get_snapshot(doc_id) == ("ax", 4)
+
+    asyncio.run(run())
+
+
+def test_ops_on_future_server_ids_are_rejected() -> None:
+    """Deletes of, and inserts under, server ids not minted yet close with 1008 before buffering."""
+
+    async def run() -> None:
+        doc_id = "ws-future-server-id"
+        await api_ws._document_service.apply_text_edits(
+            doc_id=doc_id, origin_client_id="bot", client_msg_id="i", base_server_seq=0, edits=[(0, 0, "hello")]
+        )
+        for op in (
+            InsertOp(type="ins", parent_id=(6, SERVER_REPLICA_ID), id=(7, "c"), value="!"),
+            DeleteOp(type="del", id=(6, SERVER_REPLICA_ID)),
+            DeleteOp(type="del", id=(6, low_replica_id(SERVER_REPLICA_ID, LOW_RANK_MAX))),
+        ):
+            socket = _ScriptedWebSocket(_session(doc_id, op))
+            await api_ws.ws_endpoint(socket)  # type: ignore[arg-type]
+            assert socket.closed is not None and socket.closed[0] == 1008
+        assert api_ws._document_service.get_server_seq(doc_id) == 5
+        assert api_ws._document_service.get_pending_stats(doc_id).inserts == 0
+
+    asyncio.run(run())
+
+
+def test_lifespan_stops_the_presence_ticker() -> None:
+    """Shutdown must cancel the presence ticker started by the first connection."""
+
+    from collab_engine.main import app, lifespan
+
+    async def run() -> None:
+        async with lifespan(app):
+            api_ws._ensure_presence_ticker()
+            task = api_ws._presence_task
+            assert task is not None and not task.done()
+        # Checked before asyncio.run cancels leftover tasks itself.
+        assert task.cancelled()
+        assert api_ws._presence_task is None
+
+    asyncio.run(run())